@@ -5,12 +5,15 @@ A sophisticated folder customization application with modern UI
 """
 
 import os
+import re
 import sys
+import argparse
 import json
 import shutil
 import ctypes
 import winreg
 import threading
+import multiprocessing
 from pathlib import Path
 from datetime import datetime
 from PIL import Image, ImageTk
@@ -21,13 +24,42 @@ from CTkMessagebox import CTkMessagebox
 import win32api
 import win32con
 import win32gui
+from fusion.atlas import IconAtlas
+from fusion.bounded import BoundedScan
+from fusion.capture import Capturer
+from fusion.colors import PRESETS, Palette, hover_variant, tint_ramp
+from fusion.customize import apply_stream, reset_folder
+from fusion.dashboard import Dashboard, select
+from fusion.dirindex import DirectoryIndex
+from fusion.dominant import PaletteCache, folder_palette, image_palette
+from fusion.history import History, read_desktop_ini
+from fusion.icons import color_icon_path, convert_to_ico, icons_directory, render_folder_icon
+from fusion.instance import claim
+from fusion.instrument import SPANS, metrics
+from fusion.journal import Journal, Recovery
+from fusion.netio import NetworkIO
+from fusion.planner import Plan, build_plan, execute_plan
+from fusion.registry import WinRegBackend, apply as apply_registry, context_menu_plan, diff as diff_registry, \
+    file_types_plan
+from fusion.report import export as export_report
+from fusion.rules import DEFAULT_RULES, RuleSet, classify_tree
+from fusion.scheduler import VolumeScheduler
+from fusion.shellnotify import SHCNE_ASSOCCHANGED, NotifyScheduler
+from fusion.sizetree import SizeTree, squarify
+from fusion.store import IconStore
+from fusion.timeseries import TimeSeriesStore, snapshot_from_tree
+from fusion.tuning import calibrate, profile_for, save_profile, volume_limit
+from fusion.volumes import NETWORK, volume_kind
 
 # Set appearance mode and default color theme
 ctk.set_appearance_mode("dark")  # Modes: "System" (standard), "Dark", "Light"
 ctk.set_default_color_theme("blue")  # Themes: "blue" (standard), "green", "dark-blue"
 
+# Icon library buttons per page (8 per row); only the shown page gets Tk images
+ICON_PAGE_SIZE = 96
+
 class FileFusionPro(ctk.CTk):
-    def __init__(self):
+    def __init__(self, instance=None):
         super().__init__()
         
         # App configuration
@@ -43,10 +75,10 @@ class FileFusionPro(ctk.CTk):
         
         # Initialize variables
         self.current_folder = ""
-        self.folder_history = []
         self.favorites = []
         self.custom_icons = []
         self.theme_mode = "dark"
+        self.size_tree = None
         self.load_config()
         
         # Configure grid
@@ -68,6 +100,30 @@ class FileFusionPro(ctk.CTk):
         # Apply styling
         self.apply_styles()
         
+        # Offer to finish or undo a batch that was interrupted last time
+        self.after(500, self.check_interrupted_batches)
+        
+        # Thin out old growth snapshots in the background
+        threading.Thread(target=self.growth_history.compact, daemon=True).start()
+        
+        # A new folder finder index starts out with the favorites and recent folders
+        if not len(self.folder_index):
+            threading.Thread(target=self.index_known_folders, daemon=True).start()
+        
+        # Folders sent by later launches (e.g. the Explorer context menu) arrive as one batch
+        self.instance = instance
+        if instance is not None:
+            instance.set_handler(
+                lambda folders: self.after(0, lambda: self.customize_from_shell(folders)),
+                on_activate=lambda: self.after(0, self.bring_to_front),
+                on_plan=lambda path: self.after(0, lambda: (self.bring_to_front(), self.apply_saved_plan(path)))
+            )
+        
+        # Undo/redo shortcuts
+        self.bind("<Control-z>", lambda event: self.undo_customization())
+        self.bind("<Control-y>", lambda event: self.redo_customization())
+        self.bind("<Control-f>", lambda event: self.show_find_folder())
+        
     def resource_path(self, relative_path):
         """ Get absolute path to resource, works for dev and for PyInstaller """
         try:
@@ -87,7 +143,13 @@ class FileFusionPro(ctk.CTk):
             "favorites": [],
             "icon_size": "medium",
             "default_color": "#3498db",
-            "backup_enabled": True
+            "backup_enabled": True,
+            "custom_icon_files": [],
+            "scan_memory_budget_mb": 256,
+            "suggest_time_budget": 10.0,
+            "icon_path_policy": "absolute",
+            "portable_icon_copies": True,
+            "instrumentation_enabled": False
         }
         
         if self.config_file.exists():
@@ -103,14 +165,43 @@ class FileFusionPro(ctk.CTk):
         else:
             self.config = default_config
         
+        metrics.enabled = self.config.get("instrumentation_enabled", False)
+        
+        # Shared icon store: desktop.ini files reference one copy of each icon
+        self.icon_store = IconStore(
+            os.path.join(icons_directory(self.config_file.parent), "store"),
+            policy=self.config.get("icon_path_policy", "absolute"),
+            portable_copies=self.config.get("portable_icon_copies", True)
+        )
+        # Library thumbnails live in memory-mapped sprite pages
+        self.icon_atlas = IconAtlas(os.path.join(icons_directory(self.config_file.parent), "atlas"))
+        # Explorer refreshes are collected and sent once per batch
+        self.shell_notifier = NotifyScheduler()
+        # Write-ahead journals of running batches; leftovers mean a batch was interrupted
+        self.journal_dir = str(self.config_file.parent / "journal")
+        # Scans and batches share one I/O scheduler with a queue and limit per volume
+        self.io_scheduler = VolumeScheduler(lambda path, kind: volume_limit(self.config, path, kind))
+        # SMB/NFS folders go through the asyncio front end (many round trips in flight)
+        self.network_io = NetworkIO()
+        # Undo/redo entries survive restarts; old ones are pruned by count and size
+        self.folder_history = History(str(self.config_file.parent / "history"))
+        # Every scan appends a size snapshot; old ones are thinned by the retention policy
+        self.growth_history = TimeSeriesStore(str(self.config_file.parent / "growth.db"))
+        # Favorites dashboard: last results are cached so they show before rescans finish
+        self.dashboard = Dashboard(str(self.config_file.parent / "dashboard.json"), scan=self.scan_folder,
+                                   history=self.growth_history)
+        # Folder finder: every scanned folder is indexed for Ctrl+F
+        self.folder_index = DirectoryIndex(str(self.config_file.parent / "dirindex"))
+        
         # Apply theme
         ctk.set_appearance_mode(self.config.get("theme", "dark"))
         self.theme_mode = self.config.get("theme", "dark")
     
     def save_config(self):
         """Save application configuration"""
-        with open(self.config_file, 'w') as f:
-            json.dump(self.config, f, indent=4)
+        with metrics.span("config_save"):
+            with open(self.config_file, 'w') as f:
+                json.dump(self.config, f, indent=4)
     
     def create_sidebar(self):
         """Create the sidebar with navigation and tools"""
@@ -147,6 +238,8 @@ class FileFusionPro(ctk.CTk):
         nav_buttons = [
             ("📁 Browse Folders", self.browse_folder, "primary"),
             ("⭐ Favorites", self.show_favorites, "secondary"),
+            ("📋 Dashboard", self.show_dashboard, "secondary"),
+            ("🔍 Find Folder", self.show_find_folder, "secondary"),
             ("🕐 Recent", self.show_recent, "secondary"),
             ("🎨 Customize", self.show_customize, "primary"),
             ("🖼️ Icons", self.show_icons, "secondary"),
@@ -181,6 +274,8 @@ class FileFusionPro(ctk.CTk):
         
         quick_actions = [
             ("📸 Capture Icon", self.capture_icon),
+            ("↶ Undo", self.undo_customization),
+            ("↷ Redo", self.redo_customization),
             ("🔄 Reset All", self.reset_all_customizations),
             ("💾 Backup", self.create_backup),
             ("⚙️ Settings", self.open_settings)
@@ -623,6 +718,29 @@ class FileFusionPro(ctk.CTk):
         self.icon_grid_frame = ctk.CTkFrame(icon_scroll_frame, fg_color="transparent")
         self.icon_grid_frame.pack(fill="both", expand=True)
         
+        # Pager for large libraries
+        pager_frame = ctk.CTkFrame(icon_lib_frame, fg_color="transparent")
+        pager_frame.grid(row=3, column=0, padx=20, pady=(0, 20), sticky="ew")
+        self.icon_page = 0
+        self.icon_prev_btn = ctk.CTkButton(
+            pager_frame,
+            text="◀ Previous",
+            width=110,
+            command=lambda: self.load_icon_grid(self.icon_page - 1),
+            font=ctk.CTkFont(family="Segoe UI", size=12)
+        )
+        self.icon_prev_btn.pack(side="left")
+        self.icon_next_btn = ctk.CTkButton(
+            pager_frame,
+            text="Next ▶",
+            width=110,
+            command=lambda: self.load_icon_grid(self.icon_page + 1),
+            font=ctk.CTkFont(family="Segoe UI", size=12)
+        )
+        self.icon_next_btn.pack(side="right")
+        self.icon_page_label = ctk.CTkLabel(pager_frame, text="", font=ctk.CTkFont(family="Segoe UI", size=12))
+        self.icon_page_label.pack(expand=True)
+        
         # Load icons into grid
         self.load_icon_grid()
     
@@ -647,22 +765,7 @@ class FileFusionPro(ctk.CTk):
         presets_frame = ctk.CTkFrame(color_palette_frame, fg_color="transparent")
         presets_frame.grid(row=1, column=0, padx=20, pady=(0, 20), sticky="nsew")
         
-        color_presets = [
-            ("#3498db", "Blue"),
-            ("#2ecc71", "Green"),
-            ("#e74c3c", "Red"),
-            ("#f39c12", "Orange"),
-            ("#9b59b6", "Purple"),
-            ("#1abc9c", "Turquoise"),
-            ("#34495e", "Dark Blue"),
-            ("#e67e22", "Carrot"),
-            ("#27ae60", "Emerald"),
-            ("#8e44ad", "Wisteria"),
-            ("#d35400", "Pumpkin"),
-            ("#c0392b", "Pomegranate")
-        ]
-        
-        for i, (color, name) in enumerate(color_presets):
+        for i, (color, name) in enumerate(PRESETS):
             row = i // 4
             col = i % 4
             
@@ -670,7 +773,7 @@ class FileFusionPro(ctk.CTk):
                 presets_frame,
                 text=name,
                 fg_color=color,
-                hover_color=self.adjust_color(color, -20),
+                hover_color=hover_variant(color),
                 command=lambda c=color: self.apply_preset_color(c),
                 height=40,
                 font=ctk.CTkFont(family="Segoe UI", size=12)
@@ -678,6 +781,34 @@ class FileFusionPro(ctk.CTk):
             color_btn.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
             presets_frame.grid_columnconfigure(col, weight=1)
         
+        # Suggested colors from the selected icon or the folder's images
+        suggest_frame = ctk.CTkFrame(color_palette_frame, fg_color="transparent")
+        suggest_frame.grid(row=2, column=0, padx=20, pady=(0, 20), sticky="ew")
+        
+        ctk.CTkButton(
+            suggest_frame,
+            text="✨ Suggest Colors",
+            command=self.suggest_colors,
+            height=35,
+            font=ctk.CTkFont(family="Segoe UI", size=13)
+        ).pack(side="left", padx=(10, 15))
+        
+        self.suggestion_swatches = []
+        for i in range(6):
+            swatch = ctk.CTkButton(
+                suggest_frame,
+                text="",
+                width=35,
+                height=35,
+                corner_radius=6,
+                fg_color="gray30",
+                hover_color="gray25",
+                state="disabled"
+            )
+            swatch.configure(command=lambda s=swatch: self.apply_preset_color(s.cget("fg_color")))
+            swatch.pack(side="left", padx=3)
+            self.suggestion_swatches.append(swatch)
+        
         # Custom color mixer
         mixer_frame = ctk.CTkFrame(tab, corner_radius=10)
         mixer_frame.grid(row=0, column=1, padx=20, pady=20, sticky="nsew")
@@ -727,7 +858,32 @@ class FileFusionPro(ctk.CTk):
             corner_radius=10,
             fg_color="#3498db"
         )
-        self.color_preview.pack(pady=20, padx=20)
+        self.color_preview.pack(pady=(20, 5), padx=20)
+        
+        # Nearest named color and the tint ramp used for icon recoloring
+        self.palette = Palette()
+        self.nearest_color_label = ctk.CTkLabel(
+            mixer_frame,
+            text="",
+            font=ctk.CTkFont(family="Segoe UI", size=12)
+        )
+        self.nearest_color_label.pack(pady=(0, 5), padx=20)
+        
+        ramp_frame = ctk.CTkFrame(mixer_frame, fg_color="transparent")
+        ramp_frame.pack(pady=(0, 10), padx=20)
+        self.ramp_swatches = []
+        for i in range(9):
+            swatch = ctk.CTkButton(
+                ramp_frame,
+                text="",
+                width=24,
+                height=24,
+                corner_radius=4,
+                command=lambda i=i: self.apply_ramp_color(i)
+            )
+            swatch.grid(row=0, column=i, padx=2)
+            self.ramp_swatches.append(swatch)
+        self.update_color_details("#3498db")
         
         # Hex color input
         hex_frame = ctk.CTkFrame(mixer_frame, fg_color="transparent")
@@ -777,6 +933,8 @@ class FileFusionPro(ctk.CTk):
         
         batch_buttons = [
             ("Apply to Multiple Folders", self.batch_apply),
+            ("Apply Saved Plan", self.apply_saved_plan),
+            ("Auto-Customize by Content", self.auto_customize),
             ("Export Settings", self.export_settings),
             ("Import Settings", self.import_settings),
             ("Reset All Folders", self.reset_all_folders)
@@ -843,6 +1001,39 @@ class FileFusionPro(ctk.CTk):
         self.stats_text.pack(pady=10, padx=10, fill="x")
         self.stats_text.insert("1.0", "No statistics available yet.\nSelect a folder to see statistics.")
         self.stats_text.configure(state="disabled")
+        
+        ctk.CTkButton(
+            stats_frame,
+            text="🗺️ Size Breakdown",
+            command=self.show_size_breakdown,
+            height=35,
+            font=ctk.CTkFont(family="Segoe UI", size=13),
+            corner_radius=8,
+            fg_color="gray20",
+            hover_color="gray25"
+        ).pack(pady=(0, 10), padx=10, fill="x")
+        
+        ctk.CTkButton(
+            stats_frame,
+            text="🔬 Deep Analysis",
+            command=self.run_deep_analysis,
+            height=35,
+            font=ctk.CTkFont(family="Segoe UI", size=13),
+            corner_radius=8,
+            fg_color="gray20",
+            hover_color="gray25"
+        ).pack(pady=(0, 10), padx=10, fill="x")
+        
+        ctk.CTkButton(
+            stats_frame,
+            text="📤 Export Report",
+            command=self.export_stats_report,
+            height=35,
+            font=ctk.CTkFont(family="Segoe UI", size=13),
+            corner_radius=8,
+            fg_color="gray20",
+            hover_color="gray25"
+        ).pack(pady=(0, 10), padx=10, fill="x")
     
     def draw_default_preview(self):
         """Draw default folder preview"""
@@ -895,23 +1086,54 @@ class FileFusionPro(ctk.CTk):
             "📁", "📂", "📄", "📷", "🎵", "🎥", "📊", "🔒",
             "💾", "📎", "📌", "📍", "🚀", "⭐", "🎨", "🔧"
         ]
+        self.refresh_icon_atlas(prune=True)
     
-    def load_icon_grid(self):
-        """Load icons into the grid"""
+    def refresh_icon_atlas(self, paths=None, prune=False):
+        """Pack new or changed library icons into the atlas in the background, then redraw the grid"""
+        paths = list(paths if paths is not None else self.config.get("custom_icon_files", []))
+        
+        def worker():
+            try:
+                if self.icon_atlas.update(paths, prune=prune) or prune:
+                    self.after(0, self.load_icon_grid)
+            except Exception as e:
+                print(f"Error updating icon atlas: {e}")
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def load_icon_grid(self, page=None):
+        """Load one page of icons into the grid (the current page unless given)"""
         # Clear existing icons
         for widget in self.icon_grid_frame.winfo_children():
             widget.destroy()
         
-        # Create icon buttons
-        icons = self.custom_icons * 3  # Repeat for demonstration
+        # Thumbnails are cut from the atlas pages; no icon file is opened here
+        files = [path for path in self.config.get("custom_icon_files", []) if path in self.icon_atlas]
+        icons = self.custom_icons + files
+        pages = max(1, -(-len(icons) // ICON_PAGE_SIZE))
+        self.icon_page = min(max(self.icon_page if page is None else page, 0), pages - 1)
+        first = self.icon_page * ICON_PAGE_SIZE
+        shown = icons[first:first + ICON_PAGE_SIZE]
+        self.icon_page_label.configure(
+            text=f"Icons {first + 1 if shown else 0}-{first + len(shown)} of {len(icons)} (page {self.icon_page + 1} of {pages})"
+        )
+        self.icon_prev_btn.configure(state="normal" if self.icon_page > 0 else "disabled")
+        self.icon_next_btn.configure(state="normal" if self.icon_page < pages - 1 else "disabled")
+        # Images of the previous page are dropped with their buttons
+        self.icon_thumbnails = []
         
-        for i, icon in enumerate(icons[:32]):  # Show first 32 icons
+        for i, icon in enumerate(shown):
             row = i // 8
             col = i % 8
             
+            thumbnail = self.icon_atlas.thumbnail(icon) if first + i >= len(self.custom_icons) else None
+            if thumbnail is not None:
+                image = ctk.CTkImage(light_image=thumbnail, dark_image=thumbnail, size=(40, 40))
+                self.icon_thumbnails.append(image)
             icon_btn = ctk.CTkButton(
                 self.icon_grid_frame,
-                text=icon,
+                text="" if thumbnail is not None else icon,
+                image=image if thumbnail is not None else None,
                 width=60,
                 height=60,
                 font=ctk.CTkFont(size=24),
@@ -929,12 +1151,16 @@ class FileFusionPro(ctk.CTk):
         """Browse for a folder to customize"""
         folder_path = filedialog.askdirectory(title="Select Folder to Customize")
         if folder_path:
-            self.current_folder = folder_path
-            self.folder_label.configure(text=f"📁 {os.path.basename(folder_path)}")
-            self.update_status(f"Loaded folder: {folder_path}")
-            self.add_to_recent(folder_path)
-            self.update_preview()
-            self.update_stats()
+            self.open_folder(folder_path)
+    
+    def open_folder(self, folder_path):
+        """Make folder_path the folder being customized"""
+        self.current_folder = folder_path
+        self.folder_label.configure(text=f"📁 {os.path.basename(folder_path)}")
+        self.update_status(f"Loaded folder: {folder_path}")
+        self.add_to_recent(folder_path)
+        self.update_preview()
+        self.update_stats()
     
     def add_to_recent(self, folder_path):
         """Add folder to recent list"""
@@ -1018,6 +1244,175 @@ class FileFusionPro(ctk.CTk):
             self.update_status(f"Removed from favorites: {folder_path}")
             self.show_favorites()  # Refresh dialog
     
+    def show_dashboard(self):
+        """Show size, counts, growth and customization status of all favorites"""
+        favorites = self.config.get("favorites", [])
+        if not favorites:
+            CTkMessagebox(title="No Favorites", message="You haven't added any folders to favorites yet.")
+            return
+        
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Favorites Dashboard")
+        dialog.geometry("1100x600")
+        dialog.transient(self)
+        
+        ctk.CTkLabel(
+            dialog,
+            text="📋 Favorites Dashboard",
+            font=ctk.CTkFont(family="Segoe UI", size=18, weight="bold")
+        ).pack(pady=(20, 10))
+        
+        controls = ctk.CTkFrame(dialog, fg_color="transparent")
+        controls.pack(padx=20, pady=(0, 10), fill="x")
+        filter_entry = ctk.CTkEntry(controls, placeholder_text="Filter folders...", width=300)
+        filter_entry.pack(side="left")
+        status_label = ctk.CTkLabel(controls, text="")
+        status_label.pack(side="left", padx=15)
+        refresh_button = ctk.CTkButton(controls, text="🔄 Refresh", width=100)
+        refresh_button.pack(side="right")
+        
+        columns = ("folder", "size", "alloc", "files", "dirs", "growth", "status", "scanned")
+        headings = {"folder": "Folder", "size": "Size", "alloc": "On Disk", "files": "Files", "dirs": "Folders",
+                    "growth": "Growth", "status": "Customization", "scanned": "Scanned"}
+        table = ttk.Treeview(dialog, columns=columns, show="headings")
+        for column in columns:
+            table.heading(column, text=headings[column], command=lambda c=column: sort_by(c))
+            table.column(column, width=360 if column == "folder" else 100, anchor="w" if column == "folder" else "e")
+        table.pack(padx=20, pady=(0, 20), fill="both", expand=True)
+        
+        rows = {}
+        state = {"key": "size", "reverse": True}
+        
+        def values(row):
+            if row["error"]:
+                return (row["folder"], "—", "—", "—", "—", "—", "—", row["error"])
+            growth = row["growth"]
+            growth_text = "—" if growth is None else ("+" if growth >= 0 else "-") + self.format_size(abs(growth))
+            scanned = datetime.fromtimestamp(row["scanned"]).strftime('%Y-%m-%d %H:%M')
+            return (row["folder"], self.format_size(row["size"]), self.format_size(row["alloc"]), row["files"],
+                    row["dirs"], growth_text, row["status"], scanned if row["live"] else f"{scanned} (cached)")
+        
+        def redraw():
+            # Sorting and filtering only touch rows already in memory
+            table.delete(*table.get_children())
+            for row in select(list(rows.values()), filter_entry.get(), state["key"], state["reverse"]):
+                table.insert("", "end", values=values(row))
+        
+        def sort_by(column):
+            if state["key"] == column:
+                state["reverse"] = not state["reverse"]
+            else:
+                state["key"] = column
+                state["reverse"] = column not in ("folder", "status")
+            redraw()
+        
+        def show_row(row):
+            if dialog.winfo_exists():
+                rows[row["folder"]] = row
+                redraw()
+        
+        def finished(message):
+            if dialog.winfo_exists():
+                status_label.configure(text=message)
+                refresh_button.configure(state="normal")
+        
+        def refresh():
+            refresh_button.configure(state="disabled")
+            status_label.configure(text=f"Scanning {len(favorites)} folders...")
+            
+            def worker():
+                try:
+                    with metrics.span("scan"):
+                        self.dashboard.refresh(favorites, on_row=lambda row: self.after(0, lambda: show_row(row)))
+                    self.after(0, lambda: finished(f"Updated {datetime.now().strftime('%H:%M:%S')}"))
+                except Exception as e:
+                    self.after(0, lambda error=e: finished(f"Scan failed: {error}"))
+            
+            threading.Thread(target=worker, daemon=True).start()
+        
+        def open_selected(event):
+            selection = table.selection()
+            if selection:
+                self.open_folder(table.item(selection[0], "values")[0])
+                dialog.destroy()
+        
+        refresh_button.configure(command=refresh)
+        filter_entry.bind("<KeyRelease>", lambda event: redraw())
+        table.bind("<Double-1>", open_selected)
+        
+        # Cached results first; live ones replace them as each scan finishes
+        for row in self.dashboard.cached(favorites):
+            rows[row["folder"]] = row
+        redraw()
+        refresh()
+    
+    def index_known_folders(self):
+        """Add favorites and recent folders to the folder finder index"""
+        known = self.config.get("favorites", []) + self.config.get("recent_folders", [])
+        paths = [os.path.abspath(folder) for folder in known if os.path.isdir(folder)]
+        if paths:
+            self.folder_index.update(paths)
+    
+    def show_find_folder(self):
+        """Find a folder by name among all indexed folders"""
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Find Folder")
+        dialog.geometry("800x500")
+        dialog.transient(self)
+        
+        ctk.CTkLabel(
+            dialog,
+            text="🔍 Find Folder",
+            font=ctk.CTkFont(family="Segoe UI", size=18, weight="bold")
+        ).pack(pady=(20, 10))
+        
+        query_entry = ctk.CTkEntry(dialog, placeholder_text="Type part of a folder name...", width=500)
+        query_entry.pack(padx=20, pady=(0, 5))
+        status_label = ctk.CTkLabel(dialog, text=f"{len(self.folder_index)} folders indexed", text_color="gray")
+        status_label.pack()
+        
+        results = tk.Listbox(dialog, font=("Segoe UI", 11), activestyle="none")
+        results.pack(padx=20, pady=(5, 20), fill="both", expand=True)
+        
+        favorites = [os.path.abspath(folder) for folder in self.config.get("favorites", [])]
+        
+        def search(event=None):
+            if event is not None and event.keysym in ("Return", "Up", "Down"):
+                return
+            # Queries run against the memory-mapped index, fast enough for every keystroke
+            matches = self.folder_index.search(query_entry.get(), limit=50, boost=favorites)
+            results.delete(0, tk.END)
+            for path in matches:
+                results.insert(tk.END, path)
+            if matches:
+                results.selection_set(0)
+        
+        def open_selected(event=None):
+            selection = results.curselection()
+            if selection:
+                folder = results.get(selection[0])
+                dialog.destroy()
+                if os.path.isdir(folder):
+                    self.open_folder(folder)
+                else:
+                    CTkMessagebox(title="Folder Not Found", message=f"{folder} no longer exists.", icon="warning")
+        
+        def move(step):
+            selection = results.curselection()
+            index = min(max((selection[0] if selection else -1) + step, 0), results.size() - 1)
+            if index >= 0:
+                results.selection_clear(0, tk.END)
+                results.selection_set(index)
+                results.see(index)
+        
+        query_entry.bind("<KeyRelease>", search)
+        query_entry.bind("<Return>", open_selected)
+        query_entry.bind("<Down>", lambda event: move(1))
+        query_entry.bind("<Up>", lambda event: move(-1))
+        results.bind("<Double-1>", open_selected)
+        results.bind("<Return>", open_selected)
+        query_entry.focus_set()
+    
     def show_recent(self):
         """Show recent folders dialog"""
         recent = self.config.get("recent_folders", [])
@@ -1057,12 +1452,12 @@ class FileFusionPro(ctk.CTk):
         """Open color chooser dialog"""
         color = colorchooser.askcolor(title="Choose Folder Color")[1]
         if color:
-            self.color_button.configure(fg_color=color, hover_color=self.adjust_color(color, -20))
+            self.color_button.configure(fg_color=color, hover_color=hover_variant(color))
             self.update_preview()
     
     def apply_preset_color(self, color):
         """Apply a preset color"""
-        self.color_button.configure(fg_color=color, hover_color=self.adjust_color(color, -20))
+        self.color_button.configure(fg_color=color, hover_color=hover_variant(color))
         self.update_preview()
     
     def update_custom_color(self, *args):
@@ -1073,17 +1468,82 @@ class FileFusionPro(ctk.CTk):
         
         color = f"#{r:02x}{g:02x}{b:02x}"
         self.color_preview.configure(fg_color=color)
+        self.update_color_details(color)
         self.hex_color_entry.delete(0, tk.END)
         self.hex_color_entry.insert(0, color)
         
         if self.current_folder:
-            self.color_button.configure(fg_color=color, hover_color=self.adjust_color(color, -20))
+            self.color_button.configure(fg_color=color, hover_color=hover_variant(color))
+    
+    def suggest_colors(self):
+        """Suggest folder colors from the selected icon file or the images in the folder"""
+        icon = getattr(self, "selected_icon", None)
+        source = icon if icon and os.path.isfile(icon) else self.current_folder
+        if not source:
+            CTkMessagebox(title="No Folder", message="Please select a folder or an icon file first.")
+            return
+        
+        cache = PaletteCache(str(self.config_file.parent / "palette_cache.json"))
+        budget = self.config.get("suggest_time_budget", 10.0)
+        self.update_status("Extracting dominant colors...")
+        
+        def progress(done, total):
+            self.after(0, lambda: self.progress_bar.set(done / total))
+        
+        def finished(palette, stats, error):
+            self.progress_bar.set(0)
+            if error:
+                self.update_status("Color suggestion failed")
+                CTkMessagebox(title="Error", message=f"Could not suggest colors:\n{error}", icon="cancel")
+                return
+            if not palette:
+                self.update_status("No images found to suggest colors from")
+                return
+            for swatch, (color, share) in zip(self.suggestion_swatches, palette):
+                swatch.configure(fg_color=color, hover_color=hover_variant(color), state="normal")
+            for swatch in self.suggestion_swatches[len(palette):]:
+                swatch.configure(fg_color="gray30", state="disabled")
+            if stats:
+                skipped = f", {stats['skipped']} skipped (time budget)" if stats["skipped"] else ""
+                self.update_status(f"Suggested colors from {stats['cached'] + stats['processed']} images{skipped}")
+            else:
+                self.update_status(f"Suggested colors from {os.path.basename(source)}")
+        
+        def worker():
+            try:
+                if os.path.isfile(source):
+                    palette, stats = image_palette(source, len(self.suggestion_swatches)), None
+                else:
+                    # Hash new images the way calibration found fastest for this volume
+                    profile = profile_for(self.config, source)
+                    palette, stats = folder_palette(source, len(self.suggestion_swatches), budget,
+                                                    cache=cache, progress=progress,
+                                                    hash_workers=profile["hash_workers"], use_mmap=profile["use_mmap"])
+                self.after(0, lambda: finished(palette, stats, None))
+            except Exception as e:
+                self.after(0, lambda error=e: finished(None, None, error))
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def update_color_details(self, color):
+        """Show the nearest named color and the tint ramp of the mixer color"""
+        name, named = self.palette.nearest(color)
+        self.nearest_color_label.configure(text=f"Nearest named color: {name} ({named})")
+        for swatch, ramp_color in zip(self.ramp_swatches, tint_ramp(color, len(self.ramp_swatches))):
+            swatch.configure(fg_color=ramp_color, hover_color=hover_variant(ramp_color))
+    
+    def apply_ramp_color(self, index):
+        """Use one step of the tint ramp as the folder color"""
+        color = self.ramp_swatches[index].cget("fg_color")
+        self.color_button.configure(fg_color=color, hover_color=hover_variant(color))
+        self.update_preview()
     
     def apply_hex_color(self, event=None):
         """Apply hex color from entry"""
         hex_color = self.hex_color_entry.get()
         if self.is_valid_hex(hex_color):
-            self.color_button.configure(fg_color=hex_color, hover_color=self.adjust_color(hex_color, -20))
+            self.color_button.configure(fg_color=hex_color, hover_color=hover_variant(hex_color))
+            self.update_color_details(hex_color)
             self.update_preview()
     
     def is_valid_hex(self, color):
@@ -1091,16 +1551,6 @@ class FileFusionPro(ctk.CTk):
         import re
         return bool(re.match(r'^#(?:[0-9a-fA-F]{3}){1,2}$', color))
     
-    def adjust_color(self, color, amount):
-        """Adjust color brightness"""
-        try:
-            color = color.lstrip('#')
-            rgb = tuple(int(color[i:i+2], 16) for i in (0, 2, 4))
-            adjusted = tuple(max(0, min(255, c + amount)) for c in rgb)
-            return f"#{adjusted[0]:02x}{adjusted[1]:02x}{adjusted[2]:02x}"
-        except:
-            return color
-    
     def select_icon(self, icon):
         """Select an icon from the library"""
         self.selected_icon = icon
@@ -1114,6 +1564,21 @@ class FileFusionPro(ctk.CTk):
             filetypes=[("Image files", "*.png *.ico *.jpg *.jpeg *.bmp")]
         )
         if file_path:
+            # Normalize every source format into a multi-size .ico
+            destination = os.path.join(
+                icons_directory(self.config_file.parent),
+                os.path.splitext(os.path.basename(file_path))[0] + ".ico"
+            )
+            try:
+                convert_to_ico(file_path, destination)
+            except Exception as e:
+                CTkMessagebox(title="Error", message=f"Could not convert icon:\n{e}", icon="cancel")
+                return
+            
+            if destination not in self.config["custom_icon_files"]:
+                self.config["custom_icon_files"].append(destination)
+                self.save_config()
+            self.refresh_icon_atlas([destination])
             self.update_status(f"Added custom icon: {file_path}")
             CTkMessagebox(title="Success", message="Custom icon added!", icon="check")
     
@@ -1131,8 +1596,15 @@ class FileFusionPro(ctk.CTk):
             return
         
         self.update_preview()
+        try:
+            entries = self.build_desktop_ini_entries(self.current_folder, assign=False)
+        except Exception as e:
+            CTkMessagebox(title="Error", message=f"Could not prepare icon:\n{e}", icon="cancel")
+            return
+        plan = build_plan([self.current_folder], entries, owned=self.icon_store.owns)
         self.update_status("Preview updated")
-        CTkMessagebox(title="Preview", message="Changes previewed. Click Apply to save.")
+        details = "\n".join(plan.diff(include_unchanged=True))
+        CTkMessagebox(title="Preview", message=f"{details}\n\n{plan.summary()}\n\nClick Apply to save.")
     
     def apply_customizations(self):
         """Apply customizations to folder"""
@@ -1151,7 +1623,8 @@ class FileFusionPro(ctk.CTk):
             self.after(10)
         
         # Save to desktop.ini (Windows)
-        self.apply_windows_customization()
+        with metrics.span("apply"):
+            self.apply_windows_customization()
         
         self.progress_bar.set(0)
         self.update_status("Customizations applied successfully!")
@@ -1162,25 +1635,94 @@ class FileFusionPro(ctk.CTk):
         if not self.current_folder:
             return
         
-        # This is a simplified version
-        # In a real app, this would modify desktop.ini and folder settings
-        desktop_ini = os.path.join(self.current_folder, "desktop.ini")
-        
         try:
-            with open(desktop_ini, 'w') as f:
-                f.write("[.ShellClassInfo]\n")
-                f.write(f"InfoTip=Customized with FileFusion Pro\n")
-                # More properties would be set here
-            
-            # Set hidden and system attributes
-            os.system(f'attrib +s +h "{desktop_ini}"')
-            
+            # Merges desktop.ini, marks it hidden+system and the folder read-only
+            entries = self.build_desktop_ini_entries(self.current_folder)
+            # The display name lives in desktop.ini too, so it is undone with the rest
+            name = self.folder_name_entry.get().strip()
+            if name and name != os.path.basename(self.current_folder):
+                entries["LocalizedResourceName"] = name
+            label = f"Customize {os.path.basename(self.current_folder) or self.current_folder}"
+            recorder = self.folder_history.begin(label, self.history_meta())
+            with Journal.create(self.journal_dir, label, recorder) as journal:
+                if volume_kind(self.current_folder) == NETWORK:
+                    # Timeouts and retries for the handful of round trips one folder takes
+                    failed = self.network_io.apply([(self.current_folder, entries)], self.shell_notifier, journal)
+                else:
+                    failed = journal.apply_pairs([(self.current_folder, entries)], self.shell_notifier)
+            recorder.commit()
+            for folder, error in failed:
+                print(f"Error applying customization to {folder}: {error}")
+            self.icon_store.save()
+            self.shell_notifier.flush()
         except Exception as e:
             print(f"Error applying customization: {e}")
     
+    def history_meta(self):
+        """Settings stored with a history entry"""
+        return {"color": self.selected_color(), "effect": self.effect_var.get(),
+                "name": self.folder_name_entry.get().strip() or None}
+    
+    def selected_color(self):
+        """Return the chosen folder color as hex, or None if none was picked"""
+        color = self.color_button.cget("fg_color")
+        return color if isinstance(color, str) and self.is_valid_hex(color) else None
+    
+    def selected_icon_digest(self):
+        """Import the chosen icon file, or the icon for the chosen color/effect, into the icon store"""
+        icon = getattr(self, "selected_icon", None)
+        if icon and os.path.isfile(icon):
+            return self.icon_store.add_icon(icon, profile_for(self.config, icon)["use_mmap"])
+        color = self.selected_color()
+        if not color:
+            return None
+        icon = color_icon_path(color, icons_directory(self.config_file.parent), self.effect_var.get())
+        return self.icon_store.add_icon(icon, profile_for(self.config, icon)["use_mmap"])
+    
+    def build_desktop_ini_entries(self, folder, digest=None, assign=True):
+        """Collect the [.ShellClassInfo] entries for the current settings
+        
+        With assign=False the icon path is computed without taking a
+        reference in the icon store (for dry runs).
+        """
+        entries = {"InfoTip": "Customized with FileFusion Pro"}
+        digest = digest or self.selected_icon_digest()
+        if digest:
+            resource = self.icon_store.assign(folder, digest) if assign else self.icon_store.resource_path(folder, digest)
+            entries["IconResource"] = f"{resource},0"
+        return entries
+    
     def update_preview(self):
         """Update folder preview"""
-        self.draw_default_preview()  # Simplified for example
+        if not self.current_folder:
+            self.draw_default_preview()
+            return
+        
+        canvas = self.preview_canvas
+        canvas.delete("all")
+        width = canvas.winfo_width() if canvas.winfo_width() > 10 else 300
+        height = canvas.winfo_height() if canvas.winfo_height() > 10 else 200
+        
+        color = self.selected_color() or self.config.get("default_color", "#3498db")
+        
+        # Render the folder glyph with Pillow so the preview matches the applied icon
+        size = max(64, min(width, height) - 100)
+        image = render_folder_icon(color, size, self.effect_var.get())
+        self.preview_image = ImageTk.PhotoImage(image)
+        canvas.create_image(width // 2, height // 2 - 20, image=self.preview_image)
+        
+        canvas.create_text(
+            width // 2, height // 2 + size // 2,
+            text=self.folder_name_entry.get() or os.path.basename(self.current_folder),
+            font=("Segoe UI", 14, "bold"),
+            fill="#ffffff" if self.theme_mode == "dark" else "#000000"
+        )
+    
+    def scan_folder(self, folder):
+        """Build the size tree of folder (shares through the asyncio front end)"""
+        if volume_kind(folder) == NETWORK:
+            return self.network_io.scan(folder)
+        return SizeTree.scan(folder, scheduler=self.io_scheduler)
     
     def update_stats(self):
         """Update folder statistics"""
@@ -1188,18 +1730,41 @@ class FileFusionPro(ctk.CTk):
             return
         
         try:
-            total_size = 0
-            file_count = 0
-            folder_count = 0
+            # One scan feeds both the totals and the size breakdown view
+            with metrics.span("scan"):
+                self.size_tree = self.scan_folder(self.current_folder)
+            metrics.count("folders_scanned", len(self.size_tree))
+            total_size = self.size_tree.size[0]
+            allocated_size = self.size_tree.alloc[0]
+            file_count = self.size_tree.files[0]
+            folder_count = self.size_tree.dirs[0]
             
-            for root, dirs, files in os.walk(self.current_folder):
-                folder_count += len(dirs)
-                file_count += len(files)
-                for file in files:
-                    try:
-                        total_size += os.path.getsize(os.path.join(root, file))
-                    except:
-                        pass
+            largest = self.size_tree.children(0)[:1]
+            largest_text = (
+                f"{self.size_tree.names[largest[0]]} ({self.format_size(self.size_tree.size[largest[0]])})"
+                if largest else "N/A"
+            )
+            largest_type = self.size_tree.top_extensions(1)
+            largest_type_text = (
+                f"{largest_type[0][0] or '(no extension)'} ({self.format_size(largest_type[0][1])})"
+                if largest_type else "N/A"
+            )
+            
+            # Compare with the previous snapshot, then record this one
+            previous = self.growth_history.latest(self.current_folder)
+            self.growth_history.append(self.current_folder, snapshot_from_tree(self.size_tree))
+            # Re-index the scanned folders (deleted ones drop out) off the UI thread
+            tree = self.size_tree
+            threading.Thread(target=lambda: self.folder_index.update(tree.paths(), root=tree.root),
+                             daemon=True).start()
+            if previous is not None:
+                growth = total_size - previous["size"]
+                growth_text = (
+                    f"{'+' if growth >= 0 else '-'}{self.format_size(abs(growth))} since "
+                    f"{datetime.fromtimestamp(previous['time']).strftime('%Y-%m-%d %H:%M')}"
+                )
+            else:
+                growth_text = "First scan"
             
             stats_text = f"""
 📊 Folder Statistics for: {os.path.basename(self.current_folder)}
@@ -1207,13 +1772,16 @@ class FileFusionPro(ctk.CTk):
 📁 Location: {self.current_folder}
 🗂️  Total Folders: {folder_count}
 📄 Total Files: {file_count}
-💾 Total Size: {self.format_size(total_size)}
+💾 Total Size: {self.format_size(total_size)} ({self.format_size(allocated_size)} on disk)
 📅 Created: {datetime.fromtimestamp(os.path.getctime(self.current_folder)).strftime('%Y-%m-%d %H:%M:%S')}
 ✏️  Modified: {datetime.fromtimestamp(os.path.getmtime(self.current_folder)).strftime('%Y-%m-%d %H:%M:%S')}
             
 📈 Analysis:
 • Average files per folder: {file_count/max(folder_count, 1):.1f}
-• Largest file type: N/A
+• Largest subfolder: {largest_text}
+• Hardlinks counted once: {self.size_tree.linked} ({self.format_size(self.size_tree.linked_size)} not double-counted)
+• Largest file type: {largest_type_text}
+• Growth: {growth_text}
 • Customization status: Not Applied
 """
             
@@ -1233,6 +1801,182 @@ class FileFusionPro(ctk.CTk):
             size_bytes /= 1024.0
         return f"{size_bytes:.2f} PB"
     
+    def run_deep_analysis(self):
+        """Analyze file types, largest folders and duplicate candidates within a memory budget"""
+        if not self.current_folder:
+            CTkMessagebox(title="No Folder", message="Please select a folder first.")
+            return
+        
+        folder = self.current_folder
+        budget = int(self.config.get("scan_memory_budget_mb", 256) * 1024 * 1024)
+        self.update_status("Running deep analysis...")
+        
+        def finished(summary, error):
+            if error:
+                self.update_status("Deep analysis failed")
+                CTkMessagebox(title="Error", message=f"Deep analysis failed:\n{error}", icon="cancel")
+                return
+            
+            extensions = "\n".join(
+                f"   {ext:<10} {count:>8} files  {self.format_size(size)}"
+                for ext, count, size in summary["extensions"]
+            )
+            largest = "\n".join(
+                f"   {self.format_size(size):>12}  {os.path.relpath(path, folder)}"
+                for path, size in summary["largest_folders"]
+            )
+            report = (
+                f"🔬 Deep Analysis for: {os.path.basename(folder)}\n"
+                f"💾 Total: {self.format_size(summary['total_size'])} in {summary['files']} files\n"
+                f"📑 File types:\n{extensions}\n"
+                f"📂 Largest folders:\n{largest}\n"
+                f"♊ Duplicate candidates: {summary['duplicate_groups']} same-size groups, "
+                f"up to {self.format_size(summary['duplicate_candidate_bytes'])} reclaimable\n"
+                f"🧠 Peak memory: {self.format_size(summary['peak_rss'])} "
+                f"(budget {self.format_size(summary['memory_budget'])}, {summary['spills']} spills to disk)\n"
+            )
+            self.stats_text.configure(state="normal")
+            self.stats_text.delete("1.0", tk.END)
+            self.stats_text.insert("1.0", report)
+            self.stats_text.configure(state="disabled")
+            self.update_status("Deep analysis complete")
+        
+        def worker():
+            try:
+                with BoundedScan(folder, budget) as scan:
+                    summary = scan.run().summary()
+                self.after(0, lambda: finished(summary, None))
+            except Exception as e:
+                self.after(0, lambda error=e: finished(None, error))
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def export_stats_report(self):
+        """Export per-folder stats of the current folder (or all favorites) to CSV, JSON Lines or HTML"""
+        roots = [self.current_folder] if self.current_folder else self.config.get("favorites", [])
+        if not roots:
+            CTkMessagebox(title="No Folder", message="Please select a folder first.")
+            return
+        
+        path = filedialog.asksaveasfilename(
+            title="Export Report",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("HTML", "*.html")]
+        )
+        if not path:
+            return
+        self.update_status("Exporting report...")
+        
+        def finished(summary, error):
+            if error:
+                self.update_status("Report export failed")
+                CTkMessagebox(title="Error", message=f"Report export failed:\n{error}", icon="cancel")
+                return
+            self.update_status(f"Exported {summary['rows']} folders to {os.path.basename(path)}")
+            CTkMessagebox(title="Success", message=f"Report saved:\n{path}", icon="check")
+        
+        def worker():
+            # Rows stream from the walk to the file, so memory stays flat on huge trees
+            try:
+                summary = export_report(
+                    roots, path,
+                    progress=lambda rows: self.after(0, lambda: self.update_status(f"Exporting report... {rows} folders"))
+                )
+                self.after(0, lambda: finished(summary, None))
+            except Exception as e:
+                self.after(0, lambda error=e: finished(None, error))
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def show_size_breakdown(self):
+        """Show a treemap of subfolder sizes for the current folder"""
+        if not self.current_folder:
+            CTkMessagebox(title="No Folder", message="Please select a folder first.")
+            return
+        
+        # Reuse the tree from the last stats scan when it covers this folder
+        if self.size_tree is None or self.size_tree.find(self.current_folder) != 0:
+            self.update_status("Scanning folder sizes...")
+            self.update_stats()
+        if self.size_tree is None:
+            return
+        
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Size Breakdown")
+        dialog.geometry("900x650")
+        dialog.transient(self)
+        
+        header = ctk.CTkFrame(dialog, fg_color="transparent")
+        header.pack(pady=(20, 10), padx=20, fill="x")
+        
+        up_button = ctk.CTkButton(header, text="⬆ Up", width=70)
+        up_button.pack(side="left")
+        
+        path_label = ctk.CTkLabel(
+            header,
+            text="",
+            font=ctk.CTkFont(family="Segoe UI", size=14, weight="bold"),
+            anchor="w"
+        )
+        path_label.pack(side="left", padx=15, fill="x", expand=True)
+        
+        canvas = tk.Canvas(
+            dialog,
+            bg="#2b2b2b" if self.theme_mode == "dark" else "#f0f0f0",
+            highlightthickness=0
+        )
+        canvas.pack(padx=20, pady=(0, 20), fill="both", expand=True)
+        
+        tree = self.size_tree
+        state = {"node": 0}
+        palette = ["#3498db", "#2ecc71", "#e74c3c", "#f39c12", "#9b59b6", "#1abc9c",
+                   "#34495e", "#e67e22", "#27ae60", "#8e44ad", "#d35400", "#c0392b"]
+        
+        def draw(event=None):
+            node = state["node"]
+            canvas.delete("all")
+            path_label.configure(
+                text=f"📁 {tree.path(node)}  —  {self.format_size(tree.size[node])}, "
+                     f"{tree.files[node]} files"
+            )
+            up_button.configure(state="normal" if node > 0 else "disabled")
+            
+            width = max(canvas.winfo_width(), 100)
+            height = max(canvas.winfo_height(), 100)
+            rows = tree.breakdown(node)
+            if not rows:
+                canvas.create_text(width // 2, height // 2, text="Empty folder", fill="gray",
+                                   font=("Segoe UI", 14))
+                return
+            
+            rects = squarify([row[1] for row in rows], 0, 0, width, height)
+            for i, x, y, w, h in rects:
+                label, size, child = rows[i]
+                color = palette[i % len(palette)] if child >= 0 else "gray40"
+                tag = f"item{i}"
+                canvas.create_rectangle(x, y, x + w, y + h, fill=color, outline="#1e1e1e",
+                                        width=2, tags=(tag,))
+                if w > 60 and h > 30:
+                    canvas.create_text(x + w / 2, y + h / 2, text=f"{label}\n{self.format_size(size)}",
+                                       fill="#ffffff", font=("Segoe UI", 11), width=w - 10,
+                                       justify="center", tags=(tag,))
+                if child >= 0 and tree.first_child[child] != -1:
+                    canvas.tag_bind(tag, "<Button-1>", lambda e, c=child: drill(c))
+                    canvas.tag_bind(tag, "<Enter>", lambda e: canvas.configure(cursor="hand2"))
+                    canvas.tag_bind(tag, "<Leave>", lambda e: canvas.configure(cursor=""))
+        
+        def drill(node):
+            state["node"] = node
+            draw()
+        
+        def go_up():
+            if state["node"] > 0:
+                drill(tree.parent[state["node"]])
+        
+        up_button.configure(command=go_up)
+        canvas.bind("<Configure>", draw)
+        self.update_status(f"Size breakdown: {len(tree)} folders scanned")
+    
     def update_status(self, message):
         """Update status bar message"""
         self.status_label.configure(text=message)
@@ -1251,8 +1995,83 @@ class FileFusionPro(ctk.CTk):
         self.update_preview()
     
     def capture_icon(self):
-        """Capture icon from screen"""
-        CTkMessagebox(title="Info", message="Icon capture feature would be implemented here.")
+        """Capture a screen region as a multi-size icon"""
+        if getattr(self, "capturer", None) is None:
+            self.capturer = Capturer(self.icon_store)
+        if self.capturer.source is None:
+            CTkMessagebox(title="Capture", message="Screen capture is not available on this system.", icon="cancel")
+            return
+        
+        # Hide the app and let the user drag a rectangle on a dimmed full-screen overlay
+        self.withdraw()
+        overlay = tk.Toplevel(self)
+        overlay.attributes("-fullscreen", True)
+        overlay.attributes("-alpha", 0.3)
+        overlay.attributes("-topmost", True)
+        overlay.configure(cursor="crosshair")
+        canvas = tk.Canvas(overlay, bg="black", highlightthickness=0)
+        canvas.pack(fill="both", expand=True)
+        start = {}
+        
+        def press(event):
+            start.update(x=event.x, y=event.y, x_root=event.x_root, y_root=event.y_root)
+            start["rect"] = canvas.create_rectangle(event.x, event.y, event.x, event.y, outline="white", width=2)
+        
+        def drag(event):
+            if "rect" in start:
+                canvas.coords(start["rect"], start["x"], start["y"], event.x, event.y)
+        
+        def release(event):
+            overlay.destroy()
+            self.deiconify()
+            if "rect" not in start:
+                return
+            region = (start["x_root"], start["y_root"], event.x_root, event.y_root)
+            # Give the overlay a moment to disappear before grabbing the screen
+            self.after(150, lambda: self.capture_region(region))
+        
+        def cancel(event=None):
+            overlay.destroy()
+            self.deiconify()
+            self.update_status("Capture cancelled")
+        
+        canvas.bind("<ButtonPress-1>", press)
+        canvas.bind("<B1-Motion>", drag)
+        canvas.bind("<ButtonRelease-1>", release)
+        overlay.bind("<Escape>", cancel)
+        overlay.focus_force()
+    
+    def capture_region(self, region):
+        """Capture region on the worker thread and select the resulting icon"""
+        try:
+            future = self.capturer.capture(region)
+        except ValueError as e:
+            self.update_status(str(e))
+            return
+        self.update_status("Capturing icon...")
+        
+        def finished(result, error):
+            if error:
+                self.update_status("Capture failed")
+                CTkMessagebox(title="Error", message=f"Could not capture icon:\n{error}", icon="cancel")
+                return
+            if result.path not in self.config["custom_icon_files"]:
+                self.config["custom_icon_files"].append(result.path)
+                self.save_config()
+            self.refresh_icon_atlas([result.path])
+            self.icon_store.save()
+            self.selected_icon = result.path
+            note = " (unchanged, reused)" if result.reused else ""
+            self.update_status(f"Captured icon {result.digest[:12]}{note}")
+        
+        def done(future):
+            try:
+                result = future.result()
+                self.after(0, lambda: finished(result, None))
+            except Exception as e:
+                self.after(0, lambda error=e: finished(None, error))
+        
+        future.add_done_callback(done)
     
     def reset_all_customizations(self):
         """Reset all customizations for current folder"""
@@ -1270,8 +2089,91 @@ class FileFusionPro(ctk.CTk):
         
         if msg.get() == "Yes":
             self.update_status("Resetting customizations...")
-            # Implementation would go here
-            self.after(1000, lambda: self.update_status("Customizations reset"))
+            recorder = self.folder_history.begin(f"Reset {os.path.basename(self.current_folder) or self.current_folder}")
+            try:
+                before = read_desktop_ini(self.current_folder)
+                if reset_folder(self.current_folder):
+                    recorder.record(self.current_folder, before, read_desktop_ini(self.current_folder))
+                    self.shell_notifier.add(self.current_folder)
+                    self.shell_notifier.flush()
+            except OSError as e:
+                CTkMessagebox(title="Error", message=f"Could not reset folder:\n{e}", icon="cancel")
+                return
+            recorder.commit()
+            self.icon_store.release(self.current_folder)
+            freed = self.icon_store.collect_garbage(self.kept_icons())
+            self.icon_store.save()
+            self.update_status(f"Customizations reset ({self.format_size(freed)} of unused icons removed)")
+    
+    def kept_icons(self):
+        """Digests garbage collection must keep: undo/redo targets, plus library icons that live in the store"""
+        selected = getattr(self, "selected_icon", None)
+        library = self.config.get("custom_icon_files", []) + ([selected] if selected else [])
+        # Captured icons exist only as store blobs, referenced by the library rather than by folders
+        digests = (self.icon_store.digest_of("", path) for path in library)
+        return self.history_icons() | {digest for digest in digests if digest}
+    
+    def history_icons(self):
+        """Digests of stored icons an undo or redo could still point a folder at"""
+        digests = (self.icon_store.digest_of(folder, resource) for folder, resource in self.folder_history.icon_resources())
+        return {digest for digest in digests if digest} | self.folder_history.copied_icons()
+    
+    def undo_customization(self):
+        """Revert the most recent customization (one folder or a whole batch)"""
+        self.replay_history(undo=True)
+    
+    def redo_customization(self):
+        """Re-apply the most recently undone customization"""
+        self.replay_history(undo=False)
+    
+    def replay_history(self, undo):
+        """Run an undo or redo in the background"""
+        history = self.folder_history
+        if getattr(self, "history_busy", False):
+            return
+        if not (history.can_undo() if undo else history.can_redo()):
+            self.update_status("Nothing to undo" if undo else "Nothing to redo")
+            return
+        action = "Undo" if undo else "Redo"
+        self.history_busy = True
+        self.progress_bar.set(0)
+        self.update_status(f"{action} in progress...")
+        
+        def progress(done, total):
+            self.after(0, lambda: self.progress_bar.set(done / total))
+        
+        def finished(result, error):
+            self.history_busy = False
+            self.progress_bar.set(0)
+            if error:
+                self.update_status(f"{action} failed")
+                CTkMessagebox(title="Error", message=f"{action} failed:\n{error}", icon="cancel")
+                return
+            summary, failed, conflicts = result
+            self.update_status(f"{action}: {summary['label']} ({summary['folders']} folders)")
+            if failed or conflicts:
+                details = "\n".join(
+                    [f"{os.path.basename(f)}: {e}" for f, e in failed[:10]] +
+                    [f"{os.path.basename(f)}: changed since" for f in conflicts[:10]]
+                )
+                CTkMessagebox(
+                    title=action,
+                    message=f"{len(failed)} folders failed, {len(conflicts)} were changed again and left alone:\n{details}",
+                    icon="warning"
+                )
+        
+        def worker():
+            try:
+                replay = history.undo if undo else history.redo
+                result = replay(profile_for(self.config, self.current_folder or "")["apply_workers"], progress,
+                                notifier=self.shell_notifier, icons=self.icon_store)
+                self.shell_notifier.flush()
+                self.icon_store.save()
+                self.after(0, lambda: finished(result, None))
+            except Exception as e:
+                self.after(0, lambda error=e: finished(None, error))
+        
+        threading.Thread(target=worker, daemon=True).start()
     
     def create_backup(self):
         """Create backup of customizations"""
@@ -1283,7 +2185,7 @@ class FileFusionPro(ctk.CTk):
         """Open settings dialog"""
         dialog = ctk.CTkToplevel(self)
         dialog.title("Settings")
-        dialog.geometry("500x400")
+        dialog.geometry("500x520")
         dialog.transient(self)
         dialog.grab_set()
         
@@ -1293,14 +2195,448 @@ class FileFusionPro(ctk.CTk):
             font=ctk.CTkFont(family="Segoe UI", size=18, weight="bold")
         ).pack(pady=20)
         
-        # Settings options would go here
-        # ...
+        # Icon store
+        store_frame = ctk.CTkFrame(dialog, corner_radius=8)
+        store_frame.pack(pady=10, padx=20, fill="x")
+        
+        ctk.CTkLabel(
+            store_frame,
+            text="Icon Store",
+            font=ctk.CTkFont(family="Segoe UI", size=16, weight="bold")
+        ).pack(pady=(10, 5), padx=10, anchor="w")
+        
+        store_label = ctk.CTkLabel(store_frame, text="", font=ctk.CTkFont(family="Segoe UI", size=12), justify="left")
+        store_label.pack(pady=5, padx=10, anchor="w")
+        
+        def refresh_store():
+            stats = self.icon_store.stats()
+            store_label.configure(
+                text=f"{stats['icons']} icons shared by {stats['references']} folders "
+                     f"({stats['portable_copies']} portable copies)\n"
+                     f"Stored: {self.format_size(stats['stored_bytes'])}, "
+                     f"saved: {self.format_size(stats['bytes_saved'])}"
+            )
+        
+        def clean_store():
+            freed = self.icon_store.collect_garbage(self.kept_icons())
+            self.icon_store.save()
+            refresh_store()
+            self.update_status(f"Removed {self.format_size(freed)} of unused icons")
+        
+        policy_menu = ctk.CTkOptionMenu(
+            store_frame,
+            values=list(IconStore.POLICIES),
+            command=self.set_icon_path_policy,
+            width=140
+        )
+        policy_menu.set(self.icon_store.policy)
+        policy_menu.pack(side="left", pady=(5, 10), padx=10)
+        
+        ctk.CTkButton(store_frame, text="Clean Up Unused Icons", command=clean_store).pack(
+            side="right", pady=(5, 10), padx=10
+        )
+        refresh_store()
+        
+        # Diagnostics
+        diagnostics_frame = ctk.CTkFrame(dialog, corner_radius=8)
+        diagnostics_frame.pack(pady=10, padx=20, fill="x")
+        
+        ctk.CTkLabel(
+            diagnostics_frame,
+            text="Diagnostics",
+            font=ctk.CTkFont(family="Segoe UI", size=16, weight="bold")
+        ).pack(pady=(10, 5), padx=10, anchor="w")
+        
+        instrumentation_switch = ctk.CTkSwitch(
+            diagnostics_frame,
+            text="Record operation timings",
+            command=lambda: self.set_instrumentation(instrumentation_switch.get() == 1)
+        )
+        instrumentation_switch.pack(pady=5, padx=10, anchor="w")
+        if metrics.enabled:
+            instrumentation_switch.select()
+        
+        ctk.CTkButton(
+            diagnostics_frame,
+            text="📈 Open Diagnostics Panel",
+            command=self.open_diagnostics,
+            height=35,
+            font=ctk.CTkFont(family="Segoe UI", size=13),
+            corner_radius=8,
+            fg_color="gray20",
+            hover_color="gray25"
+        ).pack(pady=(5, 10), padx=10, fill="x")
         
         dialog.mainloop()
     
+    def set_icon_path_policy(self, policy):
+        """Choose whether desktop.ini stores absolute or relative icon paths"""
+        self.icon_store.policy = policy
+        self.config["icon_path_policy"] = policy
+        self.save_config()
+    
+    def set_instrumentation(self, enabled):
+        """Turn operation timing on or off"""
+        metrics.enabled = enabled
+        self.config["instrumentation_enabled"] = enabled
+        self.save_config()
+        self.update_status(f"Instrumentation {'enabled' if enabled else 'disabled'}")
+    
+    def open_diagnostics(self):
+        """Show collected timings, counters and profiles"""
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Diagnostics")
+        dialog.geometry("800x600")
+        dialog.transient(self)
+        
+        ctk.CTkLabel(
+            dialog,
+            text="📈 Diagnostics",
+            font=ctk.CTkFont(family="Segoe UI", size=18, weight="bold")
+        ).pack(pady=(20, 10))
+        
+        report_text = ctk.CTkTextbox(dialog, font=ctk.CTkFont(family="Consolas", size=12))
+        report_text.pack(padx=20, pady=10, fill="both", expand=True)
+        
+        def refresh(extra=""):
+            report_text.configure(state="normal")
+            report_text.delete("1.0", tk.END)
+            report_text.insert("1.0", metrics.report() + extra)
+            report_text.configure(state="disabled")
+        
+        def reset():
+            metrics.reset()
+            refresh()
+        
+        def export():
+            file_path = filedialog.asksaveasfilename(
+                title="Export Diagnostics",
+                defaultextension=".json",
+                filetypes=[("JSON files", "*.json")]
+            )
+            if file_path:
+                metrics.export_json(file_path)
+                self.update_status(f"Diagnostics exported to {file_path}")
+        
+        def profile_next():
+            metrics.profile_next(profile_combobox.get())
+            self.update_status(f"Next '{profile_combobox.get()}' operation will be profiled")
+        
+        def measure():
+            overhead = metrics.measure_overhead()
+            refresh(
+                f"\n\nSpan overhead: {overhead['disabled_ns']:.0f} ns disabled, "
+                f"{overhead['enabled_ns']:.0f} ns enabled (empty loop {overhead['baseline_ns']:.0f} ns)"
+            )
+        
+        buttons_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+        buttons_frame.pack(padx=20, pady=(0, 20), fill="x")
+        
+        for text, command in [("Refresh", refresh), ("Reset", reset), ("Export JSON", export),
+                              ("Measure Overhead", measure)]:
+            ctk.CTkButton(buttons_frame, text=text, command=command, width=120).pack(side="left", padx=5)
+        
+        profile_combobox = ctk.CTkComboBox(buttons_frame, values=list(SPANS), state="readonly", width=150)
+        profile_combobox.set("apply")
+        ctk.CTkButton(buttons_frame, text="Profile Next", command=profile_next, width=110).pack(side="right", padx=5)
+        profile_combobox.pack(side="right", padx=5)
+        
+        refresh()
+    
     def batch_apply(self):
-        """Apply customizations to multiple folders"""
-        CTkMessagebox(title="Info", message="Batch apply feature would be implemented here.")
+        """Plan customizations for all subfolders of a folder, then apply or save the plan"""
+        parent = filedialog.askdirectory(title="Select Parent Folder (all subfolders will be customized)")
+        if not parent:
+            return
+        
+        try:
+            folders = [entry.path for entry in os.scandir(parent) if entry.is_dir(follow_symlinks=False)]
+        except OSError as e:
+            CTkMessagebox(title="Error", message=f"Could not read folder:\n{e}", icon="cancel")
+            return
+        if not folders:
+            CTkMessagebox(title="No Folders", message="The selected folder has no subfolders.")
+            return
+        self.plan_batch(folders, f"Batch apply {parent}")
+    
+    def bring_to_front(self):
+        """Raise the window (another launch was started without folders)"""
+        self.deiconify()
+        self.lift()
+        self.focus_force()
+    
+    def customize_from_shell(self, folders):
+        """Plan one batch for the folders handed over by context-menu launches"""
+        folders = [folder for folder in folders if os.path.isdir(folder)]
+        if not folders:
+            return
+        self.bring_to_front()
+        if len(folders) == 1:
+            self.open_folder(folders[0])
+        label = f"Customize {os.path.basename(folders[0])}" if len(folders) == 1 else f"Customize {len(folders)} folders"
+        self.plan_batch(folders, label)
+    
+    def plan_batch(self, folders, label):
+        """Plan customizations for folders with the current settings, then apply or save the plan"""
+        try:
+            digest = self.selected_icon_digest()
+        except Exception as e:
+            CTkMessagebox(title="Error", message=f"Could not prepare icon:\n{e}", icon="cancel")
+            return
+        parent = os.path.dirname(folders[0])
+        profile = profile_for(self.config, folders[0])
+        self.progress_bar.set(0)
+        self.update_status(f"Planning {len(folders)} folders...")
+        
+        def progress(done, total):
+            self.after(0, lambda: self.progress_bar.set(done / total))
+        
+        def planned(plan, error):
+            self.progress_bar.set(0)
+            if error:
+                self.update_status("Planning failed")
+                CTkMessagebox(title="Error", message=f"Could not plan batch:\n{error}", icon="cancel")
+                return
+            plan.meta = {"label": label, "digest": digest}
+            self.update_status(plan.summary())
+            details = "\n".join(plan.diff(limit=15))
+            msg = CTkMessagebox(
+                title="Batch Plan",
+                message=f"{plan.summary()}\n\n{details}",
+                option_1="Cancel",
+                option_2="Save Plan",
+                option_3="Apply"
+            )
+            choice = msg.get()
+            if choice == "Apply":
+                self.run_plan(plan, profile)
+            elif choice == "Save Plan":
+                path = filedialog.asksaveasfilename(
+                    title="Save Plan",
+                    defaultextension=".ffplan",
+                    filetypes=[("FileFusion plan", "*.ffplan *.json")]
+                )
+                if path:
+                    plan.save(path)
+                    self.update_status(f"Plan saved to {path}")
+        
+        def worker():
+            try:
+                entries_for = lambda folder: self.build_desktop_ini_entries(folder, digest, assign=False)
+                plan = build_plan(folders, entries_for(parent), entries_for, self.icon_store.owns,
+                                  profile["scan_workers"], progress=progress)
+                self.after(0, lambda: planned(plan, None))
+            except Exception as e:
+                self.after(0, lambda error=e: planned(None, error))
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def apply_saved_plan(self, path=None):
+        """Execute a plan saved from the batch planner (asks for the file unless given)"""
+        path = path or filedialog.askopenfilename(title="Open Plan", filetypes=[("FileFusion plan", "*.ffplan *.json")])
+        if not path:
+            return
+        try:
+            plan = Plan.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            CTkMessagebox(title="Error", message=f"Could not load plan:\n{e}", icon="cancel")
+            return
+        pending = plan.pending()
+        if not pending:
+            CTkMessagebox(title="Nothing to Do", message=plan.summary())
+            return
+        self.run_plan(plan, profile_for(self.config, pending[0][0]))
+    
+    def run_plan(self, plan, profile):
+        """Apply a plan's create/modify folders in the background"""
+        digest = plan.meta.get("digest")
+        total = len(plan.pending())
+        self.progress_bar.set(0)
+        self.update_status(f"Customizing {total} folders...")
+        
+        def prepare(folder, entries):
+            # Take the icon reference only now that the folder is really written
+            return self.build_desktop_ini_entries(folder, digest) if digest else entries
+        
+        def progress(done):
+            self.after(0, lambda: self.progress_bar.set(done / total))
+        
+        def finished(failed, skipped, error):
+            self.progress_bar.set(0)
+            if error:
+                self.update_status("Batch apply failed")
+                CTkMessagebox(title="Error", message=f"Batch apply failed:\n{error}", icon="cancel")
+                return
+            for folder, _ in failed:
+                self.icon_store.release(folder)
+            self.icon_store.save()
+            done = total - len(failed) - len(skipped)
+            self.update_status(f"Customized {done} of {total} folders")
+            if failed or skipped:
+                details = "\n".join(f"{os.path.basename(f)}: {e}" for f, e in (failed + skipped)[:10])
+                CTkMessagebox(
+                    title="Batch Apply",
+                    message=f"{len(failed)} folders failed, {len(skipped)} changed since planning and were skipped:\n{details}",
+                    icon="warning"
+                )
+            else:
+                CTkMessagebox(title="Success", message=f"{done} folders customized!", icon="check")
+        
+        pending = plan.pending()
+        network = self.network_io if pending and volume_kind(pending[0][0]) == NETWORK else None
+        
+        def worker():
+            try:
+                label = plan.meta.get("label", "Plan")
+                recorder = self.folder_history.begin(label, plan.meta)
+                with metrics.span("apply"), Journal.create(self.journal_dir, label, recorder) as journal:
+                    failed, skipped = execute_plan(
+                        plan, profile["apply_workers"], profile["batch_size"], progress,
+                        self.shell_notifier, journal, prepare, owned=self.icon_store.owns,
+                        scheduler=self.io_scheduler, network=network
+                    )
+                recorder.commit()
+                self.shell_notifier.flush()
+                self.after(0, lambda: finished(failed, skipped, None))
+            except Exception as e:
+                self.after(0, lambda error=e: finished(None, None, error))
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def auto_customize(self):
+        """Classify every folder under a root by content and customize matches"""
+        root = filedialog.askdirectory(title="Select Root Folder to Auto-Customize")
+        if not root:
+            return
+        
+        rules = self.config.get("rules") or DEFAULT_RULES
+        try:
+            rule_set = RuleSet(rules)
+        except (ValueError, re.error) as e:
+            CTkMessagebox(title="Error", message=f"Invalid customization rules:\n{e}", icon="cancel")
+            return
+        
+        profile = profile_for(self.config, root)
+        matched = {}
+        self.update_status("Auto-customizing folders...")
+        
+        def progress(done):
+            self.after(0, lambda: self.update_status(f"Auto-customizing... {done} folders done"))
+        
+        def finished(failed, error):
+            if error:
+                self.update_status("Auto-customize failed")
+                CTkMessagebox(title="Error", message=f"Auto-customize failed:\n{error}", icon="cancel")
+                return
+            for folder, _ in failed:
+                self.icon_store.release(folder)
+            self.icon_store.save()
+            total = sum(matched.values())
+            summary = "\n".join(f"{name}: {count}" for name, count in sorted(matched.items(), key=lambda x: -x[1]))
+            self.update_status(f"Auto-customized {total - len(failed)} folders")
+            CTkMessagebox(
+                title="Auto-Customize",
+                message=f"{total - len(failed)} folders customized, {len(failed)} failed.\n\n{summary}",
+                icon="check" if not failed else "warning"
+            )
+        
+        def worker():
+            try:
+                label = f"Auto-customize {root}"
+                recorder = self.folder_history.begin(label)
+                # Streamed, so the journal keeps the source a resume regenerates the batch from
+                source = {"auto_customize": root, "rules": rules}
+                with metrics.span("apply"), Journal.create(self.journal_dir, label, recorder, source) as journal:
+                    failed = apply_stream(self.auto_customize_items(root, rule_set, matched), profile["apply_workers"],
+                                          profile["batch_size"], progress, self.shell_notifier, journal)
+                recorder.commit()
+                self.shell_notifier.flush()
+                self.after(0, lambda: finished(failed, None))
+            except Exception as e:
+                self.after(0, lambda error=e: finished(None, error))
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def auto_customize_items(self, root, rule_set, matched=None):
+        """(folder, entries) pairs for every folder under root that a rule matches"""
+        # Store one icon per rule up front; the scan then streams straight into the writers
+        icons_dir = icons_directory(self.config_file.parent)
+        digests = {}
+        for rule in rule_set.rules:
+            icon = rule.get("icon")
+            if not icon or not os.path.exists(icon):
+                icon = color_icon_path(rule.get("color", self.config["default_color"]), icons_dir)
+            digests[rule["name"]] = self.icon_store.add_icon(icon, profile_for(self.config, icon)["use_mmap"])
+        
+        for folder, rule in classify_tree(root, rule_set):
+            if matched is not None:
+                matched[rule["name"]] = matched.get(rule["name"], 0) + 1
+            yield folder, {
+                "IconResource": f"{self.icon_store.assign(folder, digests[rule['name']])},0",
+                "InfoTip": rule.get("infotip", rule["name"])
+            }
+    
+    def check_interrupted_batches(self):
+        """Resume, roll back or discard batches whose journal was left behind"""
+        def finished(recovery, choice, failed, error):
+            if error:
+                self.update_status(f"{choice} failed")
+                CTkMessagebox(title="Error", message=f"{choice} failed:\n{error}", icon="cancel")
+                return
+            self.icon_store.save()
+            self.update_status(f"{choice} finished: {recovery.label}")
+            if failed:
+                details = "\n".join(f"{os.path.basename(f)}: {e}" for f, e in failed[:10])
+                CTkMessagebox(title=choice, message=f"{len(failed)} folders failed:\n{details}", icon="warning")
+        
+        for recovery in Recovery.find(self.journal_dir):
+            pending = recovery.pending()
+            touched = sum(1 for info in recovery.folders.values() if info["before"] is not None)
+            source = recovery.source or {}
+            if recovery.completed or not touched and not pending and not source:
+                recovery.discard()
+                continue
+            
+            unfinished = f"{len(pending)} unfinished"
+            if "auto_customize" in source:
+                unfinished += f" plus any not reached yet under {source['auto_customize']}"
+            msg = CTkMessagebox(
+                title="Interrupted Batch",
+                message=f"'{recovery.label}' did not finish.\n\n"
+                        f"{len(recovery.folders) - len(pending)} folders done, {unfinished}.\n\n"
+                        f"Resume the batch, or roll back the {touched} folders it changed?",
+                icon="warning",
+                option_1="Discard",
+                option_2="Roll Back",
+                option_3="Resume"
+            )
+            choice = msg.get()
+            if choice is None:
+                continue  # dialog closed; ask again next start
+            if choice == "Discard":
+                recovery.discard()
+                continue
+            
+            self.update_status(f"{choice}: {recovery.label}...")
+            
+            def worker(recovery=recovery, choice=choice):
+                try:
+                    if choice == "Resume":
+                        source = recovery.source or {}
+                        root = source.get("auto_customize")
+                        profile = profile_for(self.config, root or next(iter(recovery.folders), ""))
+                        # A streamed batch is regenerated from its source; done folders are skipped
+                        items = self.auto_customize_items(root, RuleSet(source["rules"])) if root else None
+                        failed = recovery.resume(profile["apply_workers"], profile["batch_size"],
+                                                 notifier=self.shell_notifier, items=items)
+                    else:
+                        failed = recovery.rollback(self.shell_notifier)
+                    self.shell_notifier.flush()
+                    self.after(0, lambda: finished(recovery, choice, failed, None))
+                except Exception as e:
+                    self.after(0, lambda error=e: finished(recovery, choice, None, error))
+            
+            threading.Thread(target=worker, daemon=True).start()
     
     def export_settings(self):
         """Export customization settings"""
@@ -1315,33 +2651,137 @@ class FileFusionPro(ctk.CTk):
         CTkMessagebox(title="Info", message="Reset all feature would be implemented here.")
     
     def register_file_types(self):
-        """Register custom file types"""
-        CTkMessagebox(title="Info", message="File type registration would be implemented here.")
+        """Register the .ffplan file type (saved batch plans open in FileFusion Pro)"""
+        self.update_shell_integration(
+            "Plan file type",
+            lambda install: file_types_plan(self.launch_command(), self.resource_path("icon.ico"), install)
+        )
     
     def create_desktop_shortcut(self):
         """Create desktop shortcut"""
         CTkMessagebox(title="Info", message="Shortcut creation would be implemented here.")
     
     def add_to_context_menu(self):
-        """Add to Windows context menu"""
-        CTkMessagebox(title="Info", message="Context menu integration would be implemented here.")
+        """Add 'Customize with FileFusion Pro' to the folder context menu"""
+        self.update_shell_integration(
+            "Context menu",
+            lambda install: context_menu_plan(self.launch_command(), self.resource_path("icon.ico"), install)
+        )
+    
+    def launch_command(self):
+        """Quoted command line that starts this app (for registry commands)"""
+        if getattr(sys, "frozen", False):
+            return f'"{sys.executable}"'
+        # pythonw avoids a console window flashing up on every launch
+        interpreter = os.path.join(os.path.dirname(sys.executable), "pythonw.exe")
+        if not os.path.exists(interpreter):
+            interpreter = sys.executable
+        return f'"{interpreter}" "{os.path.abspath(__file__)}"'
+    
+    def update_shell_integration(self, name, build):
+        """Install the registry plan build(True), or offer to remove it if it is already in place"""
+        backend = WinRegBackend()
+        try:
+            # Only keys that differ are written; a failed batch is rolled back by apply
+            changes = diff_registry(build(True), backend)
+            verb = "installed"
+            if not changes:
+                msg = CTkMessagebox(
+                    title=name,
+                    message=f"{name} integration is already installed. Remove it?",
+                    icon="question",
+                    option_1="Keep",
+                    option_2="Remove"
+                )
+                if msg.get() != "Remove":
+                    return
+                changes = diff_registry(build(False), backend)
+                verb = "removed"
+            apply_registry(changes, backend)
+        except OSError as e:
+            CTkMessagebox(title="Error", message=f"Registry update failed (nothing was changed):\n{e}", icon="cancel")
+            return
+        self.shell_notifier.backend.notify(SHCNE_ASSOCCHANGED, None)
+        self.update_status(f"{name} integration {verb} ({len(changes)} registry keys updated)")
+        CTkMessagebox(title="Success", message=f"{name} integration {verb}.", icon="check")
     
     def optimize_performance(self):
-        """Optimize application performance"""
-        CTkMessagebox(title="Info", message="Performance optimization would be implemented here.")
+        """Calibrate worker counts and I/O strategy for a volume"""
+        target = self.current_folder or filedialog.askdirectory(title="Select Folder on the Volume to Optimize")
+        if not target:
+            return
+        
+        self.progress_bar.set(0)
+        self.update_status("Calibrating performance...")
+        
+        def progress(fraction, message):
+            self.after(0, lambda: (self.progress_bar.set(fraction), self.update_status(message)))
+        
+        def finished(profile, error):
+            self.progress_bar.set(0)
+            if error:
+                self.update_status("Calibration failed")
+                CTkMessagebox(title="Error", message=f"Calibration failed:\n{error}", icon="cancel")
+                return
+            save_profile(self.config, profile)
+            self.save_config()
+            self.io_scheduler.refresh_limits()
+            self.update_status(f"Performance profile saved for {profile['volume']}")
+            CTkMessagebox(
+                title="Performance Optimized",
+                message=(
+                    f"Volume: {profile['volume']}\n"
+                    f"Scan workers: {profile['scan_workers']}\n"
+                    f"Apply workers: {profile['apply_workers']} (batches of {profile['batch_size']})\n"
+                    f"Hash workers: {profile['hash_workers']}, mmap: {'on' if profile['use_mmap'] else 'off'}"
+                ),
+                icon="check"
+            )
+        
+        def worker():
+            try:
+                profile = calibrate(target, progress=progress)
+                self.after(0, lambda: finished(profile, None))
+            except Exception as e:
+                self.after(0, lambda error=e: finished(None, error))
+        
+        threading.Thread(target=worker, daemon=True).start()
     
     def run(self):
         """Run the application"""
-        self.mainloop()
+        try:
+            self.mainloop()
+        finally:
+            if self.instance is not None:
+                self.instance.close()
+
+def parse_arguments(argv):
+    """Command line: FileFusion.py [--customize FOLDER ...] [--plan FILE]"""
+    parser = argparse.ArgumentParser(prog="FileFusion", description="FileFusion Pro - Ultimate Folder Customizer")
+    parser.add_argument("--customize", nargs="+", metavar="FOLDER", default=[],
+                        help="customize folders in the running window (Explorer context menu)")
+    parser.add_argument("--plan", metavar="FILE", help="open a saved batch plan (.ffplan file type)")
+    return parser.parse_args(argv)
 
 def main():
     """Main entry point"""
+    args = parse_arguments(sys.argv[1:])
+    # Later launches hand their folders to the first one and exit before building any UI
+    instance = claim(str(Path.home() / ".filefusionpro"), args.customize, plan=args.plan)
+    if instance is None:
+        return
+    if args.customize:
+        instance.submit(args.customize)
     try:
-        app = FileFusionPro()
+        app = FileFusionPro(instance)
+        if args.plan:
+            app.after(500, lambda: app.apply_saved_plan(os.path.abspath(args.plan)))
         app.run()
     except Exception as e:
         print(f"Error starting application: {e}")
         CTkMessagebox(title="Error", message=f"Failed to start application:\n{e}", icon="cancel")
 
 if __name__ == "__main__":
+    # Process pools (color suggestions) re-launch the frozen executable on Windows
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,11 @@
+"""
+FileFusion Pro - benchmark suite
+
+Run headless from the repository root:
+
+    python -m benchmarks                      # full run, results saved as JSON
+    python -m benchmarks --quick              # smaller trees, fewer repetitions
+    python -m benchmarks --baseline results/old.json
+
+Results are written to benchmarks/results/ unless --output is given.
+"""
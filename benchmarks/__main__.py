@@ -0,0 +1,92 @@
+"""
+Command line entry point: python -m benchmarks
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+
+from benchmarks import cases
+from benchmarks.harness import CASES, compare, environment, format_seconds, measure, save_results
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="FileFusion Pro benchmarks")
+    parser.add_argument("--quick", action="store_true", help="smaller data sets and fewer repetitions")
+    parser.add_argument("--repeat", type=int, help="timed repetitions per case (default 5, quick 3)")
+    parser.add_argument("--only", action="append", default=[], help="run cases whose name contains this text")
+    parser.add_argument("--list", action="store_true", help="list cases and exit")
+    parser.add_argument("--output", help="results file (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown vs baseline (default 0.10)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on regressions")
+    parser.add_argument("--workdir", help="directory for synthetic data (default: a temporary directory)")
+    parser.add_argument("--keep", action="store_true", help="keep synthetic data after the run")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    selected = {
+        name: entry for name, entry in CASES.items()
+        if not args.only or any(text in name for text in args.only)
+    }
+
+    if args.list:
+        for name, (_, description) in selected.items():
+            print(f"{name:<28}{description}")
+        return 0
+
+    repeat = args.repeat or (3 if args.quick else 5)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="filefusion-bench-")
+    context = cases.Context(workdir, quick=args.quick)
+    results = {}
+    failures = []
+
+    try:
+        for name, (factory, _) in selected.items():
+            func = factory(context)
+            if func is None:
+                print(f"{name:<28}skipped")
+                results[name] = {"skipped": True}
+                continue
+            try:
+                stats = measure(func, repeat=repeat)
+            except AssertionError as e:
+                print(f"{name:<28}FAILED: {e}")
+                results[name] = {"failed": str(e)}
+                failures.append(name)
+                continue
+            results[name] = stats
+            print(f"{name:<28}median {format_seconds(stats['median_s']):>12}  "
+                  f"min {format_seconds(stats['min_s']):>12}  stdev {format_seconds(stats['stdev_s']):>12}")
+    finally:
+        for cleanup in context.cleanups:
+            cleanup()
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    meta = environment()
+    meta.update({"quick": args.quick, "repeat": repeat})
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    save_results(output, results, meta)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        rows, regressions = compare(results, args.baseline, args.threshold)
+        print(f"\n{'Case':<28}{'Baseline':>12}{'Current':>12}{'Change':>10}")
+        for name, before, after, ratio in rows:
+            marker = "  REGRESSION" if name in regressions else ""
+            print(f"{name:<28}{format_seconds(before):>12}{format_seconds(after):>12}{(ratio - 1) * 100:>+9.1f}%{marker}")
+        if regressions and args.fail_on_regression:
+            return 1
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
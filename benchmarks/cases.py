@@ -0,0 +1,715 @@
+"""
+Benchmark cases - folder scans, desktop.ini batches, icon conversion and previews
+"""
+
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import case
+from benchmarks.synth import TREE_SHAPES, desktop_ini_samples, make_icons, make_images, make_tree, random_colors
+from fusion.atlas import IconAtlas, load_thumbnail
+from fusion.bounded import BoundedScan
+from fusion.capture import Capturer, MemorySource
+from fusion.colors import Palette, oklab_to_rgb_array, ramp_luts, recolor, rgb_to_oklab_array
+from fusion.customize import apply_batch
+from fusion.desktopini import SHELL_CLASS_INFO, DesktopIni
+from fusion.dirindex import DirectoryIndex
+from fusion.dominant import PaletteCache, folder_palette, image_palette
+from fusion.history import History
+from fusion.inodes import InodeSet
+from fusion.instance import CUSTOMIZE, InstanceServer, send
+from fusion.journal import Journal, Recovery
+from fusion.netio import LatencyFS, NetworkIO
+from fusion.planner import build_plan, execute_plan
+from fusion.registry import MemoryBackend, RegistryPlan, apply as apply_registry, diff as diff_registry, rollback
+from fusion.report import FORMATS, export
+from fusion.rules import DEFAULT_RULES, RuleSet, classify_tree
+from fusion.scheduler import VolumeScheduler
+from fusion.shellnotify import NotifyScheduler, RecordingBackend
+from fusion.store import IconStore
+from fusion.timeseries import DAY, TimeSeriesStore
+from fusion.sizetree import SizeTree
+
+PARALLEL_WORKERS = 8
+BOUNDED_BUDGET = 2 * 1024 * 1024
+# Allowance on top of interpreter start-up RSS and the configured budget
+RSS_SLACK = 4 * 1024 * 1024
+# Allowed slowdown of a journaled batch apply versus the raw one
+JOURNAL_OVERHEAD = 0.10
+# Simulated per-job I/O latency and per-volume limit for the scheduler cases
+SCHEDULER_JOB_S = 0.002
+SCHEDULER_LIMIT = 2
+# Simulated round-trip time of a network share
+SHARE_LATENCY = 0.002
+# Icons in the synthetic library for the atlas cases (a fifth with --quick)
+ICON_LIBRARY = 5000
+ATLAS_CELL = 48
+# (device, inode) pairs fed to the seen-inode set (a fifth with --quick)
+INODE_PAIRS = 1_000_000
+# Folders with a year of daily growth snapshots (a fifth with --quick)
+GROWTH_FOLDERS = 200
+# Indexed folder paths for the folder finder cases (a fifth with --quick)
+FINDER_PATHS = 1_000_000
+FINDER_QUERIES = ("invoices", "proj 2023", "s", "pht", "backup old", "xyzq")
+# File types in the synthetic registry plan (a fifth with --quick) and simulated cost of one registry call
+REGISTRY_TYPES = 200
+REGISTRY_CALL_S = 0.0001
+
+
+class Context:
+    """Shared state for one benchmark run; synthetic data is built lazily"""
+
+    def __init__(self, workdir, quick=False):
+        self.workdir = workdir
+        self.quick = quick
+        self._trees = {}
+        self._images = None
+        self._icons = None
+        # Called once after the run (servers, pools) before the workdir is removed
+        self.cleanups = []
+
+    def path(self, *parts):
+        return os.path.join(self.workdir, *parts)
+
+    def tree(self, shape):
+        """Return the root of a synthetic tree, building it on first use"""
+        if shape not in self._trees:
+            self._trees[shape] = make_tree(shape, self.path("trees", shape), self.quick)
+        return self._trees[shape]
+
+    def icons(self):
+        """Return the synthetic icon library, building it on first use"""
+        if self._icons is None:
+            self._icons = make_icons(self.path("icons"), ICON_LIBRARY // 5 if self.quick else ICON_LIBRARY)
+        return self._icons
+
+    def images(self):
+        """Return the synthetic image set, building it on first use"""
+        if self._images is None:
+            self._images = make_images(self.path("images"), 5 if self.quick else 20)
+        return self._images
+
+
+def _pillow_available():
+    try:
+        import PIL  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _numpy_available():
+    try:
+        import numpy  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _random_pixels(count, seed=1234):
+    import numpy as np
+
+    return np.random.default_rng(seed).integers(0, 256, (count, 3), dtype=np.uint8)
+
+
+def _register_scan_cases(shape):
+    @case(f"scan.{shape}.serial", f"SizeTree.scan over the '{shape}' tree, one thread")
+    def scan_serial(ctx):
+        root = ctx.tree(shape)
+        return lambda: SizeTree.scan(root)
+
+    @case(f"scan.{shape}.parallel", f"SizeTree.scan over the '{shape}' tree, {PARALLEL_WORKERS} threads")
+    def scan_parallel(ctx):
+        root = ctx.tree(shape)
+        return lambda: SizeTree.scan(root, workers=PARALLEL_WORKERS)
+
+
+for _shape in TREE_SHAPES:
+    _register_scan_cases(_shape)
+
+
+@case("inodes.add", "Remember (device, inode) pairs with about 10% repeats in the compact seen-inode set")
+def inodes_add(ctx):
+    count = INODE_PAIRS // 5 if ctx.quick else INODE_PAIRS
+    rng = random.Random(1234)
+    pairs = [(rng.randrange(4), rng.randrange(count)) for _ in range(count)]
+
+    def run():
+        seen = InodeSet()
+        for device, inode in pairs:
+            seen.add(device, inode)
+    return run
+
+
+def _register_report_case(fmt):
+    @case(f"report.tiny.{fmt}", f"Stream a per-folder {fmt} report of the 'tiny' tree to disk")
+    def report(ctx):
+        root = ctx.tree("tiny")
+        return lambda: export([root], ctx.path(f"report.{fmt}"), fmt)
+
+
+for _format in FORMATS:
+    _register_report_case(_format)
+
+
+@case("scan.tiny.bounded", "BoundedScan over the 'tiny' tree with a 2 MB budget (spills to disk)")
+def scan_bounded(ctx):
+    root = ctx.tree("tiny")
+
+    def run():
+        with BoundedScan(root, BOUNDED_BUDGET, spill_dir=ctx.workdir) as scan:
+            scan.run().summary()
+    return run
+
+
+# Runs fusion.bounded.main with the given arguments (if any) and prints peak RSS
+_RSS_PROBE = """
+import contextlib, io, json, sys
+from fusion.bounded import main, peak_rss
+if len(sys.argv) > 1:
+    with contextlib.redirect_stdout(io.StringIO()):
+        main(sys.argv[1:])
+print(json.dumps(peak_rss()))
+"""
+
+
+def _child_peak_rss(*args):
+    """Run the probe in a fresh interpreter and return its peak RSS in bytes"""
+    result = subprocess.run(
+        [sys.executable, "-c", _RSS_PROBE, *args],
+        check=True, capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@case("memory.bounded_scan", "Peak RSS of a bounded scan must stay under start-up RSS + budget + slack")
+def memory_cap(ctx):
+    root = ctx.tree("tiny")
+
+    def run():
+        baseline = _child_peak_rss()
+        peak = _child_peak_rss(root, "--budget-mb", str(BOUNDED_BUDGET / (1024 * 1024)), "--spill-dir", ctx.workdir)
+        cap = baseline + BOUNDED_BUDGET + RSS_SLACK
+        assert peak <= cap, f"peak RSS {peak / 1e6:.1f} MB exceeds cap {cap / 1e6:.1f} MB"
+    return run
+
+
+@case("rules.classify.tiny", "Classify every folder of the 'tiny' tree with the default rules")
+def rules_classify(ctx):
+    root = ctx.tree("tiny")
+    rule_set = RuleSet(DEFAULT_RULES)
+    return lambda: sum(1 for _ in classify_tree(root, rule_set))
+
+
+def _batch_folders(ctx):
+    root = ctx.tree("wide")
+    return [entry.path for entry in os.scandir(root) if entry.is_dir()]
+
+
+def _alternating_apply(folders, workers, journal_dir=None):
+    """Apply with a different InfoTip on every call so each run really writes"""
+    runs = [0]
+
+    def run():
+        runs[0] += 1
+        entries = {"InfoTip": f"FileFusion Pro benchmark {runs[0]}"}
+        if journal_dir is None:
+            apply_batch(folders, entries, workers=workers, batch_size=64)
+            return
+        with Journal.create(journal_dir, "benchmark") as journal:
+            apply_batch(folders, entries, workers=workers, batch_size=64, journal=journal)
+    return run
+
+
+@case("apply.batch.serial", "desktop.ini batch write over the 'wide' tree, one thread")
+def apply_serial(ctx):
+    return _alternating_apply(_batch_folders(ctx), 1)
+
+
+@case("apply.batch.parallel", f"desktop.ini batch write over the 'wide' tree, {PARALLEL_WORKERS} threads")
+def apply_parallel(ctx):
+    return _alternating_apply(_batch_folders(ctx), PARALLEL_WORKERS)
+
+
+@case("apply.batch.journaled", "Journaled desktop.ini batch write over the 'wide' tree, one thread")
+def apply_journaled(ctx):
+    return _alternating_apply(_batch_folders(ctx), 1, ctx.path("journal"))
+
+
+@case("apply.journal.overhead", f"Journaled apply must stay within {JOURNAL_OVERHEAD:.0%} of raw apply")
+def journal_overhead(ctx):
+    folders = _batch_folders(ctx)
+    raw = _alternating_apply(folders, 1)
+    journaled = _alternating_apply(folders, 1, ctx.path("journal"))
+
+    def run():
+        # Interleave the two so drift in disk speed hits both equally
+        raw_times, journaled_times = [], []
+        for _ in range(3):
+            for func, times in ((raw, raw_times), (journaled, journaled_times)):
+                start = time.perf_counter()
+                func()
+                times.append(time.perf_counter() - start)
+        overhead = min(journaled_times) / min(raw_times) - 1
+        assert overhead <= JOURNAL_OVERHEAD, f"journal overhead {overhead:.1%} exceeds {JOURNAL_OVERHEAD:.0%}"
+    return run
+
+
+@case("apply.journal.resume", "Interrupt a journaled plan partway, then resume must finish every folder")
+def journal_resume(ctx):
+    folders = _batch_folders(ctx)[:40]
+    runs = [0]
+
+    def run():
+        runs[0] += 1
+        entries = {"InfoTip": f"FileFusion Pro resume {runs[0]}"}
+        journal_dir = ctx.path("resume", str(runs[0]))
+        plan = build_plan(folders, entries, workers=1)
+        calls = [0]
+
+        def prepare(folder, folder_entries):
+            calls[0] += 1
+            if calls[0] > len(folders) // 4:
+                raise RuntimeError("simulated crash")
+            return folder_entries
+
+        try:
+            with Journal.create(journal_dir, "benchmark") as journal:
+                execute_plan(plan, batch_size=2, journal=journal, prepare=prepare)
+        except RuntimeError:
+            pass
+        recovery, = Recovery.find(journal_dir)
+        assert len(recovery.folders) == len(folders), f"journal knows {len(recovery.folders)} of {len(folders)} folders"
+        assert recovery.pending(), "nothing left to resume after the crash"
+        failed = recovery.resume(batch_size=2)
+        assert not failed, failed
+        assert not Recovery.find(journal_dir), "resumed journal was not removed"
+        unfinished = [folder for folder in folders
+                      if DesktopIni.load(os.path.join(folder, "desktop.ini")).get(SHELL_CLASS_INFO, "InfoTip")
+                      != entries["InfoTip"]]
+        assert not unfinished, f"{len(unfinished)} folders not finished by resume"
+    return run
+
+
+@case("apply.batch.noop", "Re-apply unchanged settings over the 'wide' tree (reads only, writes skipped)")
+def apply_noop(ctx):
+    folders = _batch_folders(ctx)
+    entries = {"InfoTip": "FileFusion Pro unchanged"}
+    apply_batch(folders, entries)
+    return lambda: apply_batch(folders, entries, workers=1, batch_size=64)
+
+
+def _growth_snapshots(folders, days=365, seed=1234):
+    rng = random.Random(seed)
+    start = 1_700_000_000
+    items = []
+    for folder in range(folders):
+        size = rng.randrange(1 << 30)
+        for day in range(days):
+            size += rng.randrange(-1 << 20, 8 << 20)
+            items.append((f"/share/folder_{folder:04d}", {
+                "time": start + day * DAY, "size": size, "alloc": size + 4096 * day, "files": 1000 + day,
+                "dirs": 40, "extensions": {".jpg": size // 2, ".docx": size // 8, "(other)": size - size // 2 - size // 8},
+            }))
+    return items
+
+
+@case("timeseries.append.year", "Append a year of daily snapshots of many folders to a fresh growth store")
+def timeseries_append(ctx):
+    items = _growth_snapshots(GROWTH_FOLDERS // 5 if ctx.quick else GROWTH_FOLDERS)
+    runs = []
+
+    def run():
+        store = TimeSeriesStore(ctx.path("growth", f"append-{len(runs)}.db"))
+        runs.append(store)
+        store.append_many(items)
+        store.close()
+    return run
+
+
+@case("timeseries.chart.year", "Weekly size series of a year of daily snapshots for every folder")
+def timeseries_chart(ctx):
+    folders = GROWTH_FOLDERS // 5 if ctx.quick else GROWTH_FOLDERS
+    store = TimeSeriesStore(ctx.path("growth", "chart.db"))
+    store.append_many(_growth_snapshots(folders))
+    ctx.cleanups.append(store.close)
+
+    def run():
+        for folder in range(folders):
+            store.values(f"/share/folder_{folder:04d}", "size", step=7 * DAY)
+    return run
+
+
+@case("history.undo.wide", f"Undo or redo a recorded batch over the 'wide' tree, {PARALLEL_WORKERS} threads")
+def history_undo(ctx):
+    folders = _batch_folders(ctx)
+    history = History(ctx.path("history"))
+    recorder = history.begin("benchmark")
+    with Journal.create(ctx.path("journal"), "benchmark", recorder) as journal:
+        apply_batch(folders, {"InfoTip": "FileFusion Pro history"}, journal=journal)
+    recorder.commit()
+
+    def run():
+        # Alternate so every call restores real files
+        replay = history.undo if history.can_undo() else history.redo
+        replay(PARALLEL_WORKERS)
+    return run
+
+
+@case("plan.wide", f"Dry-run plan of the 'wide' tree, {PARALLEL_WORKERS} threads")
+def plan_wide(ctx):
+    folders = _batch_folders(ctx)
+    entries = {"InfoTip": "FileFusion Pro plan"}
+    return lambda: build_plan(folders, entries, workers=PARALLEL_WORKERS)
+
+
+@case("plan.wide.incremental", "Re-plan the 'wide' tree reusing an earlier plan for unchanged files")
+def plan_incremental(ctx):
+    folders = _batch_folders(ctx)
+    entries = {"InfoTip": "FileFusion Pro plan"}
+    apply_batch(folders[::2], {"InfoTip": "FileFusion Pro earlier"})
+    previous = build_plan(folders, entries, workers=PARALLEL_WORKERS)
+    return lambda: build_plan(folders, entries, workers=PARALLEL_WORKERS, previous=previous)
+
+
+@case("notify.coalesce", "Plan and emit Explorer notifications for a large batch (recording backend)")
+def notify_coalesce(ctx):
+    count = 5000 if ctx.quick else 50000
+    folders = [os.path.join(ctx.workdir, f"parent_{i % 200:03d}", f"folder_{i:06d}") for i in range(count)]
+    folders += [os.path.join(ctx.workdir, f"lonely_{i:04d}") for i in range(50)]
+
+    def run():
+        scheduler = NotifyScheduler(RecordingBackend(), rate=1e9, burst=1e9)
+        for folder in folders:
+            scheduler.add(folder)
+        scheduler.flush()
+    return run
+
+
+@case("desktopini.parse", "Parse real-world-style desktop.ini samples (ANSI and UTF-16)")
+def desktopini_parse(ctx):
+    samples = desktop_ini_samples(500 if ctx.quick else 5000)
+    return lambda: [DesktopIni.parse(data) for data in samples]
+
+
+@case("desktopini.merge", "Parse, merge owned keys and serialize desktop.ini samples")
+def desktopini_merge(ctx):
+    samples = desktop_ini_samples(500 if ctx.quick else 5000)
+    entries = {"IconResource": "C:\\Icons\\store\\folder.ico,0", "InfoTip": "Shared team folder"}
+
+    def run():
+        for data in samples:
+            document = DesktopIni.parse(data)
+            if document.merge(SHELL_CLASS_INFO, entries):
+                document.serialize()
+    return run
+
+
+@case("icon.convert", "Convert synthetic PNGs to multi-size .ico files")
+def icon_convert(ctx):
+    if not _pillow_available():
+        return None
+    from fusion.icons import convert_to_ico
+
+    images = ctx.images()
+    output = ctx.path("ico")
+    os.makedirs(output, exist_ok=True)
+
+    def run():
+        for i, image in enumerate(images):
+            convert_to_ico(image, os.path.join(output, f"icon_{i:04d}.ico"))
+    return run
+
+
+@case("preview.render", "Render folder preview images in many colors")
+def preview_render(ctx):
+    if not _pillow_available():
+        return None
+    from fusion.icons import render_folder_icon
+
+    colors = random_colors(5 if ctx.quick else 20)
+
+    def run():
+        for color in colors:
+            render_folder_icon(color, 256)
+    return run
+
+
+@case("colors.convert.1m", "sRGB -> OKLab -> sRGB round trip of 1M colors (NumPy)")
+def colors_convert(ctx):
+    if not _numpy_available():
+        return None
+    pixels = _random_pixels(1_000_000)
+    return lambda: oklab_to_rgb_array(rgb_to_oklab_array(pixels))
+
+
+@case("colors.snap.1m", "Snap 1M colors to the named palette through the lookup table")
+def colors_snap(ctx):
+    if not _numpy_available() or not _pillow_available():
+        return None
+    pixels = _random_pixels(1_000_000)
+    palette = Palette()
+    palette.lut()
+    return lambda: palette.snap_array(pixels)
+
+
+@case("colors.palette.lut", "Build the 6-bit palette lookup table")
+def colors_lut(ctx):
+    if not _numpy_available() or not _pillow_available():
+        return None
+    return lambda: Palette().lut()
+
+
+@case("colors.recolor", "Build 256 tint ramps and recolor an icon with each")
+def colors_recolor(ctx):
+    if not _numpy_available() or not _pillow_available():
+        return None
+    from PIL import Image
+
+    image = Image.open(ctx.images()[0]).resize((256, 256))
+    colors = random_colors(256)
+
+    def run():
+        for lut in ramp_luts(colors):
+            recolor(image, lut)
+    return run
+
+
+@case("dominant.image", "Dominant colors of each synthetic image (draft/reduce + k-means)")
+def dominant_image(ctx):
+    if not _numpy_available() or not _pillow_available():
+        return None
+    paths = ctx.images()
+    return lambda: [image_palette(path) for path in paths]
+
+
+@case("dominant.folder", "Folder color suggestion over a folder of JPEG photos, process pool, cold cache")
+def dominant_folder(ctx):
+    if not _numpy_available() or not _pillow_available():
+        return None
+    from PIL import Image
+
+    folder = ctx.path("photos")
+    if not os.path.isdir(folder):
+        sources = ctx.images()
+        count = 100 if ctx.quick else 1000
+        os.makedirs(folder)
+        for i in range(count):
+            with Image.open(sources[i % len(sources)]) as image:
+                image.convert("RGB").rotate(i % 360).save(os.path.join(folder, f"photo_{i:05d}.jpg"), quality=85)
+    return lambda: folder_palette(folder, budget=600, cache=PaletteCache())
+
+
+def _capture_source(ctx):
+    """A 1920x1080 in-memory 'screen' built from a synthetic image"""
+    from PIL import Image
+
+    with Image.open(ctx.images()[0]) as image:
+        screen = image.convert("RGBA").resize((1920, 1080))
+    return MemorySource(bytearray(screen.tobytes()), screen.size)
+
+
+@case("capture.encode", "Capture distinct screen regions to stored icons (grab, crop, resize, encode)")
+def capture_encode(ctx):
+    if not _pillow_available():
+        return None
+    capturer = Capturer(IconStore(ctx.path("capture-store")), _capture_source(ctx))
+    offsets = iter(range(10 ** 6))
+
+    def run():
+        # A new offset every call so nothing is served from the cache
+        offset = next(offsets) % 800
+        capturer.capture((offset, 100, offset + 512, 612)).result()
+    return run
+
+
+@case("capture.repeat", "Re-capture an unchanged region (answered from the pixel-hash cache)")
+def capture_repeat(ctx):
+    if not _pillow_available():
+        return None
+    capturer = Capturer(IconStore(ctx.path("capture-store")), _capture_source(ctx))
+    capturer.capture((100, 100, 612, 612)).result()
+    return lambda: capturer.capture((100, 100, 612, 612)).result()
+
+
+@case("instance.handoff", "Hand one folder to a running instance over the local socket/pipe (connect, auth, ack)")
+def instance_handoff(ctx):
+    directory = ctx.path("instance")
+    os.makedirs(directory, exist_ok=True)
+    server = InstanceServer(directory)
+    if not server.start():
+        return None
+    server.set_handler(lambda folders: None)
+    ctx.cleanups.append(server.close)
+    folders = iter(range(10 ** 9))
+
+    def run():
+        assert send(directory, (CUSTOMIZE, [ctx.path(f"folder{next(folders)}")]))
+    return run
+
+
+def _register_scheduler_cases(volumes):
+    @case(f"scheduler.volumes.{volumes}",
+          f"400 simulated I/O jobs spread over {volumes} volume(s), {SCHEDULER_LIMIT} per volume")
+    def scheduler_volumes(ctx):
+        # Paths "/v<n>/..." map to fake volumes, so throughput depends only on the scheduling
+        scheduler = VolumeScheduler(lambda path, kind: SCHEDULER_LIMIT,
+                                    volume_of=lambda path: (path.split("/")[1], "unknown"))
+        ctx.cleanups.append(scheduler.shutdown)
+        paths = [f"/v{i % volumes}/job{i}/item" for i in range(400)]
+
+        def run():
+            for future in [scheduler.submit(path, time.sleep, SCHEDULER_JOB_S) for path in paths]:
+                future.result()
+        return run
+
+
+for _volumes in (1, 4):
+    _register_scheduler_cases(_volumes)
+
+
+@case("netio.scan.wide", f"asyncio scan of the 'wide' tree behind a {SHARE_LATENCY * 1000:.0f} ms-per-round-trip share")
+def netio_scan(ctx):
+    root = ctx.tree("wide")
+    network = NetworkIO(LatencyFS(latency=SHARE_LATENCY))
+    ctx.cleanups.append(network.close)
+    return lambda: network.scan(root)
+
+
+@case("netio.apply.wide", f"asyncio batch apply over the 'wide' tree behind a {SHARE_LATENCY * 1000:.0f} ms share")
+def netio_apply(ctx):
+    folders = _batch_folders(ctx)
+    network = NetworkIO(LatencyFS(latency=SHARE_LATENCY))
+    ctx.cleanups.append(network.close)
+    runs = iter(range(10 ** 9))
+
+    def run():
+        entries = {"InfoTip": f"FileFusion Pro share {next(runs)}"}
+        assert not network.apply([(folder, entries) for folder in folders])
+    return run
+
+
+@case("icons.load.perfile", "Open and decode every library icon file as a grid thumbnail")
+def icons_load_perfile(ctx):
+    if not _pillow_available():
+        return None
+    icons = ctx.icons()
+    return lambda: [load_thumbnail(path, ATLAS_CELL) for path in icons]
+
+
+@case("icons.load.atlas", "Open the icon atlas and cut every library thumbnail from its mapped pages")
+def icons_load_atlas(ctx):
+    if not _pillow_available() or not _numpy_available():
+        return None
+    icons = ctx.icons()
+    directory = ctx.path("atlas")
+    IconAtlas(directory, ATLAS_CELL).update(icons)
+
+    def run():
+        atlas = IconAtlas(directory, ATLAS_CELL)
+        for path in icons:
+            atlas.thumbnail(path)
+    return run
+
+
+@case("icons.atlas.incremental", "Check the whole library against the atlas and add 20 new icons")
+def icons_atlas_incremental(ctx):
+    if not _pillow_available() or not _numpy_available():
+        return None
+    icons = ctx.icons()
+    directory = ctx.path("atlas-incremental")
+    atlas = IconAtlas(directory, ATLAS_CELL)
+    atlas.update(icons)
+    extra = make_icons(ctx.path("icons-extra"), 20, seed=99)
+
+    def run():
+        # Re-add the extras as new entries each time
+        for path in extra:
+            atlas.entries.pop(os.path.normcase(os.path.abspath(path)), None)
+        atlas.update(icons + extra)
+    return run
+
+
+def _finder_paths(count):
+    """Deterministic folder paths built from a small vocabulary, up to 8 levels deep"""
+    rng = random.Random(7)
+    words = ["projects", "invoices", "photos", "backup", "old", "music", "src", "build", "docs", "2023",
+             "2024", "clients", "archive", "drafts", "reports", "videos", "assets", "tmp", "node", "final"]
+    paths = []
+    stack = [os.sep + "data"]
+    while len(paths) < count:
+        parent = stack[rng.randrange(len(stack))]
+        path = parent + os.sep + f"{rng.choice(words)}_{rng.randrange(1000)}"
+        paths.append(path)
+        if path.count(os.sep) < 8:
+            stack.append(path)
+    return paths
+
+
+@case("finder.build", "Build the folder finder index (paths, names, trigram postings) from scratch")
+def finder_build(ctx):
+    if not _numpy_available():
+        return None
+    paths = _finder_paths(FINDER_PATHS // 5 if ctx.quick else FINDER_PATHS)
+    index = DirectoryIndex(ctx.path("finder-build"))
+
+    def run():
+        index.build(paths)
+    return run
+
+
+@case("finder.search", "Ranked folder finder queries (short, multi-word, fuzzy, no match) on a memory-mapped index")
+def finder_search(ctx):
+    if not _numpy_available():
+        return None
+    directory = ctx.path("finder-search")
+    DirectoryIndex(directory).build(_finder_paths(FINDER_PATHS // 5 if ctx.quick else FINDER_PATHS))
+    index = DirectoryIndex(directory)
+
+    def run():
+        for query in FINDER_QUERIES:
+            index.search(query, limit=20)
+    return run
+
+
+def _registry_plan(types):
+    """A file-type registration plan: extension, ProgID, icon and open command per type"""
+    plan = RegistryPlan()
+    for number in range(types):
+        extension = rf"Software\Classes\.ff{number:03d}"
+        progid = rf"Software\Classes\FileFusionPro.Type{number:03d}"
+        plan.set(extension, "", f"FileFusionPro.Type{number:03d}")
+        plan.set(extension, "Content Type", "application/json")
+        plan.set(extension, "PerceivedType", "text")
+        plan.set(progid, "", f"FileFusion type {number}")
+        plan.set(progid, "EditFlags", 0x10000, kind=4)
+        plan.set(progid + r"\DefaultIcon", "", r"C:\FileFusion\icon.ico")
+        plan.set(progid + r"\shell\open\command", "", f'"pythonw.exe" "FileFusion.py" --plan "%1" --type {number}')
+    return plan
+
+
+@case("registry.apply", "Diff, apply (verified) and roll back a file-type registration plan on the in-memory backend")
+def registry_apply(ctx):
+    plan = _registry_plan(REGISTRY_TYPES // 5 if ctx.quick else REGISTRY_TYPES)
+    backend = MemoryBackend(latency=REGISTRY_CALL_S)
+
+    def run():
+        undo = apply_registry(diff_registry(plan, backend), backend)
+        rollback(undo, backend)
+    return run
+
+
+@case("registry.diff.installed", "Diff a fully installed file-type registration plan (reads only, nothing to write)")
+def registry_diff_installed(ctx):
+    plan = _registry_plan(REGISTRY_TYPES // 5 if ctx.quick else REGISTRY_TYPES)
+    backend = MemoryBackend(latency=REGISTRY_CALL_S)
+    apply_registry(diff_registry(plan, backend), backend)
+
+    def run():
+        assert not diff_registry(plan, backend), "installed plan should have no changes"
+    return run
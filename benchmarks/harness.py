@@ -0,0 +1,105 @@
+"""
+Benchmark harness - repeated timing, summary statistics and baseline comparison
+"""
+
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+# name -> (function(context) returning a callable, description)
+CASES = {}
+
+
+def case(name, description=""):
+    """Register a benchmark case
+
+    The decorated function receives the shared context and returns the
+    callable to time, or None to skip the case (e.g. missing dependency).
+    """
+    def decorator(func):
+        CASES[name] = (func, description)
+        return func
+    return decorator
+
+
+def measure(func, repeat=5, warmup=1):
+    """Time func repeat times after warmup calls and summarize the samples"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return summarize(samples)
+
+
+def summarize(samples):
+    """Return min/median/mean/stdev for a list of durations in seconds"""
+    return {
+        "repeat": len(samples),
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+        "stdev_s": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "samples_s": samples,
+    }
+
+
+def environment():
+    """Describe the machine the results were produced on"""
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def save_results(path, results, meta):
+    """Write results and metadata as JSON"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({"meta": meta, "results": results}, f, indent=4)
+
+
+def compare(results, baseline_path, threshold=0.10):
+    """Compare medians with a baseline file; returns (rows, regressions)
+
+    Each row is (name, baseline median, current median, ratio). A case
+    regresses when it is more than threshold slower than the baseline.
+    """
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)["results"]
+    rows = []
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if not previous or "median_s" not in previous or "median_s" not in current:
+            continue
+        ratio = current["median_s"] / max(previous["median_s"], 1e-12)
+        rows.append((name, previous["median_s"], current["median_s"], ratio))
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def format_seconds(seconds):
+    """Human readable duration"""
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds:.3f} s"
@@ -0,0 +1,179 @@
+"""
+Synthetic data - reproducible folder trees and images for benchmarks
+"""
+
+import codecs
+import os
+import random
+
+# name: (builder, full parameters, quick parameters)
+TREE_SHAPES = {}
+
+
+def tree_shape(name, full, quick):
+    """Register a tree generator under name"""
+    def decorator(func):
+        TREE_SHAPES[name] = (func, full, quick)
+        return func
+    return decorator
+
+
+def _write_files(folder, count, rng, min_size, max_size):
+    for i in range(count):
+        with open(os.path.join(folder, f"file_{i:05d}.dat"), 'wb') as f:
+            f.write(b"\0" * rng.randint(min_size, max_size))
+
+
+@tree_shape("wide", {"folders": 2000, "files": 5}, {"folders": 300, "files": 3})
+def make_wide(root, rng, folders, files):
+    """One level of many sibling folders"""
+    for i in range(folders):
+        folder = os.path.join(root, f"folder_{i:05d}")
+        os.mkdir(folder)
+        _write_files(folder, files, rng, 0, 4096)
+
+
+@tree_shape("deep", {"chains": 40, "depth": 50, "files": 3}, {"chains": 10, "depth": 20, "files": 2})
+def make_deep(root, rng, chains, depth, files):
+    """Long single-child chains of nested folders"""
+    for chain in range(chains):
+        folder = os.path.join(root, f"chain_{chain:03d}")
+        for level in range(depth):
+            folder = os.path.join(folder, f"level_{level:03d}")
+            os.makedirs(folder)
+            _write_files(folder, files, rng, 0, 2048)
+
+
+@tree_shape("tiny", {"folders": 500, "files": 100}, {"folders": 50, "files": 60})
+def make_tiny(root, rng, folders, files):
+    """Many tiny files spread over a two-level tree"""
+    for i in range(folders):
+        folder = os.path.join(root, f"group_{i // 25:03d}", f"bucket_{i:04d}")
+        os.makedirs(folder)
+        _write_files(folder, files, rng, 0, 64)
+
+
+@tree_shape("huge", {"files": 8, "size": 1 << 30}, {"files": 4, "size": 64 << 20})
+def make_huge(root, rng, files, size):
+    """A few very large (sparse) files"""
+    for i in range(files):
+        with open(os.path.join(root, f"huge_{i:02d}.bin"), 'wb') as f:
+            f.truncate(size + rng.randint(0, 1 << 20))
+
+
+@tree_shape("linked", {"files": 2000, "snapshots": 20}, {"files": 500, "snapshots": 6})
+def make_linked(root, rng, files, snapshots):
+    """Backup-style snapshots: every snapshot hardlinks the same set of files"""
+    base = os.path.join(root, "snapshot_000")
+    os.makedirs(base)
+    _write_files(base, files, rng, 0, 8192)
+    names = sorted(os.listdir(base))
+    for i in range(1, snapshots):
+        folder = os.path.join(root, f"snapshot_{i:03d}")
+        os.mkdir(folder)
+        for name in names:
+            os.link(os.path.join(base, name), os.path.join(folder, name))
+
+
+def make_tree(shape, root, quick=False, seed=1234):
+    """Build the named tree shape under root and return root"""
+    builder, full, quick_params = TREE_SHAPES[shape]
+    os.makedirs(root, exist_ok=True)
+    builder(root, random.Random(seed), **(quick_params if quick else full))
+    return root
+
+
+def make_images(folder, count, size=512, seed=1234):
+    """Write count deterministic PNG images and return their paths"""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(count):
+        image = Image.linear_gradient("L").resize((size, size)).convert("RGB")
+        draw = ImageDraw.Draw(image)
+        for _ in range(12):
+            x0, y0 = rng.randrange(size), rng.randrange(size)
+            x1, y1 = x0 + rng.randrange(16, size // 2), y0 + rng.randrange(16, size // 2)
+            color = tuple(rng.randrange(256) for _ in range(3))
+            draw.ellipse((x0, y0, x1, y1), fill=color)
+        path = os.path.join(folder, f"image_{i:04d}.png")
+        image.save(path)
+        paths.append(path)
+    return paths
+
+
+def make_icons(folder, count, distinct=50, seed=1234):
+    """Write count small multi-size .ico files (cycling through distinct designs)"""
+    import io
+
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    designs = []
+    for _ in range(distinct):
+        image = Image.new("RGBA", (64, 64), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(image)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        draw.rounded_rectangle((4, 12, 60, 56), radius=6, fill=color + (255,))
+        draw.ellipse((20, 20, 44, 44), fill=tuple(255 - c for c in color) + (255,))
+        buffer = io.BytesIO()
+        image.save(buffer, format="ICO", sizes=[(16, 16), (32, 32), (48, 48), (64, 64)])
+        designs.append(buffer.getvalue())
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"icon_{i:05d}.ico")
+        with open(path, 'wb') as f:
+            f.write(designs[i % distinct])
+        paths.append(path)
+    return paths
+
+
+def random_colors(count, seed=1234):
+    """Return count deterministic hex colors"""
+    rng = random.Random(seed)
+    return [f"#{rng.randrange(1 << 24):06x}" for _ in range(count)]
+
+
+_FOLDER_TYPES = ["Documents", "Pictures", "Music", "Videos", "Generic"]
+_SHELL_KEYS = [
+    "LocalizedResourceName=@%SystemRoot%\\system32\\shell32.dll,-21770",
+    "IconResource=%SystemRoot%\\system32\\imageres.dll,-112",
+    "IconFile=C:\\Icons\\folder.ico",
+    "IconIndex=0",
+    "ConfirmFileOp=0",
+    "InfoTip=Shared team folder",
+    "NoSharing=1",
+]
+
+
+def desktop_ini_samples(count, seed=1234):
+    """Return count desktop.ini files (bytes) in the shapes Windows produces
+
+    Samples mix ANSI and UTF-16 LE with BOM, CRLF and LF endings, spaces
+    around '=', comments, [ViewState] and property-store sections.
+    """
+    rng = random.Random(seed)
+    samples = []
+    for i in range(count):
+        lines = []
+        if rng.random() < 0.2:
+            lines.append("; Generated by Explorer")
+        lines.append("[.ShellClassInfo]")
+        for key in rng.sample(_SHELL_KEYS, rng.randint(1, len(_SHELL_KEYS))):
+            lines.append(key.replace("=", " = ") if rng.random() < 0.1 else key)
+        if rng.random() < 0.6:
+            lines += ["[ViewState]", "Mode=", "Vid=", f"FolderType={rng.choice(_FOLDER_TYPES)}"]
+        if rng.random() < 0.3:
+            lines += ["[{F29F85E0-4FF9-1068-AB91-08002B27B3D9}]", f"Prop2=31,Folder {i}", "Prop5=31,Tag;Archive"]
+        if rng.random() < 0.2:
+            lines += ["", "[LocalizedFileNames]", f"report_{i}.pdf=@report.dll,-{100 + i}"]
+        newline = "\r\n" if rng.random() < 0.85 else "\n"
+        text = newline.join(lines) + newline
+        if rng.random() < 0.4:
+            samples.append(codecs.BOM_UTF16_LE + text.encode("utf-16-le"))
+        else:
+            samples.append(text.encode("ascii"))
+    return samples
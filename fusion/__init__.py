@@ -0,0 +1,4 @@
+"""
+FileFusion Pro - engine package
+Headless building blocks (scanning, customization, storage) used by the UI
+"""
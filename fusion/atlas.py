@@ -0,0 +1,190 @@
+"""
+Icon atlas - icon library thumbnails packed into memory-mapped sprite pages
+
+Every library icon is decoded once, shrunk to a fixed cell and written into
+a page file of raw RGBA pixels (a grid of cells). A small JSON index maps
+each icon path to its page, slot and size, plus the size/mtime it was made
+from. Opening the atlas maps the pages without reading them; a thumbnail is
+cut from the mapping on demand, so showing the library costs no file opens
+or decodes per icon. Updates are incremental: only new or changed icons are
+decoded and written into free slots.
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from fusion.desktopini import write_atomic
+
+ATLAS_VERSION = 1
+INDEX_FILE = "index.json"
+
+# Index entry fields
+PAGE, SLOT, WIDTH, HEIGHT, SIZE, MTIME = range(6)
+
+
+def _key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def load_thumbnail(path, cell):
+    """Decode an icon or image file at (roughly) cell x cell RGBA"""
+    with Image.open(path) as image:
+        sizes = image.info.get("sizes")
+        if image.format == "ICO" and sizes:
+            # Pick the smallest stored size that still covers the cell
+            fitting = [size for size in sizes if min(size) >= cell]
+            image.size = min(fitting) if fitting else max(sizes)
+        else:
+            image.draft("RGBA", (cell, cell))
+        image = image.convert("RGBA")
+        image.thumbnail((cell, cell), Image.LANCZOS)
+        return image
+
+
+class IconAtlas:
+    """Thumbnails of many icons in columns x rows cell pages under directory"""
+
+    def __init__(self, directory, cell=48, columns=32, rows=32):
+        self.directory = directory
+        self.cell = cell
+        self.columns = columns
+        self.rows = rows
+        self.entries = {}    # path key -> [page, slot, width, height, size, mtime_ns]
+        self.pages = 0
+        self._maps = {}
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(os.path.join(directory, INDEX_FILE), 'r') as f:
+                index = json.load(f)
+            if (index.get("version"), index.get("cell"), index.get("columns"), index.get("rows")) == \
+                    (ATLAS_VERSION, cell, columns, rows):
+                self.entries = index["entries"]
+                self.pages = index["pages"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, path):
+        return _key(path) in self.entries
+
+    @property
+    def slots_per_page(self):
+        return self.columns * self.rows
+
+    def _page_path(self, page):
+        return os.path.join(self.directory, f"page-{page:03d}.rgba")
+
+    def _page(self, page, writable=False):
+        """Memory map of one page as a (height, width, 4) uint8 array"""
+        shape = (self.rows * self.cell, self.columns * self.cell, 4)
+        path = self._page_path(page)
+        if writable:
+            if not os.path.exists(path) or os.path.getsize(path) != shape[0] * shape[1] * 4:
+                with open(path, 'wb') as f:
+                    f.truncate(shape[0] * shape[1] * 4)
+            self._maps.pop(page, None)
+            return np.memmap(path, dtype=np.uint8, mode="r+", shape=shape)
+        if page not in self._maps:
+            self._maps[page] = np.memmap(path, dtype=np.uint8, mode="r", shape=shape)
+        return self._maps[page]
+
+    def _free_slots(self):
+        """Unused (page, slot) pairs in order, then slots on a new page"""
+        used = {(entry[PAGE], entry[SLOT]) for entry in self.entries.values()}
+        for page in range(self.pages):
+            for slot in range(self.slots_per_page):
+                if (page, slot) not in used:
+                    yield page, slot
+        page = self.pages
+        while True:
+            for slot in range(self.slots_per_page):
+                yield page, slot
+            page += 1
+
+    def stale(self, paths):
+        """Paths that are missing from the atlas or changed on disk since"""
+        result = []
+        for path in paths:
+            entry = self.entries.get(_key(path))
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if entry is None or entry[SIZE] != st.st_size or entry[MTIME] != st.st_mtime_ns:
+                result.append(path)
+        return result
+
+    def update(self, paths, workers=4, prune=False):
+        """Add new or changed icons (and with prune, drop ones not in paths); returns icons written"""
+        paths = list(paths)
+        todo = self.stale(paths)
+
+        def render(path):
+            try:
+                st = os.stat(path)
+                return path, load_thumbnail(path, self.cell), st
+            except (OSError, ValueError, SyntaxError):
+                return path, None, None
+
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            rendered = [item for item in pool.map(render, todo) if item[1] is not None]
+
+        with self._lock:
+            if prune:
+                keep = {_key(path) for path in paths}
+                for key in [key for key in self.entries if key not in keep]:
+                    del self.entries[key]
+            free = self._free_slots()
+            pages = {}
+            for path, image, st in rendered:
+                key = _key(path)
+                if key in self.entries:
+                    page, slot = self.entries[key][PAGE], self.entries[key][SLOT]
+                else:
+                    page, slot = next(free)
+                if page not in pages:
+                    pages[page] = self._page(page, writable=True)
+                y, x = divmod(slot, self.columns)
+                y, x = y * self.cell, x * self.cell
+                pixels = np.asarray(image)
+                target = pages[page]
+                target[y:y + self.cell, x:x + self.cell] = 0
+                target[y:y + pixels.shape[0], x:x + pixels.shape[1]] = pixels
+                self.entries[key] = [page, slot, image.width, image.height, st.st_size, st.st_mtime_ns]
+                self.pages = max(self.pages, page + 1)
+            for target in pages.values():
+                target.flush()
+            if rendered or prune:
+                self.save()
+        return len(rendered)
+
+    def thumbnail(self, path):
+        """The icon's thumbnail cut from its page, or None if it is not in the atlas"""
+        entry = self.entries.get(_key(path))
+        if entry is None:
+            return None
+        with self._lock:
+            page = self._page(entry[PAGE])
+        y, x = divmod(entry[SLOT], self.columns)
+        y, x = y * self.cell, x * self.cell
+        # Slicing the mapping reads only this cell's rows; fromarray copies just them
+        return Image.fromarray(np.ascontiguousarray(page[y:y + entry[HEIGHT], x:x + entry[WIDTH]]), "RGBA")
+
+    def save(self):
+        index = {
+            "version": ATLAS_VERSION,
+            "cell": self.cell,
+            "columns": self.columns,
+            "rows": self.rows,
+            "pages": self.pages,
+            "entries": self.entries,
+        }
+        write_atomic(os.path.join(self.directory, INDEX_FILE), json.dumps(index, separators=(",", ":")).encode("utf-8"))
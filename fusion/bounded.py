@@ -0,0 +1,458 @@
+"""
+Bounded-memory scanning - folder analysis for trees too large to hold in memory
+
+Per-directory totals are produced in post-order from a single walk, so only
+the current directory chain is held in memory. Everything that grows with
+the number of files (extension totals, size groups used to find duplicate
+candidates, per-folder rows) goes through spill-to-disk sorters: sorted runs
+are written to temporary files once the budget is reached and combined
+again with an external k-way merge. The merge reads each run in small
+blocks sized so that MERGE_FAN_IN of them fit the budget; with more runs
+than that, runs are first merged in stages into fewer, longer ones.
+"""
+
+import argparse
+import ctypes
+import heapq
+import json
+import os
+import pickle
+import sys
+import tempfile
+from itertools import groupby, islice
+from operator import itemgetter
+
+from fusion.customize import DESKTOP_INI
+from fusion.inodes import InodeSet
+from fusion.instrument import metrics
+from fusion.sizetree import HARDLINKS_BY_DEFAULT, list_entries
+
+# Rough per-record costs used to keep buffers inside the budget
+TUPLE_OVERHEAD = 120
+AGGREGATE_ENTRY_COST = 240
+RUN_BLOCK = 4096
+# Runs merged at once; more runs than this are merged in stages first
+MERGE_FAN_IN = 16
+MIN_RUN_BLOCK = 16
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes (0 if unknown)"""
+    if sys.platform == "win32":
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", ctypes.c_ulong),
+                ("PageFaultCount", ctypes.c_ulong),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+        return 0
+    try:
+        # ru_maxrss survives exec on Linux (a child reports its parent's peak); VmHWM does not
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _block_records(budget, record_cost):
+    """Records per run block so that MERGE_FAN_IN blocks fit in budget"""
+    return max(MIN_RUN_BLOCK, min(RUN_BLOCK, int(budget // (MERGE_FAN_IN * max(record_cost, 1)))))
+
+
+class _RunFile:
+    """A sorted run written to disk in pickled blocks of block records
+
+    records may be any iterable (a staged merge streams into a new run);
+    reading holds one block in memory at a time.
+    """
+
+    def __init__(self, directory, records, block=RUN_BLOCK):
+        fd, self.path = tempfile.mkstemp(prefix="run-", suffix=".bin", dir=directory)
+        records = iter(records)
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                chunk = list(islice(records, block))
+                if not chunk:
+                    break
+                pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            while True:
+                try:
+                    block = pickle.load(f)
+                except EOFError:
+                    return
+                yield from block
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _reduce_runs(runs, directory, block, combine=None):
+    """Merge runs MERGE_FAN_IN at a time until at most MERGE_FAN_IN remain
+
+    combine(stream) may shrink each merged stream (e.g. sum partial
+    aggregates). Merged runs are deleted; the returned list replaces runs.
+    """
+    while len(runs) > MERGE_FAN_IN:
+        merged = []
+        for start in range(0, len(runs), MERGE_FAN_IN):
+            group = runs[start:start + MERGE_FAN_IN]
+            stream = heapq.merge(*group)
+            merged.append(_RunFile(directory, combine(stream) if combine else stream, block))
+            for run in group:
+                run.remove()
+        runs = merged
+        metrics.count("scan_merge_passes")
+    return runs
+
+
+class ExternalSorter:
+    """Sort an unbounded stream of tuples using at most budget bytes of buffer"""
+
+    def __init__(self, budget, directory, cost=None):
+        self.budget = max(budget, 1)
+        self.directory = directory
+        self.cost = cost or (lambda record: TUPLE_OVERHEAD)
+        self.buffer = []
+        self.used = 0
+        self.runs = []
+        self.count = 0
+        self.spilled = 0
+        self.spilled_cost = 0
+
+    def add(self, record):
+        self.buffer.append(record)
+        self.used += self.cost(record)
+        self.count += 1
+        if self.used >= self.budget:
+            self.spill()
+
+    def spill(self):
+        """Write the buffer out as a sorted run"""
+        if not self.buffer:
+            return
+        self.buffer.sort()
+        self.spilled += len(self.buffer)
+        self.spilled_cost += self.used
+        self.runs.append(_RunFile(self.directory, self.buffer, self.block))
+        metrics.count("scan_spills")
+        self.buffer = []
+        self.used = 0
+
+    @property
+    def block(self):
+        """Records per run block, from the average cost of the records seen so far"""
+        records = self.spilled + len(self.buffer)
+        cost = (self.spilled_cost + self.used) / records if records else TUPLE_OVERHEAD
+        return _block_records(self.budget, cost)
+
+    def __iter__(self):
+        """Yield every record in sorted order (k-way merge of runs in bounded blocks)"""
+        if not self.runs:
+            self.buffer.sort()
+            return iter(self.buffer)
+        # The buffer joins the runs so the merge holds blocks only, never the whole buffer
+        self.spill()
+        self.runs = _reduce_runs(self.runs, self.directory, self.block)
+        return heapq.merge(*self.runs)
+
+    def close(self):
+        for run in self.runs:
+            run.remove()
+        self.runs = []
+        self.buffer = []
+
+
+def _combine(records):
+    """Sum the counts and sizes of sorted (key, count, size) records per key"""
+    for key, group in groupby(records, key=itemgetter(0)):
+        count = 0
+        size = 0
+        for _, c, s in group:
+            count += c
+            size += s
+        yield key, count, size
+
+
+class ExternalAggregator:
+    """Sum (count, size) per key with spill-to-disk partial aggregates"""
+
+    def __init__(self, budget, directory):
+        self.budget = max(budget, 1)
+        self.directory = directory
+        self.totals = {}
+        self.runs = []
+
+    def add(self, key, count, size):
+        entry = self.totals.get(key)
+        if entry is None:
+            self.totals[key] = [count, size]
+            if len(self.totals) * AGGREGATE_ENTRY_COST >= self.budget:
+                self.spill()
+        else:
+            entry[0] += count
+            entry[1] += size
+
+    def spill(self):
+        if not self.totals:
+            return
+        self.runs.append(_RunFile(self.directory, sorted((k, c, s) for k, (c, s) in self.totals.items()),
+                                  _block_records(self.budget, AGGREGATE_ENTRY_COST)))
+        metrics.count("scan_spills")
+        self.totals = {}
+
+    def __iter__(self):
+        """Yield (key, count, size) with partial aggregates merged"""
+        if not self.runs:
+            return _combine(sorted((k, c, s) for k, (c, s) in self.totals.items()))
+        self.spill()
+        self.runs = _reduce_runs(self.runs, self.directory, _block_records(self.budget, AGGREGATE_ENTRY_COST),
+                                 _combine)
+        return _combine(heapq.merge(*self.runs))
+
+    def close(self):
+        for run in self.runs:
+            run.remove()
+        self.runs = []
+        self.totals = {}
+
+
+def _merge_extensions(target, source):
+    for extension, (size, files) in source.items():
+        total = target.get(extension)
+        if total is None:
+            target[extension] = [size, files]
+        else:
+            total[0] += size
+            total[1] += files
+
+
+def _list_details(path, hardlinks, inodes):
+    """(subdir paths, size, alloc, files, extensions, has desktop.ini) of one directory"""
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError:
+        return [], 0, 0, 0, {}, False
+    has_ini = any(entry.name.lower() == DESKTOP_INI for entry in entries)
+    subdirs, size, alloc, files, links, extensions = list_entries(entries, path, hardlinks, lambda error: None)
+    for device, inode, link_size, allocated, extension in links:
+        # A hard-linked file is counted in the first folder it is seen in
+        if inodes.add(device, inode):
+            size += link_size
+            alloc += allocated
+            files += 1
+            _merge_extensions(extensions, {extension: [link_size, 1]})
+    return [subdir for _, subdir in subdirs], size, alloc, files, extensions, has_ini
+
+
+def walk_totals(root, on_file=None, details=False, hardlinks=HARDLINKS_BY_DEFAULT):
+    """Yield (path, size, files, folders) for every directory in post-order
+
+    Totals cover the whole subtree. on_file(path, name, size) is called for
+    every file. Memory use is proportional to the depth of the tree, not its
+    size, which makes this the building block for streaming consumers.
+
+    With details, folders are listed like SizeTree lists them (allocated
+    sizes, hard links counted once) and each tuple grows to (path, size,
+    files, folders, depth, alloc, extensions, has desktop.ini), where
+    extensions maps extension -> [bytes, files] over the subtree. on_file
+    is not called in that mode.
+    """
+    inodes = InodeSet() if details else None
+    # Each frame: [path, pending subdirectory paths, size, files, folders, depth, alloc, extensions, has desktop.ini]
+    stack = [[root, None, 0, 0, 0, 0, 0, {}, False]]
+    while stack:
+        frame = stack[-1]
+        if frame[1] is None and details:
+            subdirs, size, alloc, files, extensions, frame[8] = _list_details(frame[0], hardlinks, inodes)
+            frame[2] += size
+            frame[3] += files
+            frame[6] += alloc
+            _merge_extensions(frame[7], extensions)
+            frame[1] = subdirs
+            frame[4] += len(subdirs)
+        elif frame[1] is None:
+            subdirs = []
+            try:
+                with os.scandir(frame[0]) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.path)
+                            else:
+                                size = entry.stat(follow_symlinks=False).st_size
+                                frame[2] += size
+                                frame[3] += 1
+                                if on_file:
+                                    on_file(entry.path, entry.name, size)
+                        except OSError:
+                            pass
+            except OSError:
+                pass
+            frame[1] = subdirs
+            frame[4] += len(subdirs)
+        if frame[1]:
+            stack.append([frame[1].pop(), None, 0, 0, 0, frame[5] + 1, 0, {}, False])
+            continue
+        stack.pop()
+        path, _, size, files, folders, depth, alloc, extensions, has_ini = frame
+        if stack:
+            parent = stack[-1]
+            parent[2] += size
+            parent[3] += files
+            parent[4] += folders
+            if details:
+                parent[6] += alloc
+                _merge_extensions(parent[7], extensions)
+        if details:
+            yield path, size, files, folders, depth, alloc, extensions, has_ini
+        else:
+            yield path, size, files, folders
+
+
+def _path_cost(record):
+    return TUPLE_OVERHEAD + len(record[-1]) * 2
+
+
+class BoundedScan:
+    """Folder analysis (extensions, largest folders, duplicate candidates) under a memory budget"""
+
+    def __init__(self, root, memory_budget=256 * 1024 * 1024, spill_dir=None, min_duplicate_size=1):
+        self.root = os.path.abspath(root)
+        self.memory_budget = memory_budget
+        self.min_duplicate_size = min_duplicate_size
+        self._tempdir = tempfile.TemporaryDirectory(prefix="filefusion-scan-", dir=spill_dir)
+        directory = self._tempdir.name
+        # Split the budget between the three growing structures
+        self.sizes = ExternalSorter(memory_budget // 2, directory, _path_cost)
+        self.folders = ExternalSorter(memory_budget // 4, directory, _path_cost)
+        self.extensions = ExternalAggregator(memory_budget // 4, directory)
+        self.total_size = 0
+        self.file_count = 0
+        self.folder_count = 0
+        self.peak_rss = 0
+
+    def run(self, on_directory=None):
+        """Walk the tree once; on_directory(path, size, files, folders) streams folder totals"""
+        def on_file(path, name, size):
+            extension = os.path.splitext(name)[1].lower() or "(none)"
+            self.extensions.add(extension, 1, size)
+            if size >= self.min_duplicate_size:
+                self.sizes.add((size, path))
+
+        with metrics.span("scan"):
+            for path, size, files, folders in walk_totals(self.root, on_file):
+                self.folders.add((-size, path))
+                if on_directory:
+                    on_directory(path, size, files, folders)
+                if path == self.root:
+                    self.total_size, self.file_count, self.folder_count = size, files, folders
+        self.peak_rss = peak_rss()
+        return self
+
+    @property
+    def spills(self):
+        return len(self.sizes.runs) + len(self.folders.runs) + len(self.extensions.runs)
+
+    def extension_totals(self):
+        """Return [(extension, count, size)] sorted by size, largest first"""
+        return sorted(self.extensions, key=itemgetter(2), reverse=True)
+
+    def largest_folders(self, limit=20):
+        """Return [(path, size)] for the largest folders (subtree totals)"""
+        result = []
+        for negative_size, path in self.folders:
+            if path != self.root:
+                result.append((path, -negative_size))
+                if len(result) >= limit:
+                    break
+        return result
+
+    def duplicate_candidates(self):
+        """Yield (size, paths) groups of files sharing the same size"""
+        for size, group in groupby(self.sizes, key=itemgetter(0)):
+            paths = [path for _, path in group]
+            if len(paths) > 1:
+                yield size, paths
+
+    def summary(self, limit=10):
+        """Return a JSON-serializable summary of the scan"""
+        groups = 0
+        wasted = 0
+        for size, paths in self.duplicate_candidates():
+            groups += 1
+            wasted += size * (len(paths) - 1)
+        return {
+            "root": self.root,
+            "total_size": self.total_size,
+            "files": self.file_count,
+            "folders": self.folder_count,
+            "memory_budget": self.memory_budget,
+            "spills": self.spills,
+            "peak_rss": self.peak_rss,
+            "extensions": self.extension_totals()[:limit],
+            "largest_folders": self.largest_folders(limit),
+            "duplicate_groups": groups,
+            "duplicate_candidate_bytes": wasted,
+        }
+
+    def close(self):
+        self.sizes.close()
+        self.folders.close()
+        self.extensions.close()
+        self._tempdir.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def main(argv=None):
+    """Headless entry point: python -m fusion.bounded ROOT [--budget-mb N]"""
+    parser = argparse.ArgumentParser(prog="python -m fusion.bounded", description="Bounded-memory folder analysis")
+    parser.add_argument("root")
+    parser.add_argument("--budget-mb", type=float, default=256)
+    parser.add_argument("--spill-dir")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    with BoundedScan(args.root, int(args.budget_mb * 1024 * 1024), args.spill_dir) as scan:
+        scan.run()
+        summary = scan.summary(args.limit)
+    summary["peak_rss"] = peak_rss()
+    print(json.dumps(summary, indent=4))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Icon capture - grab a screen region and turn it into a stored multi-size icon
+
+Capture sources are pluggable: ScreenSource uses Pillow's ImageGrab
+(Windows, macOS and X11), FileSource crops from an image file and
+MemorySource wraps a raw pixel buffer without copying it (for tests and
+headless use). The grab -> crop -> resize -> .ico chain runs on a worker
+thread. The grabbed pixels are hashed first, so capturing a region that
+has not changed is answered from the cache without encoding anything.
+"""
+
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from fusion.hashing import hash_bytes
+from fusion.icons import ICON_SIZES, convert_to_ico
+from fusion.instrument import metrics
+
+
+class ScreenSource:
+    """The desktop, via PIL.ImageGrab"""
+
+    def __init__(self, all_screens=True):
+        from PIL import ImageGrab
+
+        self._grab = ImageGrab.grab
+        self.all_screens = all_screens
+
+    def grab(self, region):
+        return self._grab(bbox=region, all_screens=self.all_screens)
+
+
+class FileSource:
+    """Regions of an image file (decoded once)"""
+
+    def __init__(self, path):
+        with Image.open(path) as image:
+            self.image = image.convert("RGBA")
+
+    def grab(self, region):
+        return self.image.crop(region)
+
+
+class MemorySource:
+    """Regions of a raw pixel buffer, wrapped without copying"""
+
+    def __init__(self, buffer, size, mode="RGBA"):
+        # frombuffer shares memory with buffer; crop() copies only the region
+        self.image = Image.frombuffer(mode, size, buffer, "raw", mode, 0, 1)
+
+    def grab(self, region):
+        return self.image.crop(region)
+
+
+def default_source():
+    """ScreenSource where screen grabbing works, else None"""
+    try:
+        return ScreenSource()
+    except (ImportError, OSError):
+        return None
+
+
+def encode_icon(image, sizes=ICON_SIZES):
+    """Encode an image as multi-size .ico bytes in memory"""
+    buffer = io.BytesIO()
+    convert_to_ico(image, buffer, sizes)
+    return buffer.getvalue()
+
+
+def normalize_region(region):
+    """Order the corners of (x0, y0, x1, y1) and reject empty regions"""
+    x0, y0, x1, y1 = (int(round(v)) for v in region)
+    x0, x1 = sorted((x0, x1))
+    y0, y1 = sorted((y0, y1))
+    if x1 - x0 < 2 or y1 - y0 < 2:
+        raise ValueError("Capture region is too small")
+    return x0, y0, x1, y1
+
+
+class CaptureResult:
+    """Outcome of one capture"""
+
+    def __init__(self, digest, path, region, reused):
+        self.digest = digest
+        self.path = path
+        self.region = region
+        self.reused = reused
+
+
+class Capturer:
+    """Runs captures on a worker thread and stores them in an IconStore"""
+
+    def __init__(self, icon_store, source=None, sizes=ICON_SIZES, workers=1):
+        self.icon_store = icon_store
+        self.source = source or default_source()
+        self.sizes = sizes
+        self._pixels = {}   # pixel digest -> icon digest
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="capture")
+
+    def capture(self, region):
+        """Start capturing region; returns a Future of CaptureResult"""
+        if self.source is None:
+            raise RuntimeError("No capture source is available on this system")
+        return self._pool.submit(self._capture, normalize_region(region))
+
+    def _capture(self, region):
+        with metrics.span("icon_convert"):
+            image = self.source.grab(region)
+            if image.mode != "RGBA":
+                image = image.convert("RGBA")
+            pixels = hash_bytes(image.tobytes() + repr(image.size).encode())
+
+            with self._lock:
+                digest = self._pixels.get(pixels)
+            if digest is not None and digest in self.icon_store.content:
+                metrics.count("capture_reused")
+                return CaptureResult(digest, self.icon_store.icon_path(digest), region, True)
+
+            # Shrink once to the largest icon size; the encoder derives the rest
+            largest = max(width for width, _ in self.sizes)
+            if max(image.size) > largest:
+                image.thumbnail((largest, largest), Image.LANCZOS)
+            digest = self.icon_store.add_bytes(encode_icon(image, self.sizes))
+            with self._lock:
+                self._pixels[pixels] = digest
+        return CaptureResult(digest, self.icon_store.icon_path(digest), region, False)
+
+    def close(self):
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,276 @@
+"""
+Color engine - OKLab shades, named-palette snapping and tint ramps
+
+Single colors go through plain Python (used by the UI for hover shades and
+previews); arrays of colors go through NumPy, which is only imported when
+a vectorized path is used. Lightness changes happen in OKLab so a shade
+keeps its hue and looks evenly darker, and results outside sRGB are
+brought back by reducing chroma rather than clipping each channel.
+"""
+
+import threading
+
+# Flat UI presets shown in the colors tab; also part of the named palette
+PRESETS = [
+    ("#3498db", "Blue"),
+    ("#2ecc71", "Green"),
+    ("#e74c3c", "Red"),
+    ("#f39c12", "Orange"),
+    ("#9b59b6", "Purple"),
+    ("#1abc9c", "Turquoise"),
+    ("#34495e", "Dark Blue"),
+    ("#e67e22", "Carrot"),
+    ("#27ae60", "Emerald"),
+    ("#8e44ad", "Wisteria"),
+    ("#d35400", "Pumpkin"),
+    ("#c0392b", "Pomegranate")
+]
+
+_M1 = (
+    (0.4122214708, 0.5363325363, 0.0514459929),
+    (0.2119034982, 0.6806995451, 0.1073969566),
+    (0.0883024619, 0.2817188376, 0.6299787005),
+)
+_M2 = (
+    (0.2104542553, 0.7936177850, -0.0040720468),
+    (1.9779984951, -2.4285922050, 0.4505937099),
+    (0.0259040371, 0.7827717662, -0.8086757660),
+)
+_M2_INV = (
+    (1.0, 0.3963377774, 0.2158037573),
+    (1.0, -0.1055613458, -0.0638541728),
+    (1.0, -0.0894841775, -1.2914855480),
+)
+_M1_INV = (
+    (4.0767416621, -3.3077115913, 0.2309699292),
+    (-1.2684380046, 2.6097574011, -0.3413193965),
+    (-0.0041960863, -0.7034186147, 1.7076147010),
+)
+
+
+def hex_to_rgb(color):
+    """'#rgb' or '#rrggbb' -> (r, g, b) ints"""
+    color = color.lstrip('#')
+    if len(color) == 3:
+        color = "".join(c * 2 for c in color)
+    return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def rgb_to_hex(rgb):
+    return "#{:02x}{:02x}{:02x}".format(*(max(0, min(255, int(round(c)))) for c in rgb))
+
+
+def _to_linear(c):
+    c /= 255.0
+    return c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4
+
+
+def _from_linear(c):
+    return 12.92 * c if c <= 0.0031308 else 1.055 * c ** (1 / 2.4) - 0.055
+
+
+def _mul(matrix, vector):
+    return tuple(row[0] * vector[0] + row[1] * vector[1] + row[2] * vector[2] for row in matrix)
+
+
+def _cbrt(x):
+    return x ** (1 / 3) if x >= 0 else -((-x) ** (1 / 3))
+
+
+def rgb_to_oklab(rgb):
+    """(r, g, b) 0-255 -> (L, a, b)"""
+    lms = _mul(_M1, tuple(_to_linear(c) for c in rgb))
+    return _mul(_M2, tuple(_cbrt(c) for c in lms))
+
+
+def _oklab_to_linear(lab):
+    lms = _mul(_M2_INV, lab)
+    return _mul(_M1_INV, tuple(c * c * c for c in lms))
+
+
+def oklab_to_rgb(lab):
+    """(L, a, b) -> (r, g, b) 0-255, reducing chroma until the color fits in sRGB"""
+    L, a, b = lab
+    L = max(0.0, min(1.0, L))
+    low, high = 0.0, 1.0
+    linear = _oklab_to_linear((L, a, b))
+    if min(linear) < -1e-6 or max(linear) > 1 + 1e-6:
+        # Bisect on the chroma scale; hue and lightness stay put
+        for _ in range(20):
+            middle = (low + high) / 2
+            linear = _oklab_to_linear((L, a * middle, b * middle))
+            if min(linear) < -1e-6 or max(linear) > 1 + 1e-6:
+                high = middle
+            else:
+                low = middle
+        linear = _oklab_to_linear((L, a * low, b * low))
+    return tuple(255 * _from_linear(max(0.0, min(1.0, c))) for c in linear)
+
+
+def shade(color, delta):
+    """Change OKLab lightness by delta (-1..1) and return hex"""
+    L, a, b = rgb_to_oklab(hex_to_rgb(color))
+    return rgb_to_hex(oklab_to_rgb((L + delta, a, b)))
+
+
+def hover_variant(color, delta=0.07):
+    """Hover shade: darker for mid/light colors, lighter for very dark ones"""
+    L = rgb_to_oklab(hex_to_rgb(color))[0]
+    return shade(color, delta if L < 0.3 else -delta)
+
+
+def tint_ramp(color, steps=9, lightest=0.97, darkest=0.25):
+    """Return steps hex colors of color's hue from light to dark"""
+    _, a, b = rgb_to_oklab(hex_to_rgb(color))
+    span = (lightest - darkest) / max(steps - 1, 1)
+    return [rgb_to_hex(oklab_to_rgb((lightest - i * span, a, b))) for i in range(steps)]
+
+
+def distance(first, second):
+    """Perceptual distance between two hex colors"""
+    p, q = rgb_to_oklab(hex_to_rgb(first)), rgb_to_oklab(hex_to_rgb(second))
+    return sum((x - y) ** 2 for x, y in zip(p, q)) ** 0.5
+
+
+# Vectorized paths (NumPy) ------------------------------------------------
+
+_np_tables = {}
+
+
+def _numpy():
+    import numpy as np
+
+    if not _np_tables:
+        levels = np.arange(256, dtype=np.float64) / 255.0
+        tables = {
+            "to_linear": np.where(levels <= 0.04045, levels / 12.92,
+                                  ((levels + 0.055) / 1.055) ** 2.4).astype(np.float32),
+            "m1": np.array(_M1, dtype=np.float32).T,
+            "m2": np.array(_M2, dtype=np.float32).T,
+            "m2_inv": np.array(_M2_INV, dtype=np.float32).T,
+            "m1_inv": np.array(_M1_INV, dtype=np.float32).T,
+        }
+        _np_tables.update(tables)
+    return np
+
+
+def rgb_to_oklab_array(rgb):
+    """uint8 array (..., 3) -> float32 OKLab array (..., 3)"""
+    np = _numpy()
+    linear = _np_tables["to_linear"][np.asarray(rgb, dtype=np.uint8)]
+    return np.cbrt(linear @ _np_tables["m1"]) @ _np_tables["m2"]
+
+
+def oklab_to_rgb_array(lab):
+    """float OKLab array (..., 3) -> uint8 RGB array (..., 3), clipped to sRGB"""
+    np = _numpy()
+    lms = np.asarray(lab, dtype=np.float32) @ _np_tables["m2_inv"]
+    linear = np.clip((lms * lms * lms) @ _np_tables["m1_inv"], 0.0, 1.0)
+    srgb = np.where(linear <= 0.0031308, 12.92 * linear, 1.055 * np.power(linear, 1 / 2.4) - 0.055)
+    return np.rint(srgb * 255).astype(np.uint8)
+
+
+def hex_array(colors):
+    """List of hex strings -> uint8 array (n, 3)"""
+    np = _numpy()
+    return np.array([hex_to_rgb(color) for color in colors], dtype=np.uint8).reshape(-1, 3)
+
+
+def ramp_luts(colors, size=256, lightest=0.97, darkest=0.25):
+    """Tint ramps for many colors at once: uint8 array (len(colors), size, 3)
+
+    Entry i maps a gray level (0 = dark, size-1 = light) onto the color's
+    hue, for recoloring grayscale artwork with recolor().
+    """
+    np = _numpy()
+    lab = rgb_to_oklab_array(hex_array(colors))
+    ramp = np.empty((len(colors), size, 3), dtype=np.float32)
+    ramp[..., 0] = np.linspace(darkest, lightest, size, dtype=np.float32)
+    ramp[..., 1:] = lab[:, None, 1:]
+    return oklab_to_rgb_array(ramp)
+
+
+def recolor(image, lut):
+    """Recolor a PIL image through one ramp from ramp_luts(), keeping alpha"""
+    from PIL import Image
+
+    np = _numpy()
+    rgba = image.convert("RGBA")
+    gray = np.asarray(rgba.convert("L"))
+    scale = (lut.shape[0] - 1) / 255.0
+    pixels = np.dstack([lut[np.rint(gray * scale).astype(np.intp)], np.asarray(rgba.getchannel("A"))])
+    return Image.fromarray(pixels, "RGBA")
+
+
+# Named palette -----------------------------------------------------------
+
+def css_colors():
+    """CSS/X11 color names (via Pillow) -> hex"""
+    from PIL import ImageColor
+
+    return {name: value for name, value in ImageColor.colormap.items() if value.startswith("#")}
+
+
+class Palette:
+    """Named colors with nearest-color lookup in OKLab
+
+    nearest() scans the palette exactly; snap_array() answers through a
+    lookup table indexed by the top `bits` bits of each channel, where each
+    cell holds the palette entry nearest to the cell's center (exact=True
+    compares every color against the whole palette instead).
+    """
+
+    def __init__(self, colors=None, bits=6):
+        if colors is None:
+            colors = css_colors()
+            colors.update((f"flat {name.lower()}", value) for value, name in PRESETS)
+        self.names = list(colors)
+        self.hex = [colors[name] for name in self.names]
+        self.lab = [rgb_to_oklab(hex_to_rgb(value)) for value in self.hex]
+        self.bits = bits
+        self._lut = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def nearest(self, color):
+        """Return (name, hex) of the palette color closest to color"""
+        target = rgb_to_oklab(hex_to_rgb(color))
+        best = min(range(len(self.lab)),
+                   key=lambda i: sum((x - y) ** 2 for x, y in zip(self.lab[i], target)))
+        return self.names[best], self.hex[best]
+
+    def lut(self):
+        """Build (once) the bits-per-channel lookup table of palette indexes"""
+        with self._lock:
+            if self._lut is None:
+                np = _numpy()
+                cells = 1 << self.bits
+                step = 256 // cells
+                levels = (np.arange(cells) * step + step // 2).astype(np.uint8)
+                grid = np.stack(np.meshgrid(levels, levels, levels, indexing="ij"), axis=-1).reshape(-1, 3)
+                self._lut = self._nearest_lab(rgb_to_oklab_array(grid))
+            return self._lut
+
+    def _nearest_lab(self, lab, block=65536):
+        """Palette index nearest to each OKLab row, as |x|^2 - 2x.p + |p|^2 matrix products"""
+        np = _numpy()
+        palette = np.array(self.lab, dtype=np.float32)
+        norms = (palette * palette).sum(axis=1)
+        result = np.empty(len(lab), dtype=np.uint16)
+        for start in range(0, len(lab), block):
+            # |x|^2 is the same for every palette entry of a row, so it can be left out
+            scores = norms - 2 * (lab[start:start + block] @ palette.T)
+            result[start:start + block] = scores.argmin(axis=1)
+        return result
+
+    def snap_array(self, rgb, exact=False):
+        """uint8 array (..., 3) -> palette indexes (...); see names/hex"""
+        np = _numpy()
+        rgb = np.asarray(rgb, dtype=np.uint8)
+        if exact:
+            return self._nearest_lab(rgb_to_oklab_array(rgb.reshape(-1, 3))).reshape(rgb.shape[:-1])
+        shift = 8 - self.bits
+        r, g, b = (rgb[..., i].astype(np.uint32) >> shift for i in range(3))
+        return self.lut()[(r << (2 * self.bits)) | (g << self.bits) | b]
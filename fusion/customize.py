@@ -0,0 +1,216 @@
+"""
+Folder customization - desktop.ini writes and folder attributes
+"""
+
+import ctypes
+import os
+import sys
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+from fusion.desktopini import SHELL_CLASS_INFO, DesktopIni
+from fusion.instrument import metrics
+
+FILE_ATTRIBUTE_READONLY = 0x01
+FILE_ATTRIBUTE_HIDDEN = 0x02
+FILE_ATTRIBUTE_SYSTEM = 0x04
+FILE_ATTRIBUTE_NORMAL = 0x80
+INVALID_FILE_ATTRIBUTES = 0xFFFFFFFF
+
+DESKTOP_INI = "desktop.ini"
+
+# Keys FileFusion Pro writes and removes again on reset
+OWNED_KEYS = ("IconResource", "InfoTip", "LocalizedResourceName")
+
+
+def get_attributes(path):
+    """Return Windows file attributes, or None where they do not exist"""
+    if sys.platform != "win32":
+        return None
+    attributes = ctypes.windll.kernel32.GetFileAttributesW(str(path))
+    return None if attributes == INVALID_FILE_ATTRIBUTES else attributes
+
+
+def set_attributes(path, add=0, remove=0):
+    """Add and remove Windows attribute bits on path (no-op elsewhere)"""
+    attributes = get_attributes(path)
+    if attributes is None:
+        return False
+    updated = (attributes | add) & ~remove
+    if updated == attributes:
+        return True
+    return bool(ctypes.windll.kernel32.SetFileAttributesW(str(path), updated or FILE_ATTRIBUTE_NORMAL))
+
+
+def write_desktop_ini(folder, entries, section=SHELL_CLASS_INFO):
+    """Merge entries into a folder's desktop.ini
+
+    Keys not in entries (ConfirmFileOp, other sections, ...) are
+    preserved. Returns False when the file already had these values, in
+    which case nothing is written.
+    """
+    desktop_ini = os.path.join(folder, DESKTOP_INI)
+    document = DesktopIni.load(desktop_ini)
+
+    if document.merge(section, entries) or not document.existed:
+        with metrics.span("desktop_ini_write"):
+            # A hidden+system or read-only desktop.ini cannot be replaced until the bits are cleared
+            set_attributes(desktop_ini, remove=FILE_ATTRIBUTE_HIDDEN | FILE_ATTRIBUTE_SYSTEM | FILE_ATTRIBUTE_READONLY)
+            document.write(desktop_ini)
+        return True
+    metrics.count("desktop_ini_unchanged")
+    return False
+
+
+def mark_customized(folder):
+    """Mark desktop.ini hidden+system and the folder read-only so Explorer reads it"""
+    with metrics.span("attribute_set"):
+        set_attributes(os.path.join(folder, DESKTOP_INI), add=FILE_ATTRIBUTE_HIDDEN | FILE_ATTRIBUTE_SYSTEM)
+        set_attributes(folder, add=FILE_ATTRIBUTE_READONLY)
+    metrics.count("folders_customized")
+
+
+def apply_folder(folder, entries, section=SHELL_CLASS_INFO):
+    """Merge entries into a folder's desktop.ini and mark it; returns True if the file changed"""
+    changed = write_desktop_ini(folder, entries, section)
+    mark_customized(folder)
+    return changed
+
+
+def reset_folder(folder, keys=OWNED_KEYS, section=SHELL_CLASS_INFO):
+    """Remove our keys from a folder's desktop.ini; returns True if anything changed
+
+    The file is deleted (and the folder's read-only bit cleared) when no
+    other entries are left in it.
+    """
+    desktop_ini = os.path.join(folder, DESKTOP_INI)
+    document = DesktopIni.load(desktop_ini)
+    if not document.existed or not document.merge(section, {key: None for key in keys}):
+        return False
+
+    set_attributes(desktop_ini, remove=FILE_ATTRIBUTE_HIDDEN | FILE_ATTRIBUTE_SYSTEM | FILE_ATTRIBUTE_READONLY)
+    if not document.keys:
+        os.remove(desktop_ini)
+        set_attributes(folder, remove=FILE_ATTRIBUTE_READONLY)
+    else:
+        document.write(desktop_ini)
+        set_attributes(desktop_ini, add=FILE_ATTRIBUTE_HIDDEN | FILE_ATTRIBUTE_SYSTEM)
+    return True
+
+
+@metrics.task
+def _apply_pairs(pairs, notifier=None, journal=None):
+    """Apply one batch of (folder, entries) pairs, returning the (folder, OSError) pairs that failed"""
+    if journal is not None:
+        return journal.apply_pairs(pairs, notifier)
+    failed = []
+    for folder, entries in pairs:
+        try:
+            if apply_folder(folder, entries) and notifier is not None:
+                notifier.add(folder)
+        except OSError as e:
+            failed.append((folder, e))
+    return failed
+
+
+def apply_batch(folders, entries, workers=1, batch_size=64, progress=None, notifier=None, journal=None):
+    """Customize many folders in batches spread over a thread pool
+
+    progress(done, total) is called after each batch. Folders whose
+    desktop.ini changed are added to notifier (a NotifyScheduler) if given,
+    and every step is recorded in journal (a fusion.journal.Journal) if given.
+    Returns the list of (folder, error) pairs that could not be customized.
+    """
+    folders = list(folders)
+    chunks = [folders[i:i + batch_size] for i in range(0, len(folders), max(batch_size, 1))]
+    failed = []
+    done = 0
+    if journal is not None:
+        journal.plan((folder, entries) for folder in folders)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = {
+            pool.submit(_apply_pairs, [(folder, entries) for folder in chunk], notifier, journal): len(chunk)
+            for chunk in chunks
+        }
+        for future in as_completed(futures):
+            failed.extend((folder, str(error)) for folder, error in future.result())
+            done += futures[future]
+            if progress:
+                progress(done, len(folders))
+    return failed
+
+
+def apply_stream(items, workers=1, batch_size=64, progress=None, notifier=None, journal=None, scheduler=None):
+    """Customize (folder, entries) pairs as they are produced
+
+    items may be a generator (e.g. a classifier walking a tree); batches
+    are dispatched as soon as they fill, with at most two batches per
+    worker in flight. progress(done) is called after each batch. With a
+    VolumeScheduler, batches are formed per volume and run under its
+    per-volume limits instead of a pool of workers threads.
+    """
+    if scheduler is not None:
+        return _apply_stream_scheduled(items, scheduler, batch_size, progress, notifier, journal)
+    failed = []
+    done = 0
+    workers = max(workers, 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+
+        def collect(block):
+            nonlocal done
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED if block else ALL_COMPLETED)
+            for future in finished:
+                failed.extend((folder, str(error)) for folder, error in future.result())
+                done += pending.pop(future)
+                if progress:
+                    progress(done)
+
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                pending[pool.submit(_apply_pairs, batch, notifier, journal)] = len(batch)
+                batch = []
+                if len(pending) >= workers * 2:
+                    collect(True)
+        if batch:
+            pending[pool.submit(_apply_pairs, batch, notifier, journal)] = len(batch)
+        if pending:
+            collect(False)
+    return failed
+
+
+def _apply_stream_scheduled(items, scheduler, batch_size, progress, notifier, journal):
+    """apply_stream over a VolumeScheduler: one filling batch per volume"""
+    failed = []
+    done = 0
+    pending = {}
+    batches = {}   # volume key -> (first folder, pairs)
+
+    def collect(block):
+        nonlocal done
+        finished, _ = wait(pending, return_when=FIRST_COMPLETED if block else ALL_COMPLETED)
+        for future in finished:
+            failed.extend((folder, str(error)) for folder, error in future.result())
+            done += pending.pop(future)
+            if progress:
+                progress(done)
+
+    def flush(key):
+        folder, batch = batches.pop(key)
+        pending[scheduler.submit(folder, _apply_pairs, batch, notifier, journal)] = len(batch)
+
+    for item in items:
+        key = scheduler.volume(item[0]).key
+        if key not in batches:
+            batches[key] = (item[0], [])
+        batches[key][1].append(item)
+        if len(batches[key][1]) >= batch_size:
+            flush(key)
+            if len(pending) >= scheduler.max_workers * 2:
+                collect(True)
+    for key in list(batches):
+        flush(key)
+    if pending:
+        collect(False)
+    return failed
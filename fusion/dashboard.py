@@ -0,0 +1,163 @@
+"""
+Favorites dashboard - size, counts, growth and customization status of many folders
+
+Folders are grouped so that a favorite nested inside another is never
+scanned twice: only the outermost folders are scanned (concurrently) and
+inner favorites read their totals from the outer folder's tree. The last
+results are cached on disk, so the dashboard can show them straight away
+and replace them row by row as fresh scans finish; growth is measured
+against the cached size.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from fusion.desktopini import SHELL_CLASS_INFO, DesktopIni, write_atomic
+from fusion.sizetree import SizeTree
+from fusion.timeseries import snapshot_from_tree
+
+CACHE_VERSION = 1
+
+# Customization status values
+CUSTOMIZED = "customized"
+OTHER_INI = "desktop.ini"
+NOT_APPLIED = "none"
+
+SORT_KEYS = ("folder", "size", "alloc", "files", "dirs", "growth", "status", "scanned")
+
+
+def _key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def group_nested(folders):
+    """Map each outermost folder to the folders (itself included) that lie inside it"""
+    groups = {}
+    outer = None
+    # Sorting by components keeps every folder right after its ancestors
+    for folder in sorted(dict.fromkeys(os.path.abspath(folder) for folder in folders),
+                         key=lambda folder: _key(folder).split(os.sep)):
+        key = _key(folder)
+        if outer is not None and (key == _key(outer) or key.startswith(_key(outer).rstrip(os.sep) + os.sep)):
+            groups[outer].append(folder)
+        else:
+            outer = folder
+            groups[outer] = [folder]
+    return groups
+
+
+def customization_status(folder):
+    """Whether folder has an icon set (customized), only some other desktop.ini, or none"""
+    ini = DesktopIni.load(os.path.join(folder, "desktop.ini"))
+    if not ini.existed:
+        return NOT_APPLIED
+    if ini.get(SHELL_CLASS_INFO, "IconResource") or ini.get(SHELL_CLASS_INFO, "IconFile"):
+        return CUSTOMIZED
+    return OTHER_INI
+
+
+def select(rows, query="", key="size", reverse=True):
+    """Rows whose folder contains query (case-insensitive), sorted by key"""
+    query = query.lower()
+    if query:
+        rows = [row for row in rows if query in row["folder"].lower()]
+    if key in ("folder", "status"):
+        return sorted(rows, key=lambda row: row[key].lower(), reverse=reverse)
+    # Rows without a value (failed scans, no earlier size) always go last
+    known = [row for row in rows if row[key] is not None]
+    return sorted(known, key=lambda row: row[key], reverse=reverse) + [row for row in rows if row[key] is None]
+
+
+class Dashboard:
+    """Stats rows of many folders with an on-disk cache of the last results
+
+    scan(root) builds the SizeTree of one outermost folder; pass one that
+    routes through the shared VolumeScheduler (or NetworkIO for shares).
+    With a TimeSeriesStore as history, every fresh row is also recorded there.
+    """
+
+    def __init__(self, cache_path, scan=None, history=None):
+        self.cache_path = cache_path
+        self.scan = scan or SizeTree.scan
+        self.history = history
+        self.rows = {}   # folder key -> row
+        try:
+            with open(cache_path, 'r') as f:
+                cache = json.load(f)
+            if cache.get("version") == CACHE_VERSION:
+                self.rows = {_key(row["folder"]): row for row in cache["rows"]}
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def cached(self, folders):
+        """The last known rows of folders (not rescanned)"""
+        rows = []
+        for folder in folders:
+            row = self.rows.get(_key(folder))
+            if row is not None:
+                rows.append(dict(row, live=False))
+        return rows
+
+    def _row(self, folder, tree, error=None):
+        previous = self.rows.get(_key(folder))
+        row = {"folder": folder, "size": None, "alloc": None, "files": None, "dirs": None,
+               "growth": None, "since": None, "status": NOT_APPLIED, "scanned": time.time(),
+               "error": error, "live": True}
+        node = tree.find(folder) if tree is not None else -1
+        if node >= 0:
+            row.update(size=tree.size[node], alloc=tree.alloc[node], files=tree.files[node], dirs=tree.dirs[node])
+            if previous is not None and previous.get("size") is not None:
+                row["growth"] = row["size"] - previous["size"]
+                row["since"] = previous["scanned"]
+            try:
+                row["status"] = customization_status(folder)
+            except OSError:
+                pass
+        elif error is None:
+            row["error"] = "Folder not found"
+        return row
+
+    def refresh(self, folders, on_row=None, workers=8):
+        """Rescan folders concurrently; on_row(row) is called as each one is ready
+
+        Returns the fresh rows and updates the cache.
+        """
+        groups = group_nested(folders)
+        rows = []
+        snapshots = []
+        if not groups:
+            return rows
+
+        def scan(root):
+            if not os.path.isdir(root):
+                return None
+            return self.scan(root)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(groups)))) as pool:
+            futures = {pool.submit(scan, root): root for root in groups}
+            for future in as_completed(futures):
+                root = futures[future]
+                try:
+                    tree, error = future.result(), None
+                except OSError as e:
+                    tree, error = None, str(e)
+                for folder in groups[root]:
+                    row = self._row(folder, tree, error)
+                    rows.append(row)
+                    if row["size"] is not None:
+                        snapshots.append((folder, snapshot_from_tree(tree, tree.find(folder), row["scanned"])))
+                    if on_row:
+                        on_row(row)
+        for row in rows:
+            if row["error"] is None:
+                self.rows[_key(row["folder"])] = row
+        self.save()
+        if self.history is not None and snapshots:
+            self.history.append_many(snapshots)
+        return rows
+
+    def save(self):
+        rows = [{key: value for key, value in row.items() if key != "live"} for row in self.rows.values()]
+        write_atomic(self.cache_path, json.dumps({"version": CACHE_VERSION, "rows": rows}).encode("utf-8"))
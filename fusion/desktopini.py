@@ -0,0 +1,180 @@
+"""
+desktop.ini model - parse, merge owned keys and write back only when needed
+
+Existing files are kept line for line: sections, comments, key order and the
+original encoding (ANSI, or UTF-8/UTF-16 with BOM) survive a merge, unless a
+merged value does not fit the file's encoding: Explorer reads files without
+a BOM as ANSI, so those switch to UTF-16 LE with a BOM instead. Only
+the keys passed to merge() are touched, and write() is skipped by callers
+when merge() reports that nothing changed.
+"""
+
+import codecs
+import os
+import sys
+import tempfile
+
+SHELL_CLASS_INFO = ".ShellClassInfo"
+
+# Encoding Explorer uses for desktop.ini files without a BOM (the ANSI code
+# page); elsewhere the common Western one stands in, whatever the locale
+ANSI_ENCODING = "mbcs" if sys.platform == "win32" else "cp1252"
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+
+def decode(data):
+    """Return (text, encoding, bom) for raw desktop.ini bytes"""
+    for bom, encoding in _BOMS:
+        if data.startswith(bom):
+            return data[len(bom):].decode(encoding, errors="replace"), encoding, bom
+    # UTF-16 without a BOM: every other byte of ASCII text is zero
+    if len(data) >= 4 and data[1] == 0 and data[3] == 0:
+        return data.decode("utf-16-le", errors="replace"), "utf-16-le", b""
+    # Without a BOM Explorer reads ANSI, even if the bytes happen to be valid UTF-8
+    return data.decode(ANSI_ENCODING, errors="replace"), ANSI_ENCODING, b""
+
+
+class DesktopIni:
+    """Line-preserving desktop.ini document"""
+
+    def __init__(self, text="", encoding="ascii", bom=b"", existed=False, stat=None):
+        self.encoding = encoding
+        self.bom = bom
+        self.existed = existed
+        self.stat = stat
+        self.newline = "\n" if text and "\r\n" not in text and "\n" in text else "\r\n"
+        self.lines = text.splitlines()
+        self.changed = False
+        self._reindex()
+
+    @classmethod
+    def parse(cls, data, existed=True, stat=None):
+        """Build a document from raw bytes"""
+        text, encoding, bom = decode(data)
+        return cls(text, encoding, bom, existed, stat)
+
+    @classmethod
+    def load(cls, path):
+        """Read path, or return an empty document if it does not exist"""
+        try:
+            with open(path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                return cls.parse(f.read(), True, stat)
+        except FileNotFoundError:
+            return cls()
+
+    def _reindex(self):
+        """Map section and key names (case-insensitive) to line numbers"""
+        self.sections = {}
+        self.keys = {}
+        section = None
+        for number, line in enumerate(self.lines):
+            stripped = line.strip()
+            if not stripped or stripped[0] in ";#":
+                continue
+            if stripped[0] == "[":
+                end = stripped.find("]")
+                section = (stripped[1:end] if end > 0 else stripped[1:]).strip().lower()
+                self.sections.setdefault(section, [number, number])
+                continue
+            if section is None:
+                continue
+            self.sections[section][1] = number
+            equals = stripped.find("=")
+            if equals > 0:
+                self.keys.setdefault((section, stripped[:equals].strip().lower()), number)
+
+    def get(self, section, key, default=None):
+        """Return the value of key in section"""
+        number = self.keys.get((section.lower(), key.lower()))
+        if number is None:
+            return default
+        line = self.lines[number]
+        return line[line.find("=") + 1:].strip()
+
+    def items(self, section):
+        """Return [(key, value)] for a section in file order"""
+        section = section.lower()
+        result = []
+        for (name, _), number in sorted(self.keys.items(), key=lambda item: item[1]):
+            if name == section:
+                line = self.lines[number]
+                equals = line.find("=")
+                result.append((line[:equals].strip(), line[equals + 1:].strip()))
+        return result
+
+    def merge(self, section, values):
+        """Set (or, for None values, remove) keys in section; returns True if anything changed"""
+        changed = False
+        for key, value in values.items():
+            number = self.keys.get((section.lower(), key.lower()))
+            if value is None:
+                if number is not None:
+                    del self.lines[number]
+                    self._reindex()
+                    changed = True
+                continue
+            value = str(value)
+            if number is not None:
+                line = self.lines[number]
+                equals = line.find("=")
+                if line[equals + 1:].strip() == value:
+                    continue
+                self.lines[number] = f"{line[:equals].strip()}={value}"
+            else:
+                bounds = self.sections.get(section.lower())
+                if bounds is None:
+                    if self.lines and self.lines[-1].strip():
+                        self.lines.append("")
+                    self.lines.append(f"[{section}]")
+                    self.lines.append(f"{key}={value}")
+                else:
+                    self.lines.insert(bounds[1] + 1, f"{key}={value}")
+                self._reindex()
+            changed = True
+        self.changed = self.changed or changed
+        return changed
+
+    def _target_encoding(self, text):
+        """Keep the original encoding (ASCII for new files) unless it cannot represent the text"""
+        try:
+            text.encode(self.encoding)
+            return self.encoding, self.bom
+        except UnicodeEncodeError:
+            # Explorer reads UTF-16 LE with a BOM for non-ANSI content
+            return "utf-16-le", codecs.BOM_UTF16_LE
+
+    def serialize(self):
+        """Return the document as bytes in its (possibly upgraded) encoding"""
+        text = self.newline.join(self.lines) + self.newline
+        encoding, bom = self._target_encoding(text)
+        return bom + text.encode(encoding)
+
+    def write(self, path):
+        """Atomically replace path with the serialized document"""
+        write_atomic(path, self.serialize())
+        self.existed = True
+        self.changed = False
+
+
+def write_atomic(path, data):
+    """Write data to a temporary file beside path, then rename it over path"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(prefix=".desktop-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,285 @@
+"""
+Folder finder index - ranked substring and fuzzy search over known folders
+
+Every folder seen by a stats scan (plus favorites and recent folders) goes
+into an on-disk index: the full paths, the lower-cased folder names, and a
+trigram index over the names (for each 3-byte sequence, the sorted ids of
+the names containing it). All parts are flat files opened as memory maps,
+so loading costs nothing and a query touches only the postings and names
+it needs. A query's last word is looked up by trigrams (or scanned for
+directly when its postings are huge); if that finds too little, a fuzzy
+subsequence pass over the names follows. Earlier words must occur
+somewhere in the full path. Results are ranked exact name, name prefix,
+substring, then fuzzy, with shorter names and shallower paths first.
+"""
+
+import json
+import os
+import re
+import shutil
+import threading
+
+import numpy as np
+
+from fusion.desktopini import write_atomic
+
+INDEX_VERSION = 1
+INDEX_FILE = "index.json"
+
+# Above this many candidates a direct scan of the names beats verifying postings
+SCAN_THRESHOLD = 20000
+
+EXACT, PREFIX, SUBSTRING, FUZZY = range(4)
+
+_SPLIT = re.compile(r"[\s/\\]+")
+
+
+def _key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _write_array(path, array):
+    with open(path, 'wb') as f:
+        np.save(f, array)
+
+
+def _trigrams(blob, offsets):
+    """(keys, starts, ids): sorted trigram codes, posting offsets and the postings"""
+    data = np.frombuffer(blob, dtype=np.uint8)
+    if len(data) < 3:
+        return np.zeros(0, np.uint32), np.zeros(1, np.uint64), np.zeros(0, np.uint32)
+    codes = (data[:-2].astype(np.uint32) << 16) | (data[1:-1].astype(np.uint32) << 8) | data[2:]
+    # A trigram may not cross the newline between two names
+    newline = data == 0x0A
+    valid = ~(newline[:-2] | newline[1:-1] | newline[2:])
+    positions = np.nonzero(valid)[0]
+    ids = np.searchsorted(offsets, positions, side="right") - 1
+    # One sort orders by trigram, then id; repeats within a name are dropped after it
+    combined = (codes[positions].astype(np.uint64) << np.uint64(32)) | ids.astype(np.uint64)
+    combined.sort()
+    if len(combined):
+        combined = combined[np.concatenate(([True], combined[1:] != combined[:-1]))]
+    keys = (combined >> np.uint64(32)).astype(np.uint32)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1]))) if len(keys) else np.zeros(0, np.int64)
+    return keys[starts], np.append(starts, len(keys)).astype(np.uint64), (combined & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+class DirectoryIndex:
+    """Folder paths under directory with a memory-mapped trigram index of their names"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.count = 0
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()  # one read-modify-rebuild at a time
+        self._maps = None
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(os.path.join(directory, INDEX_FILE), 'r') as f:
+                index = json.load(f)
+            if index.get("version") == INDEX_VERSION:
+                self._open(index["generation"], index["count"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def __len__(self):
+        return self.count
+
+    def _generation_dir(self, generation):
+        return os.path.join(self.directory, f"gen-{generation:06d}")
+
+    def _open(self, generation, count):
+        folder = self._generation_dir(generation)
+        maps = {}
+        for name in ("path_offsets", "name_offsets", "depths", "tri_keys", "tri_starts", "tri_ids"):
+            maps[name] = np.load(os.path.join(folder, name + ".npy"), mmap_mode="r")
+        for name in ("paths", "names"):
+            size = os.path.getsize(os.path.join(folder, name + ".txt"))
+            maps[name] = np.memmap(os.path.join(folder, name + ".txt"), dtype=np.uint8, mode="r") if size else \
+                np.zeros(0, np.uint8)
+        self._maps = maps
+        self.generation = generation
+        self.count = count
+
+    def paths(self):
+        """All indexed paths"""
+        if not self.count:
+            return []
+        return bytes(self._maps["paths"]).decode("utf-8").split("\n")[:-1]
+
+    def path(self, index, maps=None):
+        """Path with the given id (in maps, the generation a search started with)"""
+        maps = maps or self._maps
+        offsets = maps["path_offsets"]
+        return bytes(maps["paths"][int(offsets[index]):int(offsets[index + 1]) - 1]).decode("utf-8")
+
+    def build(self, paths):
+        """Replace the index with paths (absolute and normalized; duplicates are dropped)"""
+        paths = list(dict.fromkeys(paths))
+        names = [(path.rpartition(os.sep)[2] or path).lower() for path in paths]
+        path_blob = "".join(path + "\n" for path in paths).encode("utf-8")
+        name_blob = "".join(name + "\n" for name in names).encode("utf-8")
+        path_offsets = np.zeros(len(paths) + 1, np.uint64)
+        name_offsets = np.zeros(len(paths) + 1, np.uint64)
+        path_offsets[1:] = np.cumsum([len(path.encode("utf-8")) + 1 for path in paths], dtype=np.uint64)
+        name_offsets[1:] = np.cumsum([len(name.encode("utf-8")) + 1 for name in names], dtype=np.uint64)
+        depths = np.array([path.count(os.sep) for path in paths], dtype=np.uint16)
+        keys, starts, ids = _trigrams(name_blob, name_offsets)
+
+        with self._lock:
+            generation = self.generation + 1
+            folder = self._generation_dir(generation)
+            shutil.rmtree(folder, ignore_errors=True)
+            os.makedirs(folder)
+            for name, data in (("paths", path_blob), ("names", name_blob)):
+                with open(os.path.join(folder, name + ".txt"), 'wb') as f:
+                    f.write(data)
+            for name, array in (("path_offsets", path_offsets), ("name_offsets", name_offsets), ("depths", depths),
+                                ("tri_keys", keys), ("tri_starts", starts), ("tri_ids", ids)):
+                _write_array(os.path.join(folder, name + ".npy"), array)
+            # The index file switches generations atomically; readers of the old one keep their maps
+            write_atomic(os.path.join(self.directory, INDEX_FILE), json.dumps(
+                {"version": INDEX_VERSION, "generation": generation, "count": len(paths)}).encode("utf-8"))
+            self._open(generation, len(paths))
+            for entry in os.listdir(self.directory):
+                if entry.startswith("gen-") and entry != os.path.basename(folder):
+                    # Still-mapped files cannot be removed on Windows; the next build retries
+                    shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+
+    def update(self, paths, root=None):
+        """Add absolute, normalized paths; with root, first drop every indexed path at or below root
+
+        A fresh scan of root passes all of its folders, so folders deleted
+        since the last scan disappear from the index.
+        """
+        with self._update_lock:
+            existing = self.paths()
+            if root is not None:
+                root_key = _key(root)
+                prefix = root_key.rstrip(os.sep) + os.sep
+                existing = [path for path in existing
+                            if not (_key(path) == root_key or _key(path).startswith(prefix))]
+            self.build(existing + list(paths))
+
+    def _postings(self, maps, term):
+        """Ids of names containing every trigram of term (sorted), or None if term is too short"""
+        data = term.encode("utf-8")
+        if len(data) < 3:
+            return None
+        keys = maps["tri_keys"]
+        result = None
+        for i in range(len(data) - 2):
+            code = (data[i] << 16) | (data[i + 1] << 8) | data[i + 2]
+            slot = np.searchsorted(keys, code)
+            if slot >= len(keys) or keys[slot] != code:
+                return np.zeros(0, np.uint32)
+            ids = maps["tri_ids"][int(maps["tri_starts"][slot]):int(maps["tri_starts"][slot + 1])]
+            result = ids if result is None else np.intersect1d(result, ids, assume_unique=True)
+            if not len(result):
+                break
+        return result
+
+    def _substring_candidates(self, maps, term):
+        """(ids, prefix, verified) for names that may contain term
+
+        Terms of three bytes or more come from the trigram postings, which
+        can include names holding all trigrams but not the term itself, so
+        those are verified later, and only for candidates that make it into
+        the results. Shorter terms only match name prefixes (anything else
+        matches most of the index), found by one pass over all names.
+        prefix marks names starting with term.
+        """
+        names = maps["names"]
+        offsets = maps["name_offsets"]
+        needle = term.encode("utf-8")
+        candidates = self._postings(maps, term)
+        if candidates is None:
+            # A literal pattern lets the regex engine skip ahead quickly; the
+            # newline before each name is part of it (the first name has none)
+            starts = [match.start() + 1 for match in re.finditer(re.escape(b"\n" + needle), names)]
+            if bytes(names[:len(needle)]) == needle:
+                starts.insert(0, 0)
+            ids = np.searchsorted(offsets, np.array(starts, dtype=np.int64), side="right") - 1
+            return ids.astype(np.int64), np.ones(len(ids), bool), True
+        ids = candidates.astype(np.int64)
+        if not len(ids):
+            return ids, np.zeros(0, bool), True
+        # Compare the first len(term) bytes of every candidate at once
+        window = offsets[ids].astype(np.int64)[:, None] + np.arange(len(needle))
+        window = np.minimum(window, len(names) - 1)
+        prefix = (names[window] == np.frombuffer(needle, dtype=np.uint8)).all(axis=1)
+        return ids, prefix, False
+
+    def _fuzzy_matches(self, maps, term, limit):
+        """(ids, spans) of names containing term's characters in order, at most limit of them"""
+        offsets = maps["name_offsets"]
+        pattern = b"[^\n]*?".join(re.escape(bytes([byte])) for byte in term.encode("utf-8"))
+        starts = []
+        spans = []
+        # The regex runs over the mapped names directly, without copying them
+        for match in re.finditer(pattern, maps["names"]):
+            starts.append(match.start())
+            spans.append(match.end() - match.start())
+            if len(starts) >= limit:
+                break
+        if not starts:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64)
+        ids = np.searchsorted(offsets, np.array(starts, dtype=np.int64), side="right") - 1
+        ids, first = np.unique(ids, return_index=True)
+        return ids, np.array(spans, dtype=np.int64)[first]
+
+    def search(self, query, limit=20, boost=()):
+        """Return up to limit best matching paths for query
+
+        boost is a collection of paths (e.g. favorites) ranked ahead of
+        otherwise equal matches.
+        """
+        terms = [term for term in _SPLIT.split(query.lower()) if term]
+        if not terms or not self.count:
+            return []
+        with self._lock:
+            maps = self._maps
+        last, rest = terms[-1], terms[:-1]
+        needle = last.encode("utf-8")
+        names = maps["names"]
+        name_offsets = maps["name_offsets"]
+        wanted = limit * 4
+        results = []
+        seen = set()
+
+        def collect(ids, score, verify):
+            for index in ids[np.argsort(score, kind="stable")].tolist():
+                if verify and bytes(names[int(name_offsets[index]):int(name_offsets[index + 1])]).find(needle) < 0:
+                    continue
+                path = self.path(index, maps)
+                lowered = path.lower()
+                if all(term in lowered for term in rest):
+                    seen.add(index)
+                    results.append(path)
+                    # Enough to reorder boosted paths without visiting every match
+                    if len(results) >= wanted:
+                        return
+
+        def lengths(ids):
+            return (name_offsets[ids + 1] - name_offsets[ids]).astype(np.int64) - 1
+
+        ids, prefix, verified = self._substring_candidates(maps, last)
+        if len(ids):
+            name_lengths = lengths(ids)
+            category = np.where(prefix, np.where(name_lengths == len(needle), EXACT, PREFIX), SUBSTRING)
+            depths = maps["depths"][ids].astype(np.int64)
+            collect(ids, (category.astype(np.int64) << 40) + (name_lengths << 16) + depths, not verified)
+        if len(results) < limit:
+            fuzzy_ids, spans = self._fuzzy_matches(maps, last, limit * 50)
+            fresh = np.array([index not in seen for index in fuzzy_ids.tolist()], dtype=bool)
+            fuzzy_ids, spans = fuzzy_ids[fresh], spans[fresh]
+            if len(fuzzy_ids):
+                # Tighter matches first, then shorter names and shallower paths
+                depths = maps["depths"][fuzzy_ids].astype(np.int64)
+                collect(fuzzy_ids, (spans << 40) + (lengths(fuzzy_ids) << 16) + depths, False)
+
+        if boost:
+            boosted = {_key(path) for path in boost}
+            results.sort(key=lambda path: _key(path) not in boosted)
+        return results[:limit]
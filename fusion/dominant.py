@@ -0,0 +1,301 @@
+"""
+Dominant colors - palette suggestions from an icon or the images in a folder
+
+Each image is decoded small (JPEG draft mode, then Image.reduce) and its
+pixels are clustered with k-means in OKLab. Per-image palettes are cached
+by the sha256 of the file, with a stat index so unchanged files are not
+even re-hashed. Files the stat index does not know are hashed first, so
+copies and renames of known images reuse their palette undecoded; the
+rest are decoded in a process pool under a time budget. Whatever finished
+in time is merged with a weighted k-means.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+from PIL import Image
+
+from fusion.colors import oklab_to_rgb_array, rgb_to_hex, rgb_to_oklab_array
+from fusion.desktopini import write_atomic
+from fusion.hashing import hash_files
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tif", ".tiff", ".webp", ".ico"}
+
+# Longest side images are reduced to before clustering
+SAMPLE_SIDE = 64
+
+
+def load_pixels(path, side=SAMPLE_SIDE):
+    """Decode an image at roughly side x side and return its opaque pixels as (n, 3) uint8"""
+    with Image.open(path) as image:
+        # JPEG decodes straight at 1/2, 1/4 or 1/8 scale
+        image.draft("RGB", (side * 2, side * 2))
+        factor = max(1, min(image.size) // side)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        if factor > 1:
+            image = image.reduce(factor)
+        if image.width > side * 2 or image.height > side * 2:
+            image.thumbnail((side * 2, side * 2))
+        pixels = np.asarray(image.convert("RGBA")).reshape(-1, 4)
+    return pixels[pixels[:, 3] >= 128, :3]
+
+
+def kmeans(points, k, weights=None, iterations=12, seed=0):
+    """Weighted k-means; returns (centers, weights of each cluster) sorted by weight"""
+    points = np.asarray(points, dtype=np.float32)
+    weights = np.ones(len(points), dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32)
+    if len(points) == 0:
+        return points.reshape(0, points.shape[-1] if points.ndim > 1 else 3), weights[:0]
+    k = min(k, len(points))
+
+    # k-means++ seeding with a fixed generator so suggestions are stable
+    rng = np.random.default_rng(seed)
+    centers = [points[rng.choice(len(points), p=weights / weights.sum())]]
+    for _ in range(1, k):
+        distances = ((points[:, None, :] - np.array(centers)[None, :, :]) ** 2).sum(axis=-1).min(axis=1)
+        scores = distances * weights
+        if scores.sum() <= 0:
+            break
+        centers.append(points[rng.choice(len(points), p=scores / scores.sum())])
+    centers = np.array(centers)
+
+    for _ in range(iterations):
+        labels = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=-1).argmin(axis=1)
+        totals = np.bincount(labels, weights=weights, minlength=len(centers))
+        updated = np.stack([
+            np.bincount(labels, weights=weights * points[:, axis], minlength=len(centers))
+            for axis in range(points.shape[1])
+        ], axis=1) / np.maximum(totals, 1e-9)[:, None]
+        updated[totals == 0] = centers[totals == 0]
+        if np.allclose(updated, centers, atol=1e-4):
+            centers = updated
+            break
+        centers = updated
+
+    labels = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=-1).argmin(axis=1)
+    totals = np.bincount(labels, weights=weights, minlength=len(centers))
+    order = np.argsort(-totals)
+    keep = order[totals[order] > 0]
+    return centers[keep], totals[keep]
+
+
+def _to_palette(lab_centers, totals):
+    """OKLab centers and weights -> [(hex, share)]"""
+    if len(totals) == 0:
+        return []
+    colors = oklab_to_rgb_array(lab_centers)
+    share = totals / totals.sum()
+    return [(rgb_to_hex(color), round(float(part), 4)) for color, part in zip(colors, share)]
+
+
+def _histogram(pixels, bits=5):
+    """Collapse pixels to distinct colors at bits per channel: (colors, counts)"""
+    shift = 8 - bits
+    q = pixels.astype(np.uint32) >> shift
+    codes, counts = np.unique((q[:, 0] << (2 * bits)) | (q[:, 1] << bits) | q[:, 2], return_counts=True)
+    mask = (1 << bits) - 1
+    half = 1 << (shift - 1) if shift else 0
+    colors = np.stack([(codes >> (2 * bits)) & mask, (codes >> bits) & mask, codes & mask], axis=1)
+    return ((colors << shift) + half).astype(np.uint8), counts
+
+
+def image_palette(path, k=5):
+    """Return [(hex, share)] dominant colors of one image, largest first"""
+    pixels = load_pixels(path)
+    if len(pixels) == 0:
+        return []
+    # k-means runs over the distinct (quantized) colors weighted by pixel count
+    colors, counts = _histogram(pixels)
+    return _to_palette(*kmeans(rgb_to_oklab_array(colors), k, counts))
+
+
+def _extract_chunk(items, k):
+    """Process-pool worker: [(path, stat key, digest, palette or None)] for (path, stat key, digest) items"""
+    results = []
+    for path, stat_key, digest in items:
+        try:
+            palette = image_palette(path, k)
+        except Exception:
+            palette = None
+        results.append((path, stat_key, digest, palette))
+    return results
+
+
+class PaletteCache:
+    """Per-image palettes keyed by content hash, plus a stat index to skip hashing"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.palettes = {}   # digest -> [(hex, share)]
+        self.files = {}      # path -> [size, mtime_ns, digest]
+        self._lock = threading.Lock()
+        self.dirty = False
+        if path:
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                self.palettes = data.get("palettes", {})
+                self.files = data.get("files", {})
+            except (OSError, ValueError):
+                pass
+
+    def lookup(self, path):
+        """Cached palette for path if its size and mtime are unchanged, else None"""
+        entry = self.files.get(path)
+        if entry is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if [st.st_size, st.st_mtime_ns] != entry[:2]:
+            return None
+        return self.palettes.get(entry[2])
+
+    def store(self, path, stat_key, digest, palette):
+        with self._lock:
+            self.palettes[digest] = palette
+            self.files[path] = stat_key + [digest]
+            self.dirty = True
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        with self._lock:
+            data = json.dumps({"palettes": self.palettes, "files": self.files}, separators=(",", ":"))
+            self.dirty = False
+        write_atomic(self.path, data.encode("utf-8"))
+
+
+def image_files(folder, recursive=False, limit=None):
+    """List image files in folder (optionally below it)"""
+    found = []
+    stack = [folder]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            stack.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                        found.append(entry.path)
+                        if limit and len(found) >= limit:
+                            return found
+        except OSError:
+            continue
+    return found
+
+
+def merge_palettes(palettes, k=6):
+    """Combine per-image [(hex, share)] palettes into one weighted palette"""
+    colors = [color for palette in palettes for color, _ in palette]
+    if not colors:
+        return []
+    shares = np.array([share for palette in palettes for _, share in palette], dtype=np.float32)
+    rgb = np.array([[int(c[i:i + 2], 16) for i in (1, 3, 5)] for c in colors], dtype=np.uint8)
+    return _to_palette(*kmeans(rgb_to_oklab_array(rgb), k, shares))
+
+
+def folder_palette(folder, k=6, budget=10.0, workers=None, cache=None, recursive=False,
+                   chunk_size=16, progress=None, hash_workers=1, use_mmap=False):
+    """Suggest k colors from the images in folder within budget seconds
+
+    hash_workers and use_mmap (from the volume's performance profile) set
+    how new images are hashed; the budget covers hashing as well as
+    decoding. Returns (palette, stats); stats counts images found, cached,
+    processed and skipped because the budget ran out.
+    """
+    deadline = time.monotonic() + budget
+    paths = image_files(folder, recursive)
+    cache = cache or PaletteCache()
+    palettes = []
+    todo = []
+    for path in paths:
+        cached = cache.lookup(path)
+        if cached is not None:
+            palettes.append(cached)
+        else:
+            todo.append(path)
+    stats = {"images": len(paths), "cached": len(palettes), "processed": 0, "skipped": 0}
+
+    # Hash before decoding: a known digest (a copied or renamed image) needs no
+    # worker, and copies among the new images are decoded once. Files are
+    # hashed a few chunks at a time so the deadline also bounds hashing, and
+    # new digests go to the decode workers while later files are hashed.
+    unknown = {}   # digest -> [(path, stat key)]
+    unreadable = 0
+    hashed = 0
+    step = chunk_size * max(hash_workers, 1)
+    pool = None
+    pending = set()
+    batch = []
+
+    def collect(timeout):
+        nonlocal pending
+        finished, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in finished:
+            for _, _, digest, palette in future.result():
+                for path, stat_key in unknown[digest]:
+                    stats["processed"] += 1
+                    if palette is not None:
+                        cache.store(path, stat_key, digest, palette)
+                        palettes.append(palette)
+        if finished and progress:
+            progress(stats["cached"] + stats["processed"], len(paths))
+
+    try:
+        for first in range(0, len(todo), step):
+            if time.monotonic() >= deadline:
+                break
+            part = todo[first:first + step]
+            hashed += len(part)
+            digests = hash_files(part, hash_workers, use_mmap)
+            for path in part:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    st = None
+                # hash_files leaves out files it could not read
+                digest = digests.get(path)
+                if st is None or digest is None:
+                    unreadable += 1
+                    continue
+                stat_key = [st.st_size, st.st_mtime_ns]
+                palette = cache.palettes.get(digest)
+                if palette is not None:
+                    cache.store(path, stat_key, digest, palette)
+                    palettes.append(palette)
+                    stats["cached"] += 1
+                    continue
+                if digest not in unknown:
+                    batch.append((path, stat_key, digest))
+                unknown.setdefault(digest, []).append((path, stat_key))
+            if batch and (len(batch) >= chunk_size or first + step >= len(todo)):
+                pool = pool or ProcessPoolExecutor(max_workers=workers)
+                for i in range(0, len(batch), chunk_size):
+                    pending.add(pool.submit(_extract_chunk, batch[i:i + chunk_size], k))
+                batch = []
+            if pending:
+                collect(0)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            collect(remaining)
+    finally:
+        if pool is not None:
+            # Out of time: drop queued chunks instead of waiting for them
+            pool.shutdown(wait=False, cancel_futures=True)
+    # Images never hashed or never decoded before the deadline
+    stats["skipped"] = len(todo) - hashed + sum(len(copies) for copies in unknown.values()) - stats["processed"]
+    # Unreadable files count as processed, as a failed decode does
+    stats["processed"] += unreadable
+
+    cache.save()
+    return merge_palettes(palettes, k), stats
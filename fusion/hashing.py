@@ -0,0 +1,54 @@
+"""
+File hashing - content digests with buffered or memory-mapped reads
+"""
+
+import hashlib
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from fusion.instrument import metrics
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def hash_bytes(data):
+    """Return the hex digest used for content addressing"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path, use_mmap=False, chunk_size=CHUNK_SIZE):
+    """Return the sha256 hex digest of a file"""
+    with metrics.span("hash"):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if use_mmap and size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    digest.update(mapped)
+            else:
+                buffer = bytearray(chunk_size)
+                view = memoryview(buffer)
+                while True:
+                    read = f.readinto(buffer)
+                    if not read:
+                        break
+                    digest.update(view[:read])
+        metrics.count("bytes_hashed", size)
+        return digest.hexdigest()
+
+
+def hash_files(paths, workers=1, use_mmap=False):
+    """Hash many files, returning {path: digest}; unreadable files are skipped"""
+    def safe_hash(path):
+        try:
+            return path, hash_file(path, use_mmap)
+        except OSError:
+            return path, None
+
+    if workers <= 1:
+        results = map(safe_hash, paths)
+        return {path: digest for path, digest in results if digest}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return {path: digest for path, digest in pool.map(safe_hash, paths) if digest}
@@ -0,0 +1,357 @@
+"""
+Undo/redo history - one entry per user operation, however many folders it touched
+
+An entry lists, for every folder, the desktop.ini it had before and after
+the operation. File contents live once in a content-addressed blob store
+(a 10k-folder batch usually produces a handful of distinct files), and the
+entry itself only holds paths relative to a common root plus indexes into
+a small table of blob digests. Undo and redo restore folders on a thread
+pool and skip folders that were changed again since; given the IconStore,
+they also move each folder's icon reference (or portable icon copy) along
+with its desktop.ini. Old entries are pruned by count and by blob-store size.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fusion.customize import (
+    DESKTOP_INI, FILE_ATTRIBUTE_HIDDEN, FILE_ATTRIBUTE_READONLY, FILE_ATTRIBUTE_SYSTEM,
+    mark_customized, set_attributes
+)
+from fusion.desktopini import SHELL_CLASS_INFO, DesktopIni, write_atomic
+from fusion.hashing import hash_bytes
+from fusion.store import PORTABLE_ICON_NAME, ContentStore
+
+_INI_BITS = FILE_ATTRIBUTE_HIDDEN | FILE_ATTRIBUTE_SYSTEM | FILE_ATTRIBUTE_READONLY
+
+
+def read_desktop_ini(folder):
+    """Return the raw desktop.ini bytes of folder, or None if it has none"""
+    try:
+        with open(os.path.join(folder, DESKTOP_INI), 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _restore(folder, expected, data):
+    """Put data (or no file) back if the folder still holds expected; returns False on conflict"""
+    current = read_desktop_ini(folder)
+    if (hash_bytes(current) if current is not None else None) != expected:
+        return False
+    desktop_ini = os.path.join(folder, DESKTOP_INI)
+    set_attributes(desktop_ini, remove=_INI_BITS)
+    if data is None:
+        try:
+            os.remove(desktop_ini)
+        except FileNotFoundError:
+            pass
+        set_attributes(folder, remove=FILE_ATTRIBUTE_READONLY)
+    else:
+        write_atomic(desktop_ini, data)
+        mark_customized(folder)
+    return True
+
+
+def _is_copy(resource):
+    """True if an IconResource value names the per-folder portable icon copy"""
+    return bool(resource) and resource.rsplit(",", 1)[0].strip().strip('"') == PORTABLE_ICON_NAME
+
+
+class Recorder:
+    """Collects the folder changes of one operation (thread-safe)"""
+
+    def __init__(self, history, label, meta=None):
+        self.history = history
+        self.label = label
+        self.meta = meta or {}
+        self.changes = []
+        self._lock = threading.Lock()
+
+    def record(self, folder, before, after):
+        """Record one folder's desktop.ini bytes (None = no file) before and after"""
+        if before == after:
+            return
+        blobs = self.history.blobs
+        change = (
+            folder,
+            blobs.put_bytes(before) if before is not None else None,
+            blobs.put_bytes(after) if after is not None else None,
+        )
+        with self._lock:
+            self.changes.append(change)
+
+    def commit(self):
+        """Push the operation onto the undo stack; returns its id or None if nothing changed"""
+        return self.history.push(self) if self.changes else None
+
+
+class History:
+    """Persistent undo and redo stacks of customization entries"""
+
+    def __init__(self, directory, max_entries=100, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.entries_dir = os.path.join(directory, "entries")
+        self.index_file = os.path.join(directory, "index.json")
+        self.blobs = ContentStore(os.path.join(directory, "blobs"), ".ini")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        os.makedirs(self.entries_dir, exist_ok=True)
+        try:
+            with open(self.index_file, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        self.undo_stack = index.get("undo", [])   # entry summaries, oldest first
+        self.redo_stack = index.get("redo", [])
+
+    def _save_index(self):
+        data = json.dumps({"undo": self.undo_stack, "redo": self.redo_stack}, indent=1)
+        write_atomic(self.index_file, data.encode("utf-8"))
+
+    def _entry_path(self, entry_id):
+        return os.path.join(self.entries_dir, f"{entry_id}.json")
+
+    def begin(self, label, meta=None):
+        """Start recording an operation"""
+        return Recorder(self, label, meta)
+
+    def push(self, recorder):
+        """Store a recorder's changes as a new entry (used by Recorder.commit)"""
+        folders = [folder for folder, _, _ in recorder.changes]
+        try:
+            root = os.path.commonpath(folders) if len(folders) > 1 else os.path.dirname(folders[0])
+        except ValueError:
+            # No common root (different drives, or mixed relative and absolute paths): keep absolute paths
+            root = ""
+            folders = [os.path.abspath(folder) for folder in folders]
+        digests = sorted({d for _, before, after in recorder.changes for d in (before, after) if d})
+        slot = {digest: i for i, digest in enumerate(digests)}
+        entry_id = f"{time.time_ns()}"
+        entry = {
+            "root": root,
+            "blobs": digests,
+            # [path relative to root, before blob index, after blob index]; -1 = no file
+            "changes": [
+                [os.path.relpath(folder, root) if root else folder, slot.get(before, -1), slot.get(after, -1)]
+                for folder, (_, before, after) in zip(folders, recorder.changes)
+            ],
+        }
+        write_atomic(self._entry_path(entry_id), json.dumps(entry, separators=(",", ":")).encode("utf-8"))
+        summary = {"id": entry_id, "label": recorder.label, "time": time.time(),
+                   "folders": len(folders), "meta": recorder.meta}
+        with self._lock:
+            self.undo_stack.append(summary)
+            dropped, self.redo_stack = self.redo_stack, []
+            for old in dropped:
+                self._remove_entry(old["id"])
+            self._prune(collect=bool(dropped))
+            self._save_index()
+        return entry_id
+
+    def _read_entry(self, entry_id):
+        with open(self._entry_path(entry_id), 'r') as f:
+            return json.load(f)
+
+    def _load_entry(self, entry_id):
+        return self._changes(self._read_entry(entry_id))
+
+    @staticmethod
+    def _changes(entry):
+        root, digests = entry["root"], entry["blobs"]
+        return [
+            (os.path.join(root, relative), digests[before] if before >= 0 else None,
+             digests[after] if after >= 0 else None)
+            for relative, before, after in entry["changes"]
+        ]
+
+    def _remove_entry(self, entry_id):
+        try:
+            os.remove(self._entry_path(entry_id))
+        except FileNotFoundError:
+            pass
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def _replay(self, changes, forward, workers, progress, notifier=None, icons=None, copies=None):
+        """Restore every folder of an entry; returns (failed, conflicts)
+
+        Restored folders are added to notifier (a NotifyScheduler) so the
+        caller's flush() refreshes them in Explorer. With icons (an
+        IconStore) each restored folder releases the icon of the state it
+        leaves and adopts the one its restored desktop.ini names. copies
+        maps "before"/"after" to {change index: digest} of portable icon
+        copies; digests learned while leaving a state are added to it.
+        """
+        blob_cache = {}
+        resource_cache = {}
+
+        def blob(digest):
+            if digest is None:
+                return None
+            if digest not in blob_cache:
+                blob_cache[digest] = self.blobs.get_bytes(digest)
+            return blob_cache[digest]
+
+        def resource(digest):
+            if digest is None:
+                return None
+            if digest not in resource_cache:
+                resource_cache[digest] = DesktopIni.parse(blob(digest)).get(SHELL_CLASS_INFO, "IconResource")
+            return resource_cache[digest]
+
+        leaving, arriving = ("before", "after") if forward else ("after", "before")
+
+        def move_icon(index, folder, expected, target):
+            old, new = resource(expected), resource(target)
+            copied = copies[arriving].get(str(index))
+            # A copy this entry never saw cannot be rebuilt; the current one is kept instead
+            keep = _is_copy(old) and _is_copy(new) and copied is None
+            released = icons.release(folder, keep_copy=keep)
+            if released and _is_copy(old):
+                copies[leaving][str(index)] = released
+            icons.adopt(folder, new, released if keep else copied)
+
+        # Warm the (few) distinct blobs once instead of once per folder
+        for _, before, after in changes:
+            blob(after if forward else before)
+
+        failed, conflicts = [], []
+
+        def run(chunk):
+            for index, (folder, before, after) in chunk:
+                expected, target = (before, after) if forward else (after, before)
+                try:
+                    if not _restore(folder, expected, blob(target)):
+                        conflicts.append(folder)
+                        continue
+                    if icons is not None:
+                        move_icon(index, folder, expected, target)
+                    if notifier is not None:
+                        notifier.add(folder)
+                except OSError as e:
+                    failed.append((folder, str(e)))
+
+        indexed = list(enumerate(changes))
+        chunks = [indexed[i:i + 64] for i in range(0, len(indexed), 64)]
+        done = 0
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            for index, _ in enumerate(pool.map(run, chunks)):
+                done += len(chunks[index])
+                if progress:
+                    progress(done, len(changes))
+        return failed, conflicts
+
+    def _step(self, source, target, forward, workers, progress, notifier, icons):
+        with self._lock:
+            if not source:
+                return None
+            # Only leave the stack once loaded, so a read error does not lose the entry
+            entry_id = source[-1]["id"]
+            entry = self._read_entry(entry_id)
+            summary = source.pop()
+        copies = entry.setdefault("copies", {"before": {}, "after": {}})
+        failed, conflicts = self._replay(self._changes(entry), forward, workers, progress, notifier, icons, copies)
+        if icons is not None:
+            # Keep the portable copy digests learned on the way, for the opposite step
+            write_atomic(self._entry_path(entry_id), json.dumps(entry, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            target.append(summary)
+            self._save_index()
+        return summary, failed, conflicts
+
+    def undo(self, workers=8, progress=None, notifier=None, icons=None):
+        """Revert the newest entry; returns (summary, failed, conflicts) or None
+
+        Pass the IconStore as icons to move icon references and portable
+        copies along with the desktop.ini files.
+        """
+        return self._step(self.undo_stack, self.redo_stack, False, workers, progress, notifier, icons)
+
+    def redo(self, workers=8, progress=None, notifier=None, icons=None):
+        """Re-apply the most recently undone entry; returns (summary, failed, conflicts) or None"""
+        return self._step(self.redo_stack, self.undo_stack, True, workers, progress, notifier, icons)
+
+    def _live_blobs(self):
+        live = set()
+        for summary in self.undo_stack + self.redo_stack:
+            try:
+                with open(self._entry_path(summary["id"]), 'r') as f:
+                    live.update(json.load(f)["blobs"])
+            except (OSError, ValueError):
+                continue
+        return live
+
+    def disk_usage(self):
+        """Bytes used by entries and blobs"""
+        total = 0
+        for base, _, files in os.walk(self.directory):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(base, name))
+                except OSError:
+                    pass
+        return total
+
+    def _collect_blobs(self):
+        """Delete blobs no remaining entry refers to"""
+        live = self._live_blobs()
+        for _, _, files in os.walk(self.blobs.directory):
+            for name in files:
+                digest = name[:-len(self.blobs.suffix)] if name.endswith(self.blobs.suffix) else None
+                if digest and digest not in live:
+                    self.blobs.remove(digest)
+
+    def _prune(self, collect=False):
+        """Drop the oldest entries beyond max_entries or max_bytes, and their blobs"""
+        while len(self.undo_stack) > self.max_entries:
+            self._remove_entry(self.undo_stack.pop(0)["id"])
+            collect = True
+        if collect:
+            self._collect_blobs()
+        while len(self.undo_stack) > 1 and self.disk_usage() > self.max_bytes:
+            self._remove_entry(self.undo_stack.pop(0)["id"])
+            self._collect_blobs()
+
+    def copied_icons(self):
+        """Digests of portable icon copies an undo or redo could recreate"""
+        digests = set()
+        for summary in self.undo_stack + self.redo_stack:
+            try:
+                copies = self._read_entry(summary["id"]).get("copies", {})
+            except (OSError, ValueError):
+                continue
+            for side in copies.values():
+                digests.update(side.values())
+        return digests
+
+    def icon_resources(self):
+        """(folder, IconResource) pairs kept alive by history, so icon GC can spare them"""
+        parsed = {}
+        pairs = set()
+        for summary in self.undo_stack + self.redo_stack:
+            try:
+                changes = self._load_entry(summary["id"])
+            except (OSError, ValueError):
+                continue
+            for folder, before, after in changes:
+                for digest in (before, after):
+                    if digest is None:
+                        continue
+                    if digest not in parsed:
+                        try:
+                            document = DesktopIni.parse(self.blobs.get_bytes(digest))
+                            parsed[digest] = document.get(SHELL_CLASS_INFO, "IconResource")
+                        except OSError:
+                            parsed[digest] = None
+                    if parsed[digest]:
+                        pairs.add((folder, parsed[digest]))
+        return pairs
@@ -0,0 +1,106 @@
+"""
+Icon helpers - image to .ico conversion and rendered folder icons
+"""
+
+import os
+import tempfile
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from fusion.colors import hex_to_rgb, shade
+from fusion.instrument import metrics
+
+ICON_SIZES = [(16, 16), (24, 24), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
+
+
+def square_image(image, size=256):
+    """Return an RGBA copy of image centered on a transparent square canvas"""
+    image = image.convert("RGBA")
+    image.thumbnail((size, size), Image.LANCZOS)
+    canvas = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    canvas.paste(image, ((size - image.width) // 2, (size - image.height) // 2))
+    return canvas
+
+
+def convert_to_ico(source, destination, sizes=ICON_SIZES):
+    """Convert an image file (or PIL image) into a multi-size .ico file"""
+    largest = max(width for width, _ in sizes)
+    with metrics.span("icon_convert"):
+        if isinstance(source, Image.Image):
+            square_image(source, largest).save(destination, format="ICO", sizes=sizes)
+        else:
+            # Closed right away, so Windows does not keep the source file locked
+            with Image.open(source) as image:
+                square_image(image, largest).save(destination, format="ICO", sizes=sizes)
+    return destination
+
+
+def render_folder_icon(color, size=256, effect="none"):
+    """Draw a folder glyph in the given hex color, matching the canvas preview"""
+    scale = 4  # draw large and downsample for smooth edges
+    full = size * scale
+    image = Image.new("RGBA", (full, full), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+
+    body = hex_to_rgb(color)
+    tab = hex_to_rgb(shade(color, -0.08))
+    left, right = full * 0.06, full * 0.94
+    top, bottom = full * 0.22, full * 0.86
+
+    # Folder tab
+    draw.rounded_rectangle(
+        (left, top - full * 0.08, left + full * 0.42, top + full * 0.1),
+        radius=full * 0.04,
+        fill=tab
+    )
+    # Folder body
+    draw.rounded_rectangle((left, top, right, bottom), radius=full * 0.05, fill=body)
+    draw.rectangle((left, top + full * 0.06, right, top + full * 0.09), fill=tab)
+
+    if effect == "shadow" or effect == "3d_effect":
+        shadow = Image.new("RGBA", image.size, (0, 0, 0, 0))
+        shadow.putalpha(image.getchannel("A").point(lambda a: a * 0.45))
+        shadow = shadow.filter(ImageFilter.GaussianBlur(full * 0.02))
+        base = Image.new("RGBA", image.size, (0, 0, 0, 0))
+        base.alpha_composite(shadow, (int(full * 0.02), int(full * 0.03)))
+        base.alpha_composite(image)
+        image = base
+    elif effect == "glow":
+        glow = Image.new("RGBA", image.size, hex_to_rgb(shade(color, 0.2)) + (0,))
+        glow.putalpha(image.getchannel("A").filter(ImageFilter.GaussianBlur(full * 0.03)))
+        glow.alpha_composite(image)
+        image = glow
+    elif effect == "gradient":
+        gradient = Image.linear_gradient("L").resize(image.size).point(lambda v: v * 0.35)
+        dark = Image.new("RGBA", image.size, (0, 0, 0, 255))
+        dark.putalpha(Image.composite(gradient, Image.new("L", image.size, 0), image.getchannel("A")))
+        image.alpha_composite(dark)
+
+    return image.resize((size, size), Image.LANCZOS)
+
+
+def icons_directory(base):
+    """Return (and create) the folder holding converted custom icons"""
+    path = os.path.join(base, "icons")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def color_icon_path(color, directory, effect="none"):
+    """Return a cached .ico of the folder glyph in color, rendering it once"""
+    name = f"folder_{color.lstrip('#').lower()}_{effect}.ico"
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        # A unique temporary name: concurrent applies may render the same color at once
+        fd, temporary = tempfile.mkstemp(prefix=".icon-", suffix=".tmp", dir=directory)
+        os.close(fd)
+        try:
+            convert_to_ico(render_folder_icon(color, 256, effect), temporary)
+            os.replace(temporary, path)
+        except BaseException:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            raise
+    return path
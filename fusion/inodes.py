@@ -0,0 +1,97 @@
+"""
+Seen-inode set - compact (st_dev, st_ino) membership for hardlink de-duplication
+
+Each pair is packed into one 64-bit key (a small device number in the top
+16 bits, the inode below). New keys go to a small hash set; when it fills
+it is sorted into a run of unsigned 64-bit integers, and runs of similar
+size are merged like a binary counter. Lookups check the set and then
+binary-search each run, so memory stays at about 8 bytes per remembered
+inode even on trees with millions of hardlinks.
+"""
+
+import sys
+from array import array
+from bisect import bisect_left
+
+_INODE_BITS = 48
+_INODE_MASK = (1 << _INODE_BITS) - 1
+_MAX_DEVICES = 1 << (64 - _INODE_BITS)
+
+
+def _merge_runs(first, second):
+    """Merge two sorted array('Q') runs into one"""
+    try:
+        import numpy as np
+    except ImportError:
+        return array('Q', sorted(first + second))
+    merged = np.concatenate([np.frombuffer(first, dtype=np.uint64), np.frombuffer(second, dtype=np.uint64)])
+    merged.sort(kind="stable")
+    return array('Q', merged.tobytes())
+
+
+class InodeSet:
+    """Set of (st_dev, st_ino) pairs; add() reports whether a pair is new"""
+
+    def __init__(self, buffer_size=65536):
+        self.buffer_size = buffer_size
+        self._devices = {}
+        self._pending = set()
+        self._runs = []       # sorted array('Q') runs, largest first
+        self._overflow = set()  # pairs that do not fit a 64-bit key (rare)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _pack(self, device, inode):
+        index = self._devices.get(device)
+        if index is None:
+            if len(self._devices) >= _MAX_DEVICES:
+                return None
+            index = self._devices[device] = len(self._devices)
+        if inode > _INODE_MASK:
+            return None
+        return (index << _INODE_BITS) | inode
+
+    def _seen(self, key):
+        if key in self._pending:
+            return True
+        for run in self._runs:
+            i = bisect_left(run, key)
+            if i < len(run) and run[i] == key:
+                return True
+        return False
+
+    def __contains__(self, pair):
+        key = self._pack(*pair) if pair[0] in self._devices else None
+        if key is None:
+            return pair in self._overflow
+        return self._seen(key)
+
+    def add(self, device, inode):
+        """Remember a pair; returns True if it was not seen before"""
+        key = self._pack(device, inode)
+        if key is None:
+            if (device, inode) in self._overflow:
+                return False
+            self._overflow.add((device, inode))
+        else:
+            if self._seen(key):
+                return False
+            self._pending.add(key)
+            if len(self._pending) >= self.buffer_size:
+                self._flush()
+        self._count += 1
+        return True
+
+    def _flush(self):
+        run = array('Q', sorted(self._pending))
+        self._pending = set()
+        # Merge while the newest run is at least as big as the one before it
+        while self._runs and len(self._runs[-1]) <= len(run):
+            run = _merge_runs(self._runs.pop(), run)
+        self._runs.append(run)
+
+    def memory_bytes(self):
+        """Approximate bytes held by the runs and the pending set"""
+        return sum(len(run) * run.itemsize for run in self._runs) + sys.getsizeof(self._pending)
@@ -0,0 +1,264 @@
+"""
+Single instance - one running window, later launches hand their folders to it
+
+The first process listens on a per-user local endpoint (a Unix socket in
+the config directory, or a named pipe on Windows). A later launch, such as
+one context-menu invocation per selected folder, connects, sends its
+folders and exits without building any UI. The running instance collects
+what arrives and, once launches stop coming for a moment, hands the
+folders over as one batch. Connections are authenticated with a random
+per-user key stored next to the socket.
+"""
+
+import errno
+import hashlib
+import os
+import sys
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+AUTHKEY_FILE = "instance.key"
+SOCKET_FILE = "instance.sock"
+LOCK_FILE = "instance.lock"
+
+CUSTOMIZE = "customize"
+ACTIVATE = "activate"
+PLAN = "plan"
+PING = "ping"
+
+
+def endpoint(directory):
+    """Return (address, family) of the per-user endpoint"""
+    if sys.platform == "win32":
+        user = hashlib.sha256(os.path.abspath(directory).lower().encode("utf-8")).hexdigest()[:16]
+        return rf"\\.\pipe\FileFusionPro-{user}", "AF_PIPE"
+    return os.path.join(directory, SOCKET_FILE), "AF_UNIX"
+
+
+def load_authkey(directory):
+    """Read the per-user key, creating it (owner-only) on first use
+
+    Instances started together race to create the key: the file is created
+    with O_EXCL, so exactly one of them writes it and the others read that
+    key (waiting briefly while it is still empty).
+    """
+    path = os.path.join(directory, AUTHKEY_FILE)
+    os.makedirs(directory, exist_ok=True)
+    flags = os.O_WRONLY | getattr(os, "O_BINARY", 0)
+    for _ in range(50):
+        try:
+            with open(path, 'rb') as f:
+                key = f.read()
+        except FileNotFoundError:
+            try:
+                descriptor = os.open(path, flags | os.O_CREAT | os.O_EXCL, 0o600)
+            except FileExistsError:
+                continue   # another instance just created it
+            key = os.urandom(32)
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(key)
+            return key
+        if len(key) >= 16:
+            return key
+        time.sleep(0.01)   # created by another instance, not written yet
+    # Still short: a key file left truncated by a crash, replaced with a fresh key
+    key = os.urandom(32)
+    descriptor = os.open(path, flags | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, 'wb') as f:
+        f.write(key)
+    return key
+
+
+def send(directory, message, timeout=2.0):
+    """Deliver message to the running instance; returns False if there is none
+
+    Client() has no timeout of its own and would wait forever for the
+    handshake of an instance that stopped accepting, so the whole exchange
+    runs on a helper thread that is given up on after timeout seconds.
+    """
+    address, family = endpoint(directory)
+    authkey = load_authkey(directory)
+    result = []
+
+    def deliver():
+        try:
+            with Client(address, family, authkey=authkey) as conn:
+                conn.send(message)
+                # Wait for the acknowledgement so the launcher only exits once queued
+                result.append(conn.poll(timeout) and conn.recv() == "ok")
+        except (OSError, EOFError, AuthenticationError):
+            result.append(False)
+
+    thread = threading.Thread(target=deliver, name="instance-send", daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return bool(result and result[0])
+
+
+class InstanceServer:
+    """Owns the endpoint and merges incoming folders into debounced batches
+
+    Folders are delivered to handler(folders) on a background thread once
+    no new launch has arrived for `debounce` seconds, or `max_delay`
+    seconds after the first one, whichever comes first. Anything received
+    before a handler is set is kept until then.
+    """
+
+    def __init__(self, directory, debounce=0.3, max_delay=2.0):
+        self.directory = directory
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.listening = False
+        self.received = 0
+        self._listener = None
+        self._handler = None
+        self._on_activate = None
+        self._on_plan = None
+        self._pending = {}   # insertion-ordered set of folders
+        self._first = self._last = None
+        self._closed = False
+        self._dispatching = False
+        self._cond = threading.Condition()
+
+    def start(self):
+        """Start listening; returns False if another instance owns the endpoint"""
+        address, family = endpoint(self.directory)
+        authkey = load_authkey(self.directory)
+        if family == "AF_PIPE":
+            # The first pipe instance is exclusive, so a second server simply fails
+            try:
+                self._listener = Listener(address, family, backlog=64, authkey=authkey)
+            except OSError:
+                return False
+        else:
+            import fcntl
+
+            # Serialize starters so two of them cannot both clear a stale socket
+            with open(os.path.join(self.directory, LOCK_FILE), 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    self._listener = Listener(address, family, backlog=64, authkey=authkey)
+                except OSError as e:
+                    if e.errno != errno.EADDRINUSE or send(self.directory, (PING, None), timeout=0.5):
+                        return False
+                    # Nobody answers on the socket file: it is left over from a crash
+                    try:
+                        os.remove(address)
+                        self._listener = Listener(address, family, backlog=64, authkey=authkey)
+                    except OSError:
+                        return False
+        self.listening = True
+        threading.Thread(target=self._accept_loop, name="instance-accept", daemon=True).start()
+        self.start_dispatch()
+        return True
+
+    def start_dispatch(self):
+        """Deliver submitted folders to the handler (start() does this too; standalone servers need it alone)"""
+        with self._cond:
+            if self._dispatching:
+                return
+            self._dispatching = True
+        threading.Thread(target=self._dispatch_loop, name="instance-dispatch", daemon=True).start()
+
+    def set_handler(self, handler, on_activate=None, on_plan=None):
+        """Set the batch callback (and optional 'bring window forward' and 'open plan file' callbacks)"""
+        with self._cond:
+            self._handler = handler
+            self._on_activate = on_activate
+            self._on_plan = on_plan
+            self._cond.notify_all()
+
+    def submit(self, folders):
+        """Queue folders as if another launch had sent them"""
+        with self._cond:
+            now = time.monotonic()
+            for folder in folders:
+                self._pending[os.path.abspath(folder)] = None
+            if self._first is None:
+                self._first = now
+            self._last = now
+            self.received += 1
+            self._cond.notify_all()
+
+    def _accept_loop(self):
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                # Failed handshakes (wrong key, client gone) only drop that client
+                if self._closed:
+                    return
+                continue
+            with conn:
+                try:
+                    if not conn.poll(2.0):
+                        continue
+                    kind, payload = conn.recv()
+                    if kind == CUSTOMIZE:
+                        self.submit(payload)
+                    elif kind == ACTIVATE and self._on_activate:
+                        self._on_activate()
+                    elif kind == PLAN and self._on_plan:
+                        self._on_plan(payload)
+                    conn.send("ok")
+                except (OSError, EOFError, AuthenticationError, ValueError, TypeError):
+                    continue
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while not self._closed:
+                if not self._pending or self._handler is None:
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                due = min(self._last + self.debounce, self._first + self.max_delay)
+                if now < due:
+                    self._cond.wait(due - now)
+                    continue
+                folders, self._pending = list(self._pending), {}
+                self._first = self._last = None
+                handler = self._handler
+                self._cond.release()
+                try:
+                    handler(folders)
+                finally:
+                    self._cond.acquire()
+
+    def close(self):
+        """Stop listening and release the endpoint"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._listener is not None:
+            # Also unlinks the Unix socket file
+            self._listener.close()
+        self.listening = False
+
+
+def claim(directory, folders=(), attempts=3, plan=None):
+    """Become the single instance or hand folders (or a plan file) to the running one
+
+    Returns a started InstanceServer, or None if the running instance took
+    the job. If neither works (e.g. the endpoint is unusable) a server that
+    is not listening is returned so the caller can run standalone.
+    """
+    if plan:
+        message = (PLAN, os.path.abspath(plan))
+    else:
+        message = (CUSTOMIZE, list(folders)) if folders else (ACTIVATE, None)
+    for _ in range(attempts):
+        if send(directory, message):
+            return None
+        server = InstanceServer(directory)
+        if server.start():
+            return server
+        # Lost a start-up race; the winner should be listening shortly
+        time.sleep(0.05)
+    server = InstanceServer(directory)
+    # Not listening, but the folders main() submits must still reach the handler
+    server.start_dispatch()
+    return server
@@ -0,0 +1,300 @@
+"""
+Instrumentation - named timing spans, counters and latency histograms
+"""
+
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+from datetime import datetime
+
+# Span names used across the application
+SPANS = ("scan", "hash", "icon_convert", "desktop_ini_write", "attribute_set", "config_save", "apply")
+
+
+class _NullSpan:
+    """Shared no-op span returned while instrumentation is disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Histogram:
+    """Latency histogram with power-of-two microsecond buckets"""
+
+    __slots__ = ("count", "errors", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.buckets = [0] * 48
+
+    def add(self, seconds, error=False):
+        """Record one observation"""
+        self.count += 1
+        self.errors += error
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        bucket = min(int(seconds * 1e6).bit_length(), len(self.buckets) - 1)
+        self.buckets[bucket] += 1
+
+    def percentile(self, fraction):
+        """Approximate percentile (upper bound of the matching bucket) in seconds"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for bucket, hits in enumerate(self.buckets):
+            seen += hits
+            if seen >= target:
+                return min((1 << bucket) / 1e6, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_s": self.total,
+            "mean_s": self.total / self.count if self.count else 0.0,
+            "min_s": self.min or 0.0,
+            "max_s": self.max,
+            "p50_s": self.percentile(0.5),
+            "p95_s": self.percentile(0.95),
+            "p99_s": self.percentile(0.99),
+            "buckets_us": {str(1 << i): hits for i, hits in enumerate(self.buckets) if hits},
+        }
+
+
+class _Span:
+    """Times one operation and records it on exit"""
+
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.record(self.name, time.perf_counter() - self.start, exc_type is not None)
+        return False
+
+
+class _ProfiledSpan(_Span):
+    """Span that also captures a cProfile run of the operation
+
+    cProfile only sees the thread that enabled it, so functions marked with
+    Metrics.task get a profiler per worker thread while the span is open;
+    their stats are merged into the capture.
+    """
+
+    __slots__ = ("profiler", "thread", "workers")
+
+    def __enter__(self):
+        self.thread = threading.get_ident()
+        self.workers = {}   # worker thread id -> cProfile.Profile
+        self.profiler = cProfile.Profile()
+        self.metrics._profiling = self
+        self.profiler.enable()
+        return super().__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        result = super().__exit__(exc_type, exc, tb)
+        self.profiler.disable()
+        self.metrics._profiling = None
+        self.metrics._store_profile(self.name, self.profiler, list(self.workers.values()))
+        return result
+
+
+class Metrics:
+    """Collects span timings and counters; near-free while disabled"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.counters = {}
+        self.profiles = {}
+        self.started = datetime.now()
+        self._profile_target = None
+        self._profiling = None   # the open _ProfiledSpan, if any
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        """Return a context manager timing the named operation"""
+        if self._profile_target == name:
+            with self._lock:
+                if self._profile_target == name:
+                    self._profile_target = None
+                    return _ProfiledSpan(self, name)
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def timed(self, name):
+        """Decorator form of span()"""
+        def decorator(func):
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            wrapper.__name__ = func.__name__
+            wrapper.__doc__ = func.__doc__
+            return wrapper
+        return decorator
+
+    def task(self, func):
+        """Decorator for work that runs on pool threads (listings, apply batches)
+
+        While a profiled span is open, calls on other threads are profiled
+        as well and merged into its capture. Otherwise the only cost is one
+        attribute check per call.
+        """
+        def wrapper(*args, **kwargs):
+            span = self._profiling
+            thread = threading.get_ident()
+            if span is None or thread == span.thread:
+                return func(*args, **kwargs)
+            with self._lock:
+                profiler = span.workers.get(thread)
+                if profiler is None:
+                    profiler = span.workers[thread] = cProfile.Profile()
+            profiler.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.disable()
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+
+    def count(self, name, amount=1):
+        """Increment a named counter"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record(self, name, seconds, error=False):
+        """Add a timing observation for a span"""
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds, error)
+
+    def profile_next(self, name):
+        """Capture a cProfile of the next span with this name (even if disabled)
+
+        Work the span hands to pool threads is only included for functions
+        wrapped with task(); other threads are not seen by cProfile.
+        """
+        with self._lock:
+            self._profile_target = name
+
+    @property
+    def profile_pending(self):
+        return self._profile_target
+
+    def _store_profile(self, name, profiler, workers=(), limit=40):
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        for worker in workers:
+            stats.add(worker)
+        stats.sort_stats("cumulative").print_stats(limit)
+        with self._lock:
+            self.profiles[name] = {
+                "captured": datetime.now().isoformat(timespec="seconds"),
+                "threads": 1 + len(workers),
+                "total_calls": stats.total_calls,
+                "total_s": stats.total_tt,
+                "report": stream.getvalue(),
+            }
+
+    def reset(self):
+        """Drop all collected data"""
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+            self.profiles = {}
+            self.started = datetime.now()
+
+    def snapshot(self):
+        """Return all metrics as a JSON-serializable dict"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "started": self.started.isoformat(timespec="seconds"),
+                "captured": datetime.now().isoformat(timespec="seconds"),
+                "spans": {name: h.to_dict() for name, h in sorted(self.histograms.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "profiles": dict(self.profiles),
+            }
+
+    def export_json(self, path):
+        """Write a snapshot to path"""
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=4)
+
+    def report(self):
+        """Format a short text summary of all spans and counters"""
+        lines = [f"Instrumentation: {'enabled' if self.enabled else 'disabled'}", ""]
+        snapshot = self.snapshot()
+        if snapshot["spans"]:
+            lines.append(f"{'Span':<20}{'Count':>8}{'Mean':>12}{'p95':>12}{'Max':>12}{'Errors':>8}")
+            for name, data in snapshot["spans"].items():
+                lines.append(
+                    f"{name:<20}{data['count']:>8}{data['mean_s'] * 1000:>10.2f}ms"
+                    f"{data['p95_s'] * 1000:>10.2f}ms{data['max_s'] * 1000:>10.2f}ms{data['errors']:>8}"
+                )
+        else:
+            lines.append("No spans recorded yet.")
+        if snapshot["counters"]:
+            lines.append("")
+            for name, value in snapshot["counters"].items():
+                lines.append(f"{name:<28}{value:>12}")
+        for name, profile in snapshot["profiles"].items():
+            lines.append("")
+            lines.append(f"Profile of '{name}' ({profile['captured']}, {profile.get('threads', 1)} threads):")
+            lines.append(profile["report"])
+        return "\n".join(lines)
+
+    @staticmethod
+    def measure_overhead(iterations=100000):
+        """Measure the per-span cost in nanoseconds, enabled and disabled"""
+        results = {}
+        for enabled in (False, True):
+            probe = Metrics(enabled=enabled)
+            start = time.perf_counter()
+            for _ in range(iterations):
+                with probe.span("probe"):
+                    pass
+            elapsed = time.perf_counter() - start
+            results["enabled_ns" if enabled else "disabled_ns"] = elapsed / iterations * 1e9
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            pass
+        results["baseline_ns"] = (time.perf_counter() - start) / iterations * 1e9
+        return results
+
+
+# Process-wide instance shared by the UI and the engine modules
+metrics = Metrics()
@@ -0,0 +1,294 @@
+"""
+Write-ahead journal - crash-safe, resumable batch customization
+
+Every folder of a journaled batch moves through the states
+
+    planned -> before -> written -> attrs -> done
+
+(or ends as "skipped" when it changed since planning). Records are JSON
+lines appended to one file per batch. A batch whose folders are known up
+front journals all of them with plan() before the first write, so a
+resume can finish folders that were never dispatched; a streamed batch
+records its source in the header instead. Records are committed in
+groups: the before-images of a whole apply batch are made durable with
+a single fsync before any of its desktop.ini files is touched, and the
+progress records that follow are written without waiting for the disk
+(losing them only means a resume re-applies a few folders, which is a
+no-op). A journal left behind by a crash is picked up by Recovery, which
+can finish the batch (resume) or restore every touched folder (rollback).
+"""
+
+import base64
+import itertools
+import json
+import os
+import threading
+import time
+
+from fusion.customize import (
+    DESKTOP_INI, FILE_ATTRIBUTE_HIDDEN, FILE_ATTRIBUTE_READONLY, FILE_ATTRIBUTE_SYSTEM,
+    apply_stream, get_attributes, mark_customized, set_attributes, write_desktop_ini
+)
+from fusion.desktopini import write_atomic
+
+STATES = ("planned", "before", "written", "attrs", "done", "skipped")
+JOURNAL_SUFFIX = ".journal"
+
+_INI_BITS = FILE_ATTRIBUTE_HIDDEN | FILE_ATTRIBUTE_SYSTEM | FILE_ATTRIBUTE_READONLY
+
+
+def capture_before(folder):
+    """Return the before-image of a folder: desktop.ini bytes and attributes"""
+    desktop_ini = os.path.join(folder, DESKTOP_INI)
+    try:
+        with open(desktop_ini, 'rb') as f:
+            data = base64.b64encode(f.read()).decode("ascii")
+    except FileNotFoundError:
+        data = None
+    return {
+        "existed": data is not None,
+        "data": data,
+        "ini_attributes": get_attributes(desktop_ini) if data is not None else None,
+        "folder_attributes": get_attributes(folder),
+    }
+
+
+def restore_before(folder, image):
+    """Put a folder's desktop.ini and attributes back as captured"""
+    desktop_ini = os.path.join(folder, DESKTOP_INI)
+    set_attributes(desktop_ini, remove=_INI_BITS)
+    if image["existed"]:
+        write_atomic(desktop_ini, base64.b64decode(image["data"]))
+        if image["ini_attributes"] is not None:
+            set_attributes(desktop_ini, add=image["ini_attributes"] & _INI_BITS)
+    else:
+        try:
+            os.remove(desktop_ini)
+        except FileNotFoundError:
+            pass
+    attributes = image["folder_attributes"]
+    if attributes is not None:
+        set_attributes(folder, add=attributes & FILE_ATTRIBUTE_READONLY,
+                       remove=FILE_ATTRIBUTE_READONLY & ~attributes)
+
+
+class Journal:
+    """Append-only record of one batch; use as a context manager
+
+    The file is deleted when the batch finishes normally and kept when it
+    is interrupted, so its presence alone means "needs recovery".
+    """
+
+    def __init__(self, path, label="", recorder=None, source=None):
+        self.path = path
+        # Optional history Recorder that receives before/after desktop.ini bytes
+        self.recorder = recorder
+        self._file = open(path, 'ab')
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._planned = {}   # folder -> entries journaled by plan() and not dispatched yet
+        if self._file.tell() == 0:
+            begin = {"s": "begin", "label": label, "time": time.time()}
+            if source is not None:
+                # What a streamed batch was generated from, so a resume can regenerate the rest
+                begin["source"] = source
+            self._append(self._encode(begin))
+            self.commit()
+
+    @classmethod
+    def create(cls, directory, label="", recorder=None, source=None):
+        """Start a new journal file in directory"""
+        os.makedirs(directory, exist_ok=True)
+        return cls(os.path.join(directory, f"{time.time_ns()}-{os.getpid()}{JOURNAL_SUFFIX}"), label, recorder, source)
+
+    @staticmethod
+    def _encode(record):
+        return json.dumps(record, separators=(",", ":"), ensure_ascii=False)
+
+    def _append(self, *lines):
+        data = "".join(line + "\n" for line in lines).encode("utf-8")
+        with self._lock:
+            self._buffer.append(data)
+
+    def commit(self, sync=True):
+        """Write buffered records; with sync, wait until they are on disk"""
+        with self._lock:
+            if self._buffer:
+                self._file.write(b"".join(self._buffer))
+                self._buffer = []
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+
+    def plan(self, pairs):
+        """Journal every (folder, entries) pair of the batch as planned, with one fsync
+
+        Called before the first write, so folders a crash keeps from ever
+        being dispatched are still pending in the Recovery.
+        """
+        lines = []
+        for folder, entries in pairs:
+            self._planned[folder] = entries
+            lines.append(f'{{"s":"planned","f":{self._encode(folder)},"entries":{self._encode(entries)}}}')
+        self._append(*lines)
+        self.commit()
+
+    def skip(self, folder):
+        """Record that a planned folder is left alone (it changed since planning)"""
+        self._planned.pop(folder, None)
+        self._append(self._encode({"s": "skipped", "f": folder}))
+
+    def apply_pairs(self, pairs, notifier=None):
+        """Journaled counterpart of customize._apply_pairs for one batch; returns (folder, OSError) pairs"""
+        failed = []
+        ready = []
+        lines = []
+        for folder, entries in pairs:
+            # The folder is JSON-encoded once and spliced into every record that follows
+            key = self._encode(folder)
+            if self._planned.pop(folder, None) != entries:
+                # Not planned up front, or prepared into different entries since
+                lines.append(f'{{"s":"planned","f":{key},"entries":{self._encode(entries)}}}')
+            try:
+                image = capture_before(folder)
+            except OSError as e:
+                failed.append((folder, e))
+                continue
+            lines.append(f'{{"s":"before","f":{key},"image":{self._encode(image)}}}')
+            ready.append((folder, key, entries, image))
+
+        # Group commit: one fsync makes every before-image of the batch durable
+        self._append(*lines)
+        self.commit()
+
+        lines = []
+        for folder, key, entries, image in ready:
+            try:
+                changed = write_desktop_ini(folder, entries)
+                lines.append(f'{{"s":"written","f":{key},"changed":{"true" if changed else "false"}}}')
+                mark_customized(folder)
+                lines.append(f'{{"s":"attrs","f":{key}}}')
+            except OSError as e:
+                failed.append((folder, e))
+                continue
+            lines.append(f'{{"s":"done","f":{key}}}')
+            if changed and notifier is not None:
+                notifier.add(folder)
+            if changed and self.recorder is not None:
+                before = base64.b64decode(image["data"]) if image["existed"] else None
+                with open(os.path.join(folder, DESKTOP_INI), 'rb') as f:
+                    self.recorder.record(folder, before, f.read())
+        self._append(*lines)
+        self.commit(sync=False)
+        return failed
+
+    def close(self, completed=True):
+        """Finish the journal; a completed journal is removed"""
+        if self._file.closed:
+            return
+        if completed:
+            self._append(self._encode({"s": "end", "time": time.time()}))
+        self.commit()
+        self._file.close()
+        if completed:
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close(completed=exc_type is None)
+
+
+class Recovery:
+    """What an interrupted journal says about its batch"""
+
+    def __init__(self, path):
+        self.path = path
+        self.label = ""
+        self.started = None
+        self.source = None
+        self.completed = False
+        self.folders = {}   # folder -> {"state", "entries", "before"}, in journal order
+
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break   # torn write at the end of the file
+                state = record["s"]
+                if state == "begin":
+                    self.label = record.get("label", "")
+                    self.started = record.get("time")
+                    self.source = record.get("source")
+                elif state == "end":
+                    self.completed = True
+                else:
+                    folder = self.folders.setdefault(record["f"], {"state": None, "entries": None, "before": None})
+                    folder["state"] = state
+                    if state == "planned":
+                        folder["entries"] = record["entries"]
+                    elif state == "before" and folder["before"] is None:
+                        # Keep the first image; a resumed run captures half-applied state
+                        folder["before"] = record["image"]
+
+    @staticmethod
+    def find(directory):
+        """Return a Recovery for every journal left in directory"""
+        try:
+            names = sorted(name for name in os.listdir(directory) if name.endswith(JOURNAL_SUFFIX))
+        except FileNotFoundError:
+            return []
+        return [Recovery(os.path.join(directory, name)) for name in names]
+
+    def pending(self):
+        """(folder, entries) pairs that did not reach "done" (or "skipped")"""
+        return [(folder, info["entries"]) for folder, info in self.folders.items()
+                if info["state"] not in ("done", "skipped") and info["entries"] is not None]
+
+    def counts(self):
+        """Number of folders in each state"""
+        counts = dict.fromkeys(STATES, 0)
+        for info in self.folders.values():
+            counts[info["state"]] += 1
+        return counts
+
+    def resume(self, workers=1, batch_size=64, progress=None, notifier=None, items=None):
+        """Finish the unfinished folders, journaling into the same file
+
+        A streamed batch only journaled the folders it reached; items
+        regenerates the whole batch from its source, and folders this
+        journal already knows about are left to pending().
+        """
+        pending = self.pending()
+        if items is not None:
+            pending = itertools.chain(pending, ((folder, entries) for folder, entries in items
+                                                if folder not in self.folders))
+        journal = Journal(self.path)
+        with journal:
+            failed = apply_stream(pending, workers, batch_size, progress, notifier, journal)
+        return failed
+
+    def rollback(self, notifier=None):
+        """Restore every folder that has a before-image, newest first"""
+        failed = []
+        for folder, info in reversed(list(self.folders.items())):
+            if info["before"] is None:
+                continue
+            try:
+                restore_before(folder, info["before"])
+            except OSError as e:
+                failed.append((folder, str(e)))
+                continue
+            if notifier is not None:
+                notifier.add(folder)
+        self.discard()
+        return failed
+
+    def discard(self):
+        """Forget the journal without touching any folder"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,300 @@
+"""
+Network share I/O - asyncio front end for high-latency SMB/NFS folders
+
+On a share every listing, stat and small write is a network round trip,
+so a sequential walk spends nearly all its time waiting. NetworkIO keeps
+many operations in flight instead: the blocking calls run on a bounded
+thread pool, an asyncio loop schedules them under a global and a
+per-host cap, and each call gets a timeout and retries with exponential
+backoff on transient network errors. The filesystem is pluggable so
+LatencyFS can stand in for a share in tests and benchmarks.
+"""
+
+import asyncio
+import errno
+import itertools
+import os
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from fusion.customize import _apply_pairs
+from fusion.instrument import metrics
+from fusion.sizetree import HARDLINKS_BY_DEFAULT, SizeTree, list_entries
+from fusion.volumes import NETWORK_FILESYSTEMS, _mount_type, volume_root
+
+TRANSIENT_ERRNOS = {
+    errno.EAGAIN, errno.EBUSY, errno.EINTR, errno.ETIMEDOUT, errno.ECONNRESET, errno.ECONNABORTED,
+    errno.EHOSTUNREACH, errno.ENETUNREACH, errno.ENETRESET, errno.ESTALE, errno.EIO,
+}
+# ERROR_BAD_NETPATH, ERROR_UNEXP_NET_ERR, ERROR_NETNAME_DELETED, ERROR_SEM_TIMEOUT,
+# ERROR_NETWORK_UNREACHABLE, ERROR_HOST_UNREACHABLE, ERROR_CONNECTION_ABORTED
+TRANSIENT_WINERRORS = {53, 59, 64, 121, 1231, 1232, 1236}
+
+
+def is_transient(error):
+    """True for errors worth retrying (timeouts, dropped connections, busy servers)"""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    if not isinstance(error, OSError):
+        return False
+    return error.errno in TRANSIENT_ERRNOS or getattr(error, "winerror", None) in TRANSIENT_WINERRORS
+
+
+def host_of(path):
+    """Server a path lives on ('local' for local disks)"""
+    path = os.path.abspath(path)
+    if path.startswith("\\\\"):
+        return path[2:].split("\\", 1)[0].lower()
+    root = volume_root(path)
+    fstype = _mount_type(root) if os.path.exists("/proc/mounts") else None
+    if fstype in NETWORK_FILESYSTEMS or (fstype or "").startswith("nfs"):
+        source = _mount_source(root)
+        if source:
+            # "server:/export" (NFS) or "//server/share" (CIFS)
+            return source.lstrip("/").split("/", 1)[0].split(":", 1)[0].lower()
+    return "local"
+
+
+def _mount_source(mount_point):
+    found = None
+    try:
+        with open("/proc/mounts", 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) > 1 and fields[1] == mount_point:
+                    found = fields[0]
+    except OSError:
+        pass
+    return found
+
+
+class LocalFS:
+    """The real filesystem, one blocking call per operation"""
+
+    def __init__(self, hardlinks=HARDLINKS_BY_DEFAULT):
+        self.hardlinks = hardlinks
+
+    @metrics.task
+    def list_directory(self, path):
+        """Same result as the local scanner's listing; raises if the directory cannot be read
+
+        Unlike the local scanner, transient errors propagate so the caller
+        can retry the directory.
+        """
+        errors = []
+
+        def on_error(error):
+            if is_transient(error):
+                raise error
+            errors.append(error)
+
+        with os.scandir(path) as entries:
+            subdirs, own_size, own_alloc, own_files, links, extensions = \
+                list_entries(entries, path, self.hardlinks, on_error)
+        return subdirs, own_size, own_alloc, own_files, len(errors), links, extensions
+
+    def apply_pairs(self, pairs, notifier=None, journal=None):
+        return _apply_pairs(pairs, notifier, journal)
+
+
+class LatencyFS:
+    """Wraps a filesystem, adding a delay per round trip and optional transient failures
+
+    A listing costs one round trip plus one per file (stat), an applied
+    folder about three (read, write, attributes).
+    """
+
+    def __init__(self, base=None, latency=0.02, jitter=0.0, failure_rate=0.0, seed=0):
+        self.base = base or LocalFS()
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.round_trips = 0
+
+    def _round_trips(self, count):
+        with self._lock:
+            self.round_trips += count
+            delay = count * (self.latency + self._random.uniform(0, self.jitter))
+            fail = self.failure_rate and self._random.random() < self.failure_rate
+        if fail:
+            time.sleep(delay / 2)
+            raise OSError(errno.ETIMEDOUT, "Injected network timeout")
+        time.sleep(delay)
+
+    def list_directory(self, path):
+        result = self.base.list_directory(path)
+        self._round_trips(1 + result[3] + len(result[5]))
+        return result
+
+    def apply_pairs(self, pairs, notifier=None, journal=None):
+        self._round_trips(3 * len(pairs))
+        return self.base.apply_pairs(pairs, notifier, journal)
+
+
+class NetworkIO:
+    """Latency-hiding scans and applies for network shares
+
+    max_in_flight bounds the thread pool (and so all concurrent blocking
+    calls); per_host caps the calls to any one server. Each call times out
+    after timeout seconds and is retried up to retries times with
+    exponential backoff when the error is transient. A timed-out call
+    cannot be interrupted and keeps its thread until the OS gives up, which
+    is why the pool is bounded.
+    """
+
+    def __init__(self, fs=None, max_in_flight=256, per_host=64, retries=3, backoff=0.05,
+                 timeout=10.0, batch_size=8):
+        self.fs = fs or LocalFS()
+        self.max_in_flight = max_in_flight
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.retried = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="netio")
+        # Semaphores belong to one event loop; concurrent runs each get their own
+        self._hosts = weakref.WeakKeyDictionary()
+        self._host_names = {}   # parent directory -> host (host_of reads the mount table)
+
+    def _semaphore(self, path):
+        parent = os.path.dirname(os.path.abspath(path))
+        host = self._host_names.get(parent)
+        if host is None:
+            host = self._host_names[parent] = host_of(path)
+        semaphores = self._hosts.setdefault(asyncio.get_running_loop(), {})
+        if host not in semaphores:
+            semaphores[host] = asyncio.Semaphore(self.per_host)
+        return semaphores[host]
+
+    async def call(self, path, fn, *args):
+        """Run fn(*args) on the pool under path's host cap, with timeout and retries
+
+        A call that timed out is still running on its thread, so the retry
+        waits for it again instead of issuing fn a second time; fn is only
+        re-issued after an earlier call failed with a transient error, and
+        the host slot is given back during the backoff before that.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphore(path)
+        future = None
+        for attempt in range(self.retries + 1):
+            failed = future is not None and future.done() and is_transient(future.exception())
+            if future is not None:
+                self.retried += 1
+            if failed:
+                # Full jitter keeps retries of many calls from arriving in lockstep
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+            async with semaphore:
+                if future is None or failed:
+                    future = loop.run_in_executor(self._pool, fn, *args)
+                try:
+                    return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+                except Exception as e:
+                    if attempt == self.retries or not is_transient(e):
+                        # Detach a call that is still running from this loop
+                        future.cancel()
+                        raise
+
+    async def _scan(self, root, progress):
+        tree = SizeTree(root)
+        limit = self.max_in_flight * 2
+        # Every listing is charged to the root's host (nested mounts are rare on shares)
+        pending = {asyncio.ensure_future(self.call(root, self.fs.list_directory, tree.root)): 0}
+        queued = []
+        listed = 0
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = pending.pop(task)
+                listed += 1
+                try:
+                    listing = task.result()
+                except OSError:
+                    tree.errors += 1
+                    continue
+                tree._record(index, listing)
+                for name, path in listing[0]:
+                    queued.append((tree._add_node(index, name), path))
+            # Bounded task count: big trees do not turn into millions of pending tasks
+            while queued and len(pending) < limit:
+                child, path = queued.pop()
+                pending[asyncio.ensure_future(self.call(root, self.fs.list_directory, path))] = child
+            if progress:
+                progress(listed)
+        tree._accumulate()
+        return tree
+
+    def scan(self, root, progress=None):
+        """Build a SizeTree of root with many listings in flight"""
+        return asyncio.run(self._scan(root, progress))
+
+    async def _apply_batch(self, batch, notifier, journal):
+        """Apply one batch, retrying folders with transient errors; returns {folder: error}"""
+        failed = {}
+        for attempt in range(self.retries + 1):
+            try:
+                result = await self.call(batch[0][0], self.fs.apply_pairs, batch, notifier, journal)
+            except Exception as e:
+                # call() already retried the batch (and it may still be running), so it is not issued again
+                failed.update((folder, e) for folder, _ in batch)
+                return failed
+            errors = dict(result)
+            retry = []
+            for folder, entries in batch:
+                error = errors.get(folder)
+                if error is None:
+                    failed.pop(folder, None)
+                    continue
+                failed[folder] = error
+                if is_transient(error):
+                    retry.append((folder, entries))
+            if not retry or attempt == self.retries:
+                break
+            # Writes are idempotent merges, so retrying a folder is harmless
+            self.retried += len(retry)
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+            batch = retry
+        return failed
+
+    async def _apply(self, pairs, notifier, journal, progress):
+        pairs = iter(pairs)
+        limit = self.max_in_flight * 2
+        pending = {}
+        failed = []
+        done = 0
+        exhausted = False
+        while True:
+            # A bounded window of batches: the input is consumed as writes complete, not up front
+            while not exhausted and len(pending) < limit:
+                batch = list(itertools.islice(pairs, self.batch_size))
+                if not batch:
+                    exhausted = True
+                    break
+                pending[asyncio.ensure_future(self._apply_batch(batch, notifier, journal))] = len(batch)
+            if not pending:
+                break
+            finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                errors = task.result()
+                done += pending.pop(task) - len(errors)
+                failed.extend((folder, str(error) or type(error).__name__) for folder, error in errors.items())
+            if progress:
+                progress(done)
+        return failed
+
+    def apply(self, pairs, notifier=None, journal=None, progress=None):
+        """Customize (folder, entries) pairs with many folders in flight; returns failures
+
+        Same contract as apply_stream: progress(done), notifier and journal
+        as there, returns [(folder, error)].
+        """
+        return asyncio.run(self._apply(pairs, notifier, journal, progress))
+
+    def close(self):
+        self._pool.shutdown(wait=False)
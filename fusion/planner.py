@@ -0,0 +1,229 @@
+"""
+Dry-run planner - the full change set of a batch before anything is written
+
+Every target folder is classified as
+
+    create     no desktop.ini yet
+    modify     desktop.ini exists and some of our keys differ
+    unchanged  desktop.ini already has exactly these values
+    conflict   desktop.ini points at an icon we did not write, or cannot be read
+
+Folders are stat'ed first: a missing desktop.ini needs no read, and a file
+whose size and mtime match an earlier plan reuses that plan's verdict.
+Plans are JSON-serializable; executing one later only touches the create
+and modify folders, re-checking (by stat) just those.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fusion.customize import DESKTOP_INI, apply_stream
+from fusion.desktopini import SHELL_CLASS_INFO, DesktopIni, write_atomic
+
+CREATE = "create"
+MODIFY = "modify"
+UNCHANGED = "unchanged"
+CONFLICT = "conflict"
+ACTIONS = (CREATE, MODIFY, UNCHANGED, CONFLICT)
+
+# Keys whose existing value is someone else's work unless owned() says otherwise
+CONFLICT_KEYS = ("IconResource",)
+
+PLAN_VERSION = 1
+
+_MARKS = {CREATE: "+", MODIFY: "~", UNCHANGED: "=", CONFLICT: "!"}
+
+# Item fields (plain lists keep 100k-folder plans small and JSON-friendly)
+FOLDER, ACTION, SIZE, MTIME, BYTES, DETAIL, ENTRIES = range(7)
+
+
+def _stat_key(path):
+    """Return (size, mtime_ns) of path, or (None, None) if it does not exist"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None, None
+    return st.st_size, st.st_mtime_ns
+
+
+_new_sizes = {}
+
+
+def _new_file_bytes(entries):
+    """Size of a fresh desktop.ini for entries (cached per distinct entries)"""
+    key = tuple(sorted((k, str(v)) for k, v in entries.items()))
+    if key not in _new_sizes:
+        document = DesktopIni()
+        document.merge(SHELL_CLASS_INFO, entries)
+        _new_sizes[key] = len(document.serialize())
+    return _new_sizes[key]
+
+
+def plan_folder(folder, entries, owned=None, previous=None):
+    """Classify one folder; returns a plan item
+
+    previous is an earlier item for the same folder and entries; if the
+    desktop.ini stat still matches it, its verdict is reused unread.
+    """
+    desktop_ini = os.path.join(folder, DESKTOP_INI)
+    try:
+        size, mtime = _stat_key(desktop_ini)
+        if size is None:
+            if not os.path.isdir(folder):
+                return [folder, CONFLICT, None, None, 0, "folder is missing", None]
+            return [folder, CREATE, None, None, _new_file_bytes(entries), "", None]
+        if previous is not None and previous[SIZE] == size and previous[MTIME] == mtime:
+            return [folder, previous[ACTION], size, mtime, previous[BYTES], previous[DETAIL], None]
+
+        document = DesktopIni.load(desktop_ini)
+        for key in CONFLICT_KEYS:
+            current = document.get(SHELL_CLASS_INFO, key)
+            if current and key in entries and current != str(entries[key]) and owned is not None \
+                    and not owned(folder, current):
+                return [folder, CONFLICT, size, mtime, 0, f"{key} is {current}", None]
+        changed = [key for key, value in entries.items()
+                   if document.get(SHELL_CLASS_INFO, key) != (None if value is None else str(value))]
+        if document.merge(SHELL_CLASS_INFO, entries):
+            return [folder, MODIFY, size, mtime, len(document.serialize()), ", ".join(changed), None]
+        return [folder, UNCHANGED, size, mtime, 0, "", None]
+    except OSError as e:
+        return [folder, CONFLICT, None, None, 0, str(e), None]
+
+
+class Plan:
+    """The classified change set of one batch"""
+
+    def __init__(self, entries, items=None, meta=None, created=None):
+        self.entries = entries
+        self.items = items if items is not None else []
+        self.meta = meta or {}
+        self.created = created or time.time()
+
+    def entries_for(self, item):
+        return item[ENTRIES] if item[ENTRIES] is not None else self.entries
+
+    def counts(self):
+        """Number of folders per action"""
+        counts = dict.fromkeys(ACTIONS, 0)
+        for item in self.items:
+            counts[item[ACTION]] += 1
+        return counts
+
+    def bytes_written(self):
+        """Estimated desktop.ini bytes written by executing the plan"""
+        return sum(item[BYTES] for item in self.items if item[ACTION] in (CREATE, MODIFY))
+
+    def summary(self):
+        counts = self.counts()
+        return (f"{counts[CREATE]} to create, {counts[MODIFY]} to modify, "
+                f"{counts[UNCHANGED]} unchanged, {counts[CONFLICT]} conflicts; "
+                f"about {self.bytes_written()} bytes to write")
+
+    def diff(self, limit=200, include_unchanged=False):
+        """Diff-style lines: '+ create', '~ modify', '= unchanged', '! conflict'"""
+        shown = [item for item in self.items if include_unchanged or item[ACTION] != UNCHANGED]
+        lines = []
+        for item in shown[:limit]:
+            detail = f"  ({item[DETAIL]})" if item[DETAIL] else ""
+            lines.append(f"{_MARKS[item[ACTION]]} {item[ACTION]:<9} {item[FOLDER]}{detail}")
+        if len(shown) > limit:
+            lines.append(f"... {len(shown) - limit} more")
+        return lines
+
+    def pending(self, include_conflicts=False):
+        """Items execute() would apply"""
+        actions = (CREATE, MODIFY, CONFLICT) if include_conflicts else (CREATE, MODIFY)
+        return [item for item in self.items if item[ACTION] in actions]
+
+    def to_dict(self):
+        return {
+            "version": PLAN_VERSION,
+            "created": self.created,
+            "entries": self.entries,
+            "meta": self.meta,
+            "items": self.items,
+        }
+
+    def save(self, path):
+        write_atomic(path, json.dumps(self.to_dict(), separators=(",", ":")).encode("utf-8"))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != PLAN_VERSION:
+            raise ValueError(f"Unsupported plan version: {data.get('version')}")
+        return cls(data["entries"], data["items"], data.get("meta"), data.get("created"))
+
+
+def build_plan(folders, entries, entries_for=None, owned=None, workers=8, chunk_size=256,
+               previous=None, progress=None):
+    """Classify folders in parallel and return a Plan
+
+    entries_for(folder) may return per-folder entries (e.g. relative icon
+    paths); items only store them when they differ from entries. previous
+    is an earlier Plan whose verdicts are reused for unchanged files.
+    """
+    folders = list(folders)
+    earlier = {}
+    if previous is not None and previous.entries == entries:
+        earlier = {item[FOLDER]: item for item in previous.items}
+
+    def run(chunk):
+        items = []
+        for folder in chunk:
+            folder_entries = entries_for(folder) if entries_for else entries
+            before = earlier.get(folder)
+            if before is not None and (before[ENTRIES] or entries) != folder_entries:
+                before = None
+            item = plan_folder(folder, folder_entries, owned, before)
+            if folder_entries != entries:
+                item[ENTRIES] = folder_entries
+            items.append(item)
+        return items
+
+    chunks = [folders[i:i + chunk_size] for i in range(0, len(folders), max(chunk_size, 1))]
+    items = []
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        for result in pool.map(run, chunks):
+            items.extend(result)
+            if progress:
+                progress(len(items), len(folders))
+    return Plan(entries, items)
+
+
+def execute_plan(plan, workers=1, batch_size=64, progress=None, notifier=None, journal=None,
+                 prepare=None, include_conflicts=False, owned=None, scheduler=None, network=None):
+    """Apply a plan's create/modify folders; returns (failed, skipped)
+
+    Folders whose desktop.ini changed since planning are re-planned first
+    and skipped if they became unchanged or conflicting. prepare(folder,
+    entries) may return the entries actually written (e.g. after taking
+    an icon reference). With network (a fusion.netio.NetworkIO) the writes
+    go through its asyncio front end instead of apply_stream.
+    """
+    skipped = []
+    pending = plan.pending(include_conflicts)
+    if journal is not None:
+        # The whole plan is journaled before the first write so a resume covers every folder
+        journal.plan((item[FOLDER], plan.entries_for(item)) for item in pending)
+
+    def items():
+        for item in pending:
+            folder, entries = item[FOLDER], plan.entries_for(item)
+            if _stat_key(os.path.join(folder, DESKTOP_INI)) != (item[SIZE], item[MTIME]):
+                action = plan_folder(folder, entries, owned)[ACTION]
+                if action == UNCHANGED or (action == CONFLICT and not include_conflicts):
+                    skipped.append((folder, action))
+                    if journal is not None:
+                        journal.skip(folder)
+                    continue
+            yield folder, prepare(folder, entries) if prepare else entries
+
+    if network is not None:
+        failed = network.apply(items(), notifier, journal, progress)
+    else:
+        failed = apply_stream(items(), workers, batch_size, progress, notifier, journal, scheduler)
+    return failed, skipped
@@ -0,0 +1,372 @@
+"""
+Registry batches - plan, diff, apply and roll back sets of registry values
+
+Shell integration (the folder context menu, the plan file type) is a few
+dozen values under HKEY_CURRENT_USER\\Software\\Classes. A RegistryPlan
+lists the desired state; diff() reads every key it touches once and keeps
+only what differs; apply() writes the changes one key at a time (a single
+open handle per key, not per value), reads the keys back to verify, and
+returns an undo list for rollback(). If anything fails part-way, what was
+already written is rolled back before the error is raised. Changes and
+undo lists are plain JSON-friendly dicts.
+
+WinRegBackend talks to the real registry; MemoryBackend keeps keys in a
+dict (optionally saved to JSON) so the engine runs on any platform.
+"""
+
+import json
+import os
+import time
+
+from fusion.desktopini import write_atomic
+
+# Value types (same numbers as winreg)
+REG_SZ = 1
+REG_EXPAND_SZ = 2
+REG_BINARY = 3
+REG_DWORD = 4
+
+CLASSES = r"Software\Classes"
+MENU_KEY = "FileFusionPro"
+PLAN_EXTENSION = ".ffplan"
+PLAN_PROGID = "FileFusionPro.Plan"
+
+# Change operations
+SET = "set"
+REMOVE = "remove"
+RESTORE = "restore"
+
+
+def _norm(key):
+    return key.strip("\\").lower()
+
+
+def _join(key, relative):
+    return key + "\\" + relative if relative else key
+
+
+def _lookup(values, name):
+    """values[name] with registry (case-insensitive) name matching"""
+    if name in values:
+        return values[name]
+    lowered = name.lower()
+    return next((value for other, value in values.items() if other.lower() == lowered), None)
+
+
+class RegistryPlan:
+    """The desired state of some keys: values to set or delete, subtrees to remove"""
+
+    def __init__(self):
+        self.entries = {}   # normalized key -> [operation, key, {name: [type, data] or None}]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def set(self, key, name, data, kind=REG_SZ):
+        """Value name ("" is the default value) of key should be data"""
+        key = key.strip("\\")
+        entry = self.entries.get(_norm(key))
+        if entry is None or entry[0] != SET:
+            entry = self.entries[_norm(key)] = [SET, key, {}]
+        entry[2][name] = [kind, data]
+
+    def delete_value(self, key, name):
+        key = key.strip("\\")
+        entry = self.entries.get(_norm(key))
+        if entry is None or entry[0] != SET:
+            entry = self.entries[_norm(key)] = [SET, key, {}]
+        entry[2][name] = None
+
+    def remove_key(self, key):
+        """key and everything below it should not exist"""
+        key = key.strip("\\")
+        self.entries[_norm(key)] = [REMOVE, key, None]
+
+
+def diff(plan, backend):
+    """Changes needed to reach plan from the backend's current state, in plan order"""
+    changes = []
+    for operation, key, values in plan.entries.values():
+        if operation == REMOVE:
+            tree = backend.tree(key)
+            if tree is not None:
+                changes.append({"op": REMOVE, "key": key, "tree": tree})
+            continue
+        current = backend.read(key)
+        existed = current is not None
+        current = current or {}
+        wanted = {}
+        old = {}
+        for name, value in values.items():
+            present = _lookup(current, name)
+            if value != present and not (value is None and present is None):
+                wanted[name] = value
+                old[name] = present
+        if wanted:
+            changes.append({"op": SET, "key": key, "values": wanted, "old": old, "existed": existed})
+    return changes
+
+
+def _inverse(change):
+    if change["op"] == SET:
+        if not change["existed"]:
+            return {"op": REMOVE, "key": change["key"], "tree": {"": change["values"]}}
+        return {"op": SET, "key": change["key"], "values": change["old"], "old": change["values"], "existed": True}
+    if change["op"] == REMOVE:
+        return {"op": RESTORE, "key": change["key"], "tree": change["tree"]}
+    return {"op": REMOVE, "key": change["key"], "tree": change["tree"]}
+
+
+def _write(backend, change):
+    key = change["key"]
+    if change["op"] == SET:
+        backend.write(key, change["values"])
+    elif change["op"] == REMOVE:
+        backend.remove(key)
+    else:
+        # Parents before children, so every key is created with its own values
+        for relative in sorted(change["tree"], key=lambda relative: relative.count("\\") if relative else -1):
+            backend.write(_join(key, relative), change["tree"][relative])
+
+
+def _verify(backend, change):
+    """Whether change is visible in the backend"""
+    key = change["key"]
+    if change["op"] == REMOVE:
+        return backend.read(key) is None
+    if change["op"] == RESTORE:
+        current = backend.read(key)
+        return current is not None and all(_lookup(current, name) == value
+                                           for name, value in change["tree"].get("", {}).items())
+    current = backend.read(key)
+    return current is not None and all(_lookup(current, name) == value for name, value in change["values"].items())
+
+
+def rollback(undo, backend):
+    """Replay an undo list from apply(); returns the keys that could not be restored"""
+    failed = []
+    for change in undo:
+        try:
+            _write(backend, change)
+        except OSError:
+            failed.append(change["key"])
+    backend.flush()
+    return failed
+
+
+def apply(changes, backend, verify=True):
+    """Write changes and return their undo list (newest change first)
+
+    With verify, every written key is read back. On any error (or a key
+    that does not read back as written) the changes made so far are rolled
+    back and OSError is raised.
+    """
+    undo = []
+    try:
+        for change in changes:
+            undo.insert(0, _inverse(change))
+            _write(backend, change)
+        if verify:
+            for change in changes:
+                if not _verify(backend, change):
+                    raise OSError(f"Registry key did not read back as written: {change['key']}")
+        backend.flush()
+    except OSError:
+        rollback(undo, backend)
+        raise
+    return undo
+
+
+def context_menu_plan(launcher, icon, install=True):
+    """'Customize with FileFusion Pro' on folders and folder backgrounds
+
+    launcher is the quoted command line that starts the app; each selected
+    folder launches it once with --customize, and the single running
+    instance merges them into one batch.
+    """
+    plan = RegistryPlan()
+    for parent, target in (("Directory", "%1"), (r"Directory\Background", "%V")):
+        key = rf"{CLASSES}\{parent}\shell\{MENU_KEY}"
+        if not install:
+            plan.remove_key(key)
+            continue
+        plan.set(key, "", "Customize with FileFusion Pro")
+        plan.set(key, "Icon", icon)
+        plan.set(key, "MultiSelectModel", "Player")
+        plan.set(key + r"\command", "", f'{launcher} --customize "{target}"')
+    return plan
+
+
+def file_types_plan(launcher, icon, install=True):
+    """The .ffplan file type for saved batch plans, opened with --plan"""
+    plan = RegistryPlan()
+    extension = rf"{CLASSES}\{PLAN_EXTENSION}"
+    progid = rf"{CLASSES}\{PLAN_PROGID}"
+    if not install:
+        plan.remove_key(extension)
+        plan.remove_key(progid)
+        return plan
+    plan.set(extension, "", PLAN_PROGID)
+    plan.set(extension, "Content Type", "application/json")
+    plan.set(extension, "PerceivedType", "text")
+    plan.set(progid, "", "FileFusion Pro Batch Plan")
+    plan.set(progid + r"\DefaultIcon", "", icon)
+    plan.set(progid + r"\shell\open\command", "", f'{launcher} --plan "%1"')
+    return plan
+
+
+class WinRegBackend:
+    """Keys under one hive of the Windows registry (HKEY_CURRENT_USER by default)"""
+
+    def __init__(self, root=None):
+        import winreg
+
+        self._winreg = winreg
+        self.root = winreg.HKEY_CURRENT_USER if root is None else root
+
+    def _values(self, handle):
+        values = {}
+        index = 0
+        while True:
+            try:
+                name, data, kind = self._winreg.EnumValue(handle, index)
+            except OSError:
+                return values
+            values[name] = [kind, data]
+            index += 1
+
+    def _subkeys(self, handle):
+        subkeys = []
+        while True:
+            try:
+                subkeys.append(self._winreg.EnumKey(handle, len(subkeys)))
+            except OSError:
+                return subkeys
+
+    def read(self, key):
+        try:
+            with self._winreg.OpenKey(self.root, key) as handle:
+                return self._values(handle)
+        except FileNotFoundError:
+            return None
+
+    def tree(self, key):
+        """{relative subkey: values} of key and everything below it, or None"""
+        try:
+            with self._winreg.OpenKey(self.root, key) as handle:
+                result = {"": self._values(handle)}
+                subkeys = self._subkeys(handle)
+        except FileNotFoundError:
+            return None
+        for subkey in subkeys:
+            for relative, values in (self.tree(_join(key, subkey)) or {}).items():
+                result[_join(subkey, relative)] = values
+        return result
+
+    def write(self, key, values):
+        """Create key if needed and set (or, for None, delete) values through one handle"""
+        winreg = self._winreg
+        with winreg.CreateKeyEx(self.root, key, 0, winreg.KEY_READ | winreg.KEY_SET_VALUE) as handle:
+            for name, value in values.items():
+                if value is None:
+                    try:
+                        winreg.DeleteValue(handle, name)
+                    except FileNotFoundError:
+                        pass
+                else:
+                    winreg.SetValueEx(handle, name, 0, value[0], value[1])
+
+    def remove(self, key):
+        # DeleteKey only removes keys without subkeys
+        try:
+            with self._winreg.OpenKey(self.root, key) as handle:
+                subkeys = self._subkeys(handle)
+        except FileNotFoundError:
+            return
+        for subkey in subkeys:
+            self.remove(_join(key, subkey))
+        self._winreg.DeleteKey(self.root, key)
+
+    def flush(self):
+        pass
+
+
+def _encode(value):
+    if value is not None and isinstance(value[1], bytes):
+        return [value[0], {"hex": value[1].hex()}]
+    return value
+
+
+def _decode(value):
+    if value is not None and isinstance(value[1], dict):
+        return [value[0], bytes.fromhex(value[1]["hex"])]
+    return value
+
+
+class MemoryBackend:
+    """Registry keys in a dict, saved to path as JSON on flush() if given
+
+    Key paths and value names are case-insensitive like the real registry.
+    latency (seconds) is slept on every call to stand in for registry
+    round trips in benchmarks.
+    """
+
+    def __init__(self, path=None, latency=0.0):
+        self.path = path
+        self.latency = latency
+        self.calls = 0
+        self.keys = {}   # normalized key -> [key, {name: [type, data]}]
+        if path is not None:
+            try:
+                with open(path, 'r', encoding="utf-8") as f:
+                    for key, values in json.load(f).items():
+                        self.keys[_norm(key)] = [key, {name: _decode(value) for name, value in values.items()}]
+            except (OSError, ValueError, AttributeError):
+                pass
+
+    def _call(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def read(self, key):
+        self._call()
+        entry = self.keys.get(_norm(key))
+        return None if entry is None else {name: list(value) for name, value in entry[1].items()}
+
+    def tree(self, key):
+        self._call()
+        base = _norm(key)
+        if base not in self.keys:
+            return None
+        return {stored[len(key.strip("\\")) + 1:] if normalized != base else "": dict(values)
+                for normalized, (stored, values) in self.keys.items()
+                if normalized == base or normalized.startswith(base + "\\")}
+
+    def write(self, key, values):
+        self._call()
+        key = key.strip("\\")
+        # Like CreateKeyEx, missing parents are created too
+        parts = key.split("\\")
+        for depth in range(1, len(parts)):
+            self.keys.setdefault(_norm("\\".join(parts[:depth])), ["\\".join(parts[:depth]), {}])
+        stored = self.keys.setdefault(_norm(key), [key, {}])[1]
+        for name, value in values.items():
+            existing = next((other for other in stored if other.lower() == name.lower()), None)
+            if existing is not None:
+                del stored[existing]
+            if value is not None:
+                stored[name] = list(value)
+
+    def remove(self, key):
+        self._call()
+        base = _norm(key)
+        for normalized in [normalized for normalized in self.keys
+                           if normalized == base or normalized.startswith(base + "\\")]:
+            del self.keys[normalized]
+
+    def flush(self):
+        if self.path is not None:
+            data = {key: {name: _encode(value) for name, value in values.items()} for key, values in self.keys.values()}
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            write_atomic(self.path, json.dumps(data, indent=1).encode("utf-8"))
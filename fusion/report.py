@@ -0,0 +1,204 @@
+"""
+Report export - stream per-folder stats of large trees to CSV, JSON Lines or HTML
+
+Rows come straight from the post-order walk of bounded.walk_totals (each
+folder is reported once its subtree is done), so only the current directory chain is in memory, and
+each writer emits a row as soon as it arrives. A report of a million
+folders therefore needs no more memory than one of a hundred. Rows hold
+subtree totals (apparent and allocated bytes, files, folders), the
+largest file types and the customization status.
+"""
+
+import argparse
+import csv
+import html
+import json
+import os
+import sys
+
+from fusion.bounded import walk_totals
+from fusion.dashboard import NOT_APPLIED, customization_status
+from fusion.sizetree import HARDLINKS_BY_DEFAULT
+
+COLUMNS = ("path", "depth", "size", "alloc", "files", "dirs", "types", "status")
+FORMATS = ("csv", "jsonl", "html")
+
+
+def walk_rows(root, max_depth=None, top_types=3, hardlinks=HARDLINKS_BY_DEFAULT):
+    """Yield a row dict per folder in post-order (children before their parent)
+
+    Folders deeper than max_depth below root are still scanned and counted
+    in their ancestors' totals, but get no row of their own. types lists the
+    top_types largest file types of the subtree as (extension, bytes, files).
+    """
+    for path, size, files, dirs, depth, alloc, extensions, has_ini in \
+            walk_totals(os.path.abspath(root), details=True, hardlinks=hardlinks):
+        if max_depth is not None and depth > max_depth:
+            continue
+        status = NOT_APPLIED
+        if has_ini:
+            try:
+                status = customization_status(path)
+            except OSError:
+                pass
+        types = sorted(extensions.items(), key=lambda item: item[1][0], reverse=True)[:top_types]
+        yield {
+            "path": path, "depth": depth, "size": size, "alloc": alloc, "files": files, "dirs": dirs,
+            "types": [(extension or "(none)", total, count) for extension, (total, count) in types],
+            "status": status,
+        }
+
+
+def _types_text(types):
+    return " ".join(f"{extension}:{size}" for extension, size, _ in types)
+
+
+class CSVReport:
+    """One CSV line per folder; file types as 'ext:bytes' pairs"""
+
+    def __init__(self, stream):
+        self.writer = csv.writer(stream)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, row):
+        self.writer.writerow([_types_text(row[column]) if column == "types" else row[column] for column in COLUMNS])
+
+    def close(self, summary):
+        pass
+
+
+class JSONLinesReport:
+    """One JSON object per line, then a summary line"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, row):
+        self.stream.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def close(self, summary):
+        self.stream.write(json.dumps({"summary": summary}, ensure_ascii=False) + "\n")
+
+
+_HTML_HEAD = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ font-family: "Segoe UI", sans-serif; background: #1e1e1e; color: #ddd; margin: 24px; }}
+h1 {{ font-size: 20px; }}
+input {{ padding: 6px; width: 320px; margin-bottom: 12px; }}
+table {{ border-collapse: collapse; width: 100%; font-size: 13px; }}
+th, td {{ padding: 4px 8px; border-bottom: 1px solid #333; }}
+th {{ background: #2b2b2b; text-align: left; position: sticky; top: 0; }}
+td.n {{ text-align: right; font-variant-numeric: tabular-nums; }}
+tr.customized td:last-child {{ color: #2ecc71; }}
+</style></head><body>
+<h1>{title}</h1>
+<input id="filter" placeholder="Filter folders..." oninput="filterRows(this.value)">
+<table><thead><tr><th>Folder</th><th>Size</th><th>On Disk</th><th>Files</th><th>Folders</th>
+<th>File Types</th><th>Customization</th></tr></thead><tbody>
+"""
+
+_HTML_TAIL = """</tbody></table>
+<p>{summary}</p>
+<script>
+function filterRows(text) {{
+  text = text.toLowerCase();
+  for (const row of document.querySelectorAll("tbody tr")) {{
+    row.style.display = row.cells[0].textContent.toLowerCase().includes(text) ? "" : "none";
+  }}
+}}
+</script>
+</body></html>
+"""
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if size < 1024.0:
+            return f"{size:.2f} {unit}"
+        size /= 1024.0
+    return f"{size:.2f} PB"
+
+
+class HTMLReport:
+    """A single self-contained HTML page (inline style and filter script)"""
+
+    def __init__(self, stream, title="FileFusion Pro Report"):
+        self.stream = stream
+        stream.write(_HTML_HEAD.format(title=html.escape(title)))
+
+    def write(self, row):
+        types = ", ".join(f"{html.escape(extension)} {format_size(size)}" for extension, size, _ in row["types"])
+        self.stream.write(
+            f'<tr class="{html.escape(row["status"])}"><td>{html.escape(row["path"])}</td>'
+            f'<td class="n">{format_size(row["size"])}</td><td class="n">{format_size(row["alloc"])}</td>'
+            f'<td class="n">{row["files"]}</td><td class="n">{row["dirs"]}</td>'
+            f'<td>{types}</td><td>{html.escape(row["status"])}</td></tr>\n'
+        )
+
+    def close(self, summary):
+        self.stream.write(_HTML_TAIL.format(summary=html.escape(
+            f"{summary['rows']} folders under {', '.join(summary['roots'])}: "
+            f"{format_size(summary['size'])} in {summary['files']} files"
+        )))
+
+
+WRITERS = {"csv": CSVReport, "jsonl": JSONLinesReport, "html": HTMLReport}
+
+
+def format_for(path):
+    """Report format implied by a file name (csv, jsonl or html)"""
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    return {"json": "jsonl", "ndjson": "jsonl", "htm": "html"}.get(extension, extension)
+
+
+def export(roots, path, fmt=None, max_depth=None, progress=None, cancel=None):
+    """Stream the rows of every root to path; returns a summary dict
+
+    progress(rows) is called every few thousand rows; cancel() returning
+    True stops the export early (the file is still closed properly).
+    """
+    fmt = fmt or format_for(path)
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown report format: {fmt}")
+    summary = {"roots": [os.path.abspath(root) for root in roots], "rows": 0, "size": 0, "files": 0,
+               "cancelled": False}
+    with open(path, 'w', encoding="utf-8", newline="") as stream:
+        writer = WRITERS[fmt](stream)
+        for root in summary["roots"]:
+            for row in walk_rows(root, max_depth):
+                writer.write(row)
+                summary["rows"] += 1
+                if row["depth"] == 0:
+                    summary["size"] += row["size"]
+                    summary["files"] += row["files"]
+                if summary["rows"] % 4096 == 0:
+                    if progress:
+                        progress(summary["rows"])
+                    if cancel and cancel():
+                        summary["cancelled"] = True
+                        break
+            if summary["cancelled"]:
+                break
+        writer.close(summary)
+    if progress:
+        progress(summary["rows"])
+    return summary
+
+
+def main(argv=None):
+    """Headless entry point: python -m fusion.report ROOT... -o OUTPUT [--format csv|jsonl|html]"""
+    parser = argparse.ArgumentParser(prog="python -m fusion.report", description="Export per-folder stats reports")
+    parser.add_argument("roots", nargs="+")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--max-depth", type=int)
+    args = parser.parse_args(argv)
+
+    summary = export(args.roots, args.output, args.format, args.max_depth)
+    print(json.dumps(summary, indent=4))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
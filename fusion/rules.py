@@ -0,0 +1,130 @@
+"""
+Auto-customization rules - classify folders by their content mix
+
+Rules are plain dicts (so they can live in the config file):
+
+    {"name": "Photos", "color": "#9b59b6", "infotip": "Photos",
+     "bucket": "images", "min_ratio": 0.6, "min_files": 5,
+     "max_files": None, "name_pattern": "photo|pictures|dcim", "icon": None}
+
+Conditions that are left out always match. The first matching rule wins.
+"""
+
+import os
+import re
+
+# Extension lookup used to put every file into a content bucket
+EXTENSION_BUCKETS = {
+    "documents": ".pdf .doc .docx .odt .rtf .txt .md .tex .xls .xlsx .ods .csv .ppt .pptx .odp .epub",
+    "images": ".jpg .jpeg .png .gif .bmp .tif .tiff .webp .heic .raw .cr2 .nef .arw .dng .svg .psd",
+    "audio": ".mp3 .flac .wav .ogg .m4a .aac .wma .opus .aiff .mid .midi",
+    "video": ".mp4 .mkv .avi .mov .wmv .webm .m4v .mpg .mpeg .flv .3gp",
+    "code": ".py .js .ts .java .c .h .cpp .hpp .cs .go .rs .rb .php .html .css .json .xml .yml .yaml .sh .sql",
+    "archives": ".zip .rar .7z .tar .gz .bz2 .xz .iso .cab .tgz",
+    "system": ".exe .dll .sys .msi .bat .cmd .ps1 .ini .inf .cat .drv .ocx .lnk",
+}
+
+DEFAULT_RULES = [
+    {"name": "System", "color": "#34495e", "infotip": "System files", "bucket": "system", "min_ratio": 0.5, "min_files": 3},
+    {"name": "Projects", "color": "#1abc9c", "infotip": "Source code", "bucket": "code", "min_ratio": 0.5, "min_files": 3,
+     "name_pattern": "src|source|project|repo|code"},
+    {"name": "Code", "color": "#1abc9c", "infotip": "Source code", "bucket": "code", "min_ratio": 0.6, "min_files": 5},
+    {"name": "Photos", "color": "#9b59b6", "infotip": "Photos", "bucket": "images", "min_ratio": 0.6, "min_files": 3},
+    {"name": "Music", "color": "#e67e22", "infotip": "Music", "bucket": "audio", "min_ratio": 0.6, "min_files": 3},
+    {"name": "Videos", "color": "#e74c3c", "infotip": "Videos", "bucket": "video", "min_ratio": 0.5, "min_files": 2},
+    {"name": "Documents", "color": "#3498db", "infotip": "Documents", "bucket": "documents", "min_ratio": 0.5, "min_files": 3},
+    {"name": "Archives", "color": "#f39c12", "infotip": "Archives", "bucket": "archives", "min_ratio": 0.5, "min_files": 2},
+    {"name": "Downloads", "color": "#27ae60", "infotip": "Downloads", "name_pattern": "downloads?"},
+]
+
+
+class RuleSet:
+    """Rules compiled into lookup tables and a single combined name regex"""
+
+    def __init__(self, rules=None, extension_buckets=None):
+        self.rules = list(rules if rules is not None else DEFAULT_RULES)
+        buckets = extension_buckets or EXTENSION_BUCKETS
+        self.bucket_names = list(buckets)
+        self.other_bucket = len(self.bucket_names)
+
+        # Extension -> bucket index
+        self.bucket_of = {}
+        for index, name in enumerate(self.bucket_names):
+            for extension in buckets[name].split():
+                self.bucket_of[extension.lower()] = index
+
+        # Per-rule tuples for the hot loop; -1 means "no bucket condition"
+        self._compiled = []
+        patterns = []
+        for index, rule in enumerate(self.rules):
+            bucket = rule.get("bucket")
+            if bucket is not None and bucket not in self.bucket_names:
+                raise ValueError(f"Rule '{rule.get('name')}' uses unknown bucket '{bucket}'")
+            pattern = rule.get("name_pattern")
+            regex = re.compile(f"(?:{pattern})", re.IGNORECASE) if pattern else None
+            if pattern:
+                patterns.append(f"(?:{pattern})")
+            self._compiled.append((
+                index,
+                self.bucket_names.index(bucket) if bucket is not None else -1,
+                rule.get("min_ratio", 0.0),
+                rule.get("min_files", 0),
+                rule.get("max_files"),
+                regex,
+            ))
+
+        # One regex rejects most folder names for all name rules at once
+        self._any_name = re.compile("|".join(patterns), re.IGNORECASE) if patterns else None
+
+    def new_counts(self):
+        """Return a zeroed bucket counter (last slot is "other")"""
+        return [0] * (self.other_bucket + 1)
+
+    def classify(self, name, counts):
+        """Return the first rule matching a folder name and its bucket counts, or None"""
+        total = sum(counts)
+        name_hit = self._any_name is not None and self._any_name.search(name) is not None
+        for index, bucket, min_ratio, min_files, max_files, regex in self._compiled:
+            if total < min_files or (max_files is not None and total > max_files):
+                continue
+            if regex is not None and (not name_hit or regex.search(name) is None):
+                continue
+            if bucket >= 0 and (total == 0 or counts[bucket] < min_ratio * total):
+                continue
+            return self.rules[index]
+        return None
+
+
+def classify_tree(root, rule_set, include_root=True):
+    """Yield (folder, rule) for every folder under root that matches a rule
+
+    Each folder is listed exactly once; its direct files are bucketed while
+    the listing streams, and subfolders are queued for the same pass.
+    """
+    stack = [root]
+    while stack:
+        folder = stack.pop()
+        counts = rule_set.new_counts()
+        bucket_of = rule_set.bucket_of
+        other = rule_set.other_bucket
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                            continue
+                    except OSError:
+                        continue
+                    name = entry.name
+                    if name.lower() == "desktop.ini":
+                        continue
+                    dot = name.rfind(".")
+                    counts[bucket_of.get(name[dot:].lower(), other) if dot > 0 else other] += 1
+        except OSError:
+            continue
+        if folder == root and not include_root:
+            continue
+        rule = rule_set.classify(os.path.basename(folder), counts)
+        if rule is not None:
+            yield folder, rule
@@ -0,0 +1,137 @@
+"""
+Per-volume I/O scheduler - one queue and concurrency limit per drive or share
+
+Jobs are submitted with the path they touch. Each volume (by st_dev) gets
+its own queue and its own limit, chosen by storage kind or calibration,
+and free slots are handed out round-robin across volumes that have work.
+A slow spinning disk therefore never holds the workers an SSD or a network
+share could use, and jobs on one volume never exceed what it handles well.
+"""
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from fusion.volumes import volume_id, volume_kind
+
+
+class _Volume:
+    """Queue and counters of one volume"""
+
+    def __init__(self, key, kind, limit, path):
+        self.key = key
+        self.path = path   # first path seen on the volume
+        self.kind = kind
+        self.limit = limit
+        self.queue = deque()
+        self.running = 0
+        self.completed = 0
+
+
+class VolumeScheduler:
+    """Runs jobs on a shared thread pool, limited and queued per volume
+
+    limit_for(path, kind) returns a volume's concurrency; volume_of(path)
+    returns (key, kind) and can be replaced for tests and benchmarks.
+    """
+
+    def __init__(self, limit_for=None, max_workers=64, volume_of=None):
+        from fusion.tuning import KIND_WORKERS
+
+        self.limit_for = limit_for or (lambda path, kind: KIND_WORKERS[kind])
+        self.volume_of = volume_of or (lambda path: (volume_id(path), volume_kind(path)))
+        self.max_workers = max_workers
+        self._volumes = {}
+        self._paths = {}      # parent directory -> volume (saves a stat per job)
+        self._active = deque()  # volumes with queued jobs, in round-robin order
+        self._running = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="volume-io")
+
+    def volume(self, path):
+        """The _Volume holding path (created on first use)"""
+        parent = os.path.dirname(os.path.abspath(path))
+        volume = self._paths.get(parent)
+        if volume is not None:
+            return volume
+        key, kind = self.volume_of(path)
+        with self._lock:
+            volume = self._volumes.get(key)
+            if volume is None:
+                volume = self._volumes[key] = _Volume(key, kind, max(1, self.limit_for(path, kind)), path)
+            self._paths[parent] = volume
+        return volume
+
+    def limit(self, path):
+        """Concurrency limit of the volume holding path"""
+        return self.volume(path).limit
+
+    def refresh_limits(self):
+        """Ask limit_for again for every known volume (e.g. after calibration)"""
+        with self._lock:
+            for volume in self._volumes.values():
+                volume.limit = max(1, self.limit_for(volume.path, volume.kind))
+            self._dispatch()
+
+    def submit(self, path, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) on the volume holding path; returns a Future"""
+        volume = self.volume(path)
+        future = Future()
+        with self._lock:
+            if not volume.queue:
+                self._active.append(volume)
+            volume.queue.append((future, fn, args, kwargs))
+            self._dispatch()
+        return future
+
+    def _dispatch(self):
+        """Start queued jobs round-robin while slots are free (called with the lock held)"""
+        skipped = 0
+        while self._active and self._running < self.max_workers and skipped < len(self._active):
+            volume = self._active.popleft()
+            if volume.running >= volume.limit:
+                self._active.append(volume)
+                skipped += 1
+                continue
+            skipped = 0
+            future, fn, args, kwargs = volume.queue.popleft()
+            if volume.queue:
+                self._active.append(volume)
+            if not future.set_running_or_notify_cancel():
+                continue
+            volume.running += 1
+            self._running += 1
+            self._pool.submit(self._run, volume, future, fn, args, kwargs)
+
+    def _run(self, volume, future, fn, args, kwargs):
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                volume.running -= 1
+                volume.completed += 1
+                self._running -= 1
+                self._dispatch()
+
+    def stats(self):
+        """Per-volume kind, limit, queued, running and completed job counts"""
+        with self._lock:
+            return [
+                {"volume": volume.key, "kind": volume.kind, "limit": volume.limit,
+                 "queued": len(volume.queue), "running": volume.running, "completed": volume.completed}
+                for volume in self._volumes.values()
+            ]
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
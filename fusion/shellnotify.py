@@ -0,0 +1,118 @@
+"""
+Explorer refresh notifications - batched, de-duplicated and rate limited
+
+Explorer only picks up a new desktop.ini after SHChangeNotify. Sending one
+notification per folder during a batch floods the shell, so folders are
+collected first and, once the batch is done, coalesced per parent directory
+and emitted through a token bucket.
+"""
+
+import ctypes
+import os
+import sys
+import threading
+import time
+
+SHCNE_UPDATEDIR = 0x00001000
+SHCNE_UPDATEITEM = 0x00002000
+SHCNE_ASSOCCHANGED = 0x08000000
+SHCNF_PATHW = 0x0005
+SHCNF_FLUSHNOWAIT = 0x3000
+
+EVENT_NAMES = {SHCNE_UPDATEDIR: "UPDATEDIR", SHCNE_UPDATEITEM: "UPDATEITEM", SHCNE_ASSOCCHANGED: "ASSOCCHANGED"}
+
+
+class Win32NotifyBackend:
+    """Sends notifications through shell32.SHChangeNotify"""
+
+    def __init__(self):
+        self._notify = ctypes.windll.shell32.SHChangeNotify
+        self._notify.argtypes = [ctypes.c_long, ctypes.c_uint, ctypes.c_wchar_p, ctypes.c_void_p]
+        self._notify.restype = None
+
+    def notify(self, event, path):
+        self._notify(event, SHCNF_PATHW | SHCNF_FLUSHNOWAIT, path, None)
+
+
+class RecordingBackend:
+    """Records notifications instead of sending them (non-Windows and testing)"""
+
+    def __init__(self):
+        self.calls = []
+
+    def notify(self, event, path):
+        self.calls.append((EVENT_NAMES.get(event, event), path))
+
+
+def default_backend():
+    return Win32NotifyBackend() if sys.platform == "win32" else RecordingBackend()
+
+
+def plan_notifications(folders, coalesce_threshold=8):
+    """Turn a set of changed folders into (event, path) notifications
+
+    Folders sharing a parent are replaced by one UPDATEDIR on the parent
+    once at least coalesce_threshold of them changed; the rest get an
+    UPDATEITEM each. The result is sorted and free of duplicates.
+    """
+    by_parent = {}
+    for folder in folders:
+        by_parent.setdefault(os.path.dirname(folder), []).append(folder)
+
+    planned = set()
+    for parent, children in by_parent.items():
+        if len(children) >= coalesce_threshold and parent:
+            planned.add((SHCNE_UPDATEDIR, parent))
+        else:
+            planned.update((SHCNE_UPDATEITEM, child) for child in children)
+    return sorted(planned, key=lambda item: (item[1], item[0]))
+
+
+class NotifyScheduler:
+    """Collects changed folders and emits coalesced notifications on flush()"""
+
+    def __init__(self, backend=None, rate=50.0, burst=20, coalesce_threshold=8,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.backend = backend or default_backend()
+        self.rate = rate
+        self.burst = burst
+        self.coalesce_threshold = coalesce_threshold
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(burst)
+        self._last = clock()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self.sent = 0
+
+    def add(self, folder):
+        """Mark a folder as changed (thread-safe)"""
+        folder = os.path.normcase(os.path.abspath(folder))
+        with self._lock:
+            self._pending.add(folder)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _take_token(self):
+        """Block until the token bucket allows another notification"""
+        while True:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            self._sleep((1 - self._tokens) / self.rate)
+
+    def flush(self):
+        """Send notifications for everything collected so far; returns the plan sent"""
+        with self._lock:
+            folders = self._pending
+            self._pending = set()
+        plan = plan_notifications(folders, self.coalesce_threshold)
+        for event, path in plan:
+            self._take_token()
+            self.backend.notify(event, path)
+            self.sent += 1
+        return plan
@@ -0,0 +1,398 @@
+"""
+Directory size tree - per-folder size breakdown built from a single scan
+
+Every folder records two totals: the apparent size (file lengths, what
+Explorer calls "Size") and the allocated size (what the files occupy on
+disk, "Size on disk"), which is smaller for sparse and compressed files
+and larger for many small ones. A file with several hardlinks is counted
+once, in the first folder it is found in.
+"""
+
+import ctypes
+import functools
+import os
+import sys
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from fusion.inodes import InodeSet
+from fusion.instrument import metrics
+from fusion.volumes import cluster_size
+
+FILE_ATTRIBUTE_SPARSE_FILE = 0x200
+FILE_ATTRIBUTE_COMPRESSED = 0x800
+
+# DirEntry.stat() carries st_blocks, st_nlink and st_ino for free on POSIX;
+# on Windows the link count needs a full os.stat per file, so it is opt-in
+HARDLINKS_BY_DEFAULT = sys.platform != "win32"
+_HAS_BLOCKS = hasattr(os.stat_result, "st_blocks")
+
+
+class SizeTree:
+    """Array-backed directory tree with bottom-up size totals
+
+    Node 0 is the scanned root. Every other node stores only its own name;
+    parent links, subtree totals and child lists live in parallel arrays so
+    a tree of millions of folders costs a few dozen bytes per folder.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.names = [self.root]
+        self.parent = array('q', [-1])
+        self.size = array('q', [0])       # bytes in the subtree
+        self.files = array('q', [0])      # files in the subtree
+        self.dirs = array('q', [0])       # folders below the node
+        self.own_size = array('q', [0])   # bytes of direct files only
+        self.alloc = array('q', [0])      # bytes allocated on disk in the subtree
+        self.own_alloc = array('q', [0])  # bytes allocated by direct files only
+        self.first_child = array('q', [-1])
+        self.next_sibling = array('q', [-1])
+        self.errors = 0
+        self.linked = 0          # extra hardlinks to already counted files
+        self.linked_size = 0     # apparent bytes those links would have added
+        self.extensions = {}     # lower-case extension -> [bytes, files] over the whole tree
+        self.inodes = InodeSet()
+
+    @classmethod
+    def scan(cls, root, workers=1, scheduler=None, hardlinks=None):
+        """Scan root once and return the aggregated tree
+
+        With workers > 1 directories are listed concurrently, which pays off
+        on network shares and SSDs where a single thread leaves the device idle.
+        With a VolumeScheduler the listings share its per-volume limits instead.
+        hardlinks turns link de-duplication on or off (default: on except on Windows).
+        """
+        tree = cls(root)
+        if hardlinks is None:
+            hardlinks = HARDLINKS_BY_DEFAULT
+        list_directory = functools.partial(_list_directory, hardlinks=hardlinks)
+        if scheduler is not None:
+            tree._scan_parallel(scheduler.limit(tree.root),
+                                lambda path: scheduler.submit(tree.root, list_directory, path))
+        elif workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                tree._scan_parallel(workers, lambda path: pool.submit(list_directory, path))
+        else:
+            tree._scan(list_directory)
+        tree._accumulate()
+        return tree
+
+    @classmethod
+    def scan_many(cls, roots, scheduler):
+        """Scan several roots at once through a VolumeScheduler; returns {root: tree}
+
+        Roots on different volumes proceed in parallel, each within its own
+        volume's limit.
+        """
+        roots = list(roots)
+        with ThreadPoolExecutor(max_workers=max(len(roots), 1)) as pool:
+            return dict(zip(roots, pool.map(lambda root: cls.scan(root, scheduler=scheduler), roots)))
+
+    def __len__(self):
+        return len(self.names)
+
+    def _add_node(self, parent, name):
+        """Append a folder node and link it under its parent"""
+        index = len(self.names)
+        self.names.append(name)
+        self.parent.append(parent)
+        self.size.append(0)
+        self.files.append(0)
+        self.dirs.append(0)
+        self.own_size.append(0)
+        self.alloc.append(0)
+        self.own_alloc.append(0)
+        self.first_child.append(-1)
+        self.next_sibling.append(self.first_child[parent])
+        self.first_child[parent] = index
+        return index
+
+    def _scan(self, list_directory=None):
+        """Walk the tree, recording direct file totals per folder"""
+        list_directory = list_directory or _list_directory
+        stack = [(0, self.root)]
+        while stack:
+            index, path = stack.pop()
+            listing = list_directory(path)
+            self._record(index, listing)
+            for name, child_path in listing[0]:
+                stack.append((self._add_node(index, name), child_path))
+
+    def _record(self, index, listing):
+        """Store the direct file totals of a listed folder
+
+        listing is what _list_directory returns. Files with more than one
+        link are only counted the first time their inode is seen.
+        """
+        _, own_size, own_alloc, own_files, errors, links, extensions = listing
+        totals = self.extensions
+        for extension, (size, files) in extensions.items():
+            total = totals.get(extension)
+            if total is None:
+                totals[extension] = [size, files]
+            else:
+                total[0] += size
+                total[1] += files
+        for device, inode, size, allocated, extension in links:
+            if self.inodes.add(device, inode):
+                own_size += size
+                own_alloc += allocated
+                own_files += 1
+                total = totals.setdefault(extension, [0, 0])
+                total[0] += size
+                total[1] += 1
+            else:
+                self.linked += 1
+                self.linked_size += size
+        self.own_size[index] = self.size[index] = own_size
+        self.own_alloc[index] = self.alloc[index] = own_alloc
+        self.files[index] = own_files
+        self.errors += errors
+
+    def _scan_parallel(self, workers, submit):
+        """Walk the tree with submit(path) listing up to workers directories at a time"""
+        pending = {submit(self.root): 0}
+        queued = []
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                listing = future.result()
+                self._record(index, listing)
+                for name, path in listing[0]:
+                    queued.append((self._add_node(index, name), path))
+            # Keep the pool busy without flooding it with futures
+            while queued and len(pending) < workers * 4:
+                child, path = queued.pop()
+                pending[submit(path)] = child
+
+    def _accumulate(self):
+        """Roll subtree totals up into parents (children always follow parents)"""
+        parent = self.parent
+        size = self.size
+        alloc = self.alloc
+        files = self.files
+        dirs = self.dirs
+        for index in range(len(self.names) - 1, 0, -1):
+            p = parent[index]
+            size[p] += size[index]
+            alloc[p] += alloc[index]
+            files[p] += files[index]
+            dirs[p] += dirs[index] + 1
+
+    def children(self, index):
+        """Return child node indexes sorted by size, largest first"""
+        result = []
+        child = self.first_child[index]
+        while child != -1:
+            result.append(child)
+            child = self.next_sibling[child]
+        result.sort(key=lambda i: self.size[i], reverse=True)
+        return result
+
+    def path(self, index):
+        """Rebuild the absolute path of a node"""
+        parts = []
+        while index > 0:
+            parts.append(self.names[index])
+            index = self.parent[index]
+        return os.path.join(self.root, *reversed(parts))
+
+    def paths(self):
+        """Absolute paths of all nodes, in node order (parents before children)"""
+        result = [self.root]
+        names = self.names
+        parent = self.parent
+        for index in range(1, len(names)):
+            base = result[parent[index]]
+            result.append(base + names[index] if base.endswith(os.sep) else base + os.sep + names[index])
+        return result
+
+    def find(self, path):
+        """Return the node index for path, or -1 if it is not in the tree"""
+        path = os.path.abspath(path)
+        if os.path.normcase(path) == os.path.normcase(self.root):
+            return 0
+        try:
+            relative = os.path.relpath(path, self.root)
+        except ValueError:
+            return -1
+        if relative.startswith(os.pardir):
+            return -1
+        index = 0
+        for part in relative.split(os.sep):
+            child = self.first_child[index]
+            while child != -1 and os.path.normcase(self.names[child]) != os.path.normcase(part):
+                child = self.next_sibling[child]
+            if child == -1:
+                return -1
+            index = child
+        return index
+
+    def top_extensions(self, limit=10):
+        """Return (extension, bytes, files) for the largest file types, largest first"""
+        rows = [(extension, size, files) for extension, (size, files) in self.extensions.items()]
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return rows[:limit]
+
+    def breakdown(self, index, limit=50):
+        """Return (label, size, node) rows for the direct contents of a node
+
+        Subfolders beyond limit are folded into one "Other folders" row and the
+        folder's own files are reported as a separate row with node -1.
+        """
+        rows = []
+        children = self.children(index)
+        for child in children[:limit]:
+            if self.size[child] > 0:
+                rows.append((self.names[child], self.size[child], child))
+        rest = sum(self.size[child] for child in children[limit:])
+        if rest > 0:
+            rows.append(("Other folders", rest, -1))
+        if self.own_size[index] > 0:
+            rows.append(("(files)", self.own_size[index], -1))
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return rows
+
+
+def _compressed_size(path):
+    """Bytes a compressed or sparse file occupies on disk (Windows)"""
+    from ctypes import wintypes
+
+    high = wintypes.DWORD()
+    low = ctypes.windll.kernel32.GetCompressedFileSizeW(path, ctypes.byref(high))
+    if low == 0xFFFFFFFF and ctypes.GetLastError():
+        raise ctypes.WinError()
+    return (high.value << 32) | low
+
+
+def allocated_size(path, st, cluster=None):
+    """Bytes a file occupies on disk, from its stat result
+
+    POSIX reports 512-byte blocks directly. Windows has no block count:
+    compressed and sparse files ask the filesystem, everything else is
+    rounded up to whole clusters.
+    """
+    blocks = getattr(st, "st_blocks", None)
+    if blocks is not None:
+        return blocks * 512
+    if getattr(st, "st_file_attributes", 0) & (FILE_ATTRIBUTE_SPARSE_FILE | FILE_ATTRIBUTE_COMPRESSED):
+        return _compressed_size(path)
+    cluster = cluster or cluster_size(path)
+    return -(-st.st_size // cluster) * cluster
+
+
+def list_entries(entries, path, hardlinks, on_error):
+    """Total the DirEntry objects of one directory
+
+    Returns (subdirs, own size, own allocated size, own file count, links,
+    extensions) where links lists (st_dev, st_ino, size, allocated,
+    extension) of files with more than one link; those are left out of the
+    totals until de-duplicated. extensions maps each lower-case extension
+    to [bytes, files]. on_error(error) is called for entries that cannot
+    be read.
+    """
+    subdirs = []
+    links = []
+    extensions = {}
+    own_size = own_alloc = own_files = 0
+    cluster = None if _HAS_BLOCKS else cluster_size(path)
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append((entry.name, entry.path))
+                continue
+            st = entry.stat(follow_symlinks=False)
+            if hardlinks and not st.st_nlink:
+                # Windows leaves st_nlink/st_ino empty in directory listings
+                st = os.stat(entry.path, follow_symlinks=False)
+            allocated = allocated_size(entry.path, st, cluster)
+            extension = os.path.splitext(entry.name)[1].lower()
+            if hardlinks and st.st_nlink > 1:
+                links.append((st.st_dev, st.st_ino, st.st_size, allocated, extension))
+            else:
+                own_size += st.st_size
+                own_alloc += allocated
+                own_files += 1
+                total = extensions.get(extension)
+                if total is None:
+                    extensions[extension] = [st.st_size, 1]
+                else:
+                    total[0] += st.st_size
+                    total[1] += 1
+        except OSError as e:
+            on_error(e)
+    return subdirs, own_size, own_alloc, own_files, links, extensions
+
+
+@metrics.task
+def _list_directory(path, hardlinks=HARDLINKS_BY_DEFAULT):
+    """List one directory: (subdirs, own size, own allocated size, own file count, error count, links, extensions)"""
+    errors = []
+    try:
+        with os.scandir(path) as entries:
+            subdirs, own_size, own_alloc, own_files, links, extensions = \
+                list_entries(entries, path, hardlinks, errors.append)
+    except OSError:
+        return [], 0, 0, 0, 1, [], {}
+    return subdirs, own_size, own_alloc, own_files, len(errors), links, extensions
+
+
+def _worst_ratio(row_total, row_min, row_max, side):
+    """Worst aspect ratio of a treemap row laid along side"""
+    side_sq = side * side
+    total_sq = row_total * row_total
+    return max(row_max * side_sq / total_sq, total_sq / (side_sq * row_min))
+
+
+def squarify(values, x, y, width, height):
+    """Lay out positive values (sorted descending) as squarified rectangles
+
+    Returns a list of (index, x, y, width, height) tuples.
+    """
+    rects = []
+    total = sum(values)
+    if total <= 0 or width <= 0 or height <= 0:
+        return rects
+
+    scale = width * height / total
+    areas = [value * scale for value in values]
+    start = 0
+    while start < len(areas):
+        side = min(width, height)
+        row_total = row_min = row_max = areas[start]
+        end = start + 1
+        while end < len(areas):
+            area = areas[end]
+            current = _worst_ratio(row_total, row_min, row_max, side)
+            candidate = _worst_ratio(row_total + area, min(row_min, area), max(row_max, area), side)
+            if candidate > current:
+                break
+            row_total += area
+            row_min = min(row_min, area)
+            row_max = max(row_max, area)
+            end += 1
+
+        if width >= height:
+            # Fill a column on the left
+            column = row_total / height
+            offset = y
+            for i in range(start, end):
+                h = areas[i] / column
+                rects.append((i, x, offset, column, h))
+                offset += h
+            x += column
+            width -= column
+        else:
+            # Fill a row along the top
+            row = row_total / width
+            offset = x
+            for i in range(start, end):
+                w = areas[i] / row
+                rects.append((i, offset, y, w, row))
+                offset += w
+            y += row
+            height -= row
+        start = end
+    return rects
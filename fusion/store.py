@@ -0,0 +1,258 @@
+"""
+Content-addressed storage and the shared, reference-counted icon store
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from fusion.customize import FILE_ATTRIBUTE_HIDDEN, FILE_ATTRIBUTE_READONLY, set_attributes
+from fusion.desktopini import write_atomic
+from fusion.hashing import hash_bytes, hash_file
+from fusion.volumes import is_portable_media
+
+# Per-folder icon copy used on portable media
+PORTABLE_ICON_NAME = ".filefusion.ico"
+
+
+class ContentStore:
+    """Files stored once under the sha256 of their content"""
+
+    def __init__(self, directory, suffix=""):
+        self.directory = directory
+        self.suffix = suffix
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, digest):
+        """Return the storage path of a digest (two-level fan-out)"""
+        return os.path.join(self.directory, digest[:2], digest + self.suffix)
+
+    def __contains__(self, digest):
+        return os.path.exists(self.path_for(digest))
+
+    def put_bytes(self, data):
+        """Store data and return its digest"""
+        digest = hash_bytes(data)
+        path = self.path_for(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_atomic(path, data)
+        return digest
+
+    def put_file(self, source, use_mmap=False):
+        """Store a copy of a file and return its digest (use_mmap: the volume profile's hashing mode)"""
+        digest = hash_file(source, use_mmap)
+        path = self.path_for(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # A unique temporary name: other threads or processes may store the same digest at once
+            fd, temporary = tempfile.mkstemp(prefix=".store-", suffix=".tmp", dir=os.path.dirname(path))
+            os.close(fd)
+            try:
+                shutil.copyfile(source, temporary)
+                os.replace(temporary, path)
+            except BaseException:
+                try:
+                    os.remove(temporary)
+                except OSError:
+                    pass
+                raise
+        return digest
+
+    def get_bytes(self, digest):
+        with open(self.path_for(digest), 'rb') as f:
+            return f.read()
+
+    def size(self, digest):
+        try:
+            return os.path.getsize(self.path_for(digest))
+        except OSError:
+            return 0
+
+    def remove(self, digest):
+        try:
+            os.remove(self.path_for(digest))
+        except OSError:
+            pass
+
+
+class IconStore:
+    """Icons shared by many folders, with reference counts per folder
+
+    desktop.ini entries point at one stored copy of each icon instead of
+    a copy inside every folder. The index records which folders use which
+    icon so unused icons can be garbage-collected after a reset.
+    """
+
+    POLICIES = ("absolute", "relative")
+
+    def __init__(self, directory, policy="absolute", portable_copies=True):
+        self.content = ContentStore(directory, ".ico")
+        self.index_file = os.path.join(directory, "index.json")
+        self.policy = policy
+        self.portable_copies = portable_copies
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_file, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        self.icons = index.get("icons", {})        # digest -> {"size": bytes, "refs": count}
+        self.folders = index.get("folders", {})    # folder -> digest
+        self.copies = index.get("copies", {})      # folder -> digest copied onto portable media
+
+    def save(self):
+        """Persist the reference index atomically"""
+        with self._lock:
+            data = json.dumps({"icons": self.icons, "folders": self.folders, "copies": self.copies}, indent=1)
+        write_atomic(self.index_file, data.encode("utf-8"))
+
+    @staticmethod
+    def _key(folder):
+        return os.path.normcase(os.path.abspath(folder))
+
+    def add_icon(self, path, use_mmap=False):
+        """Import an .ico file into the store and return its digest"""
+        digest = self.content.put_file(path, use_mmap)
+        with self._lock:
+            self.icons.setdefault(digest, {"size": self.content.size(digest), "refs": 0})
+        return digest
+
+    def add_bytes(self, data):
+        """Import encoded .ico bytes into the store and return their digest"""
+        digest = self.content.put_bytes(data)
+        with self._lock:
+            self.icons.setdefault(digest, {"size": len(data), "refs": 0})
+        return digest
+
+    def icon_path(self, digest):
+        return self.content.path_for(digest)
+
+    def resource_path(self, folder, digest, policy=None):
+        """Return the IconResource path assign() would write, without assigning"""
+        if self.portable_copies and is_portable_media(folder):
+            return PORTABLE_ICON_NAME
+        stored = self.content.path_for(digest)
+        if (policy or self.policy) == "relative":
+            try:
+                return os.path.relpath(stored, folder)
+            except ValueError:
+                pass  # different drive; only an absolute path can work
+        return stored
+
+    def owns(self, folder, resource):
+        """True if an IconResource value points at this store (or our portable copy)"""
+        path = resource.rsplit(",", 1)[0].strip().strip('"')
+        if path == PORTABLE_ICON_NAME:
+            return True
+        path = os.path.normcase(os.path.abspath(os.path.join(folder, path)))
+        return path.startswith(os.path.normcase(os.path.abspath(self.content.directory)) + os.sep)
+
+    def digest_of(self, folder, resource):
+        """Digest of the stored icon an IconResource value points at, or None"""
+        if not self.owns(folder, resource):
+            return None
+        path = resource.rsplit(",", 1)[0].strip().strip('"')
+        if path == PORTABLE_ICON_NAME:
+            return None
+        name = os.path.basename(path)
+        return name[:-len(self.content.suffix)] if name.endswith(self.content.suffix) else None
+
+    def assign(self, folder, digest, policy=None):
+        """Point folder at a stored icon and return the IconResource path to write
+
+        Any icon previously assigned to the folder is released. On portable
+        media (when enabled) the icon is copied into the folder instead so it
+        still shows on other machines.
+        """
+        self.release(folder)
+        resource = self.resource_path(folder, digest, policy)
+        if resource == PORTABLE_ICON_NAME:
+            self._copy_into(folder, digest)
+        else:
+            self._reference(folder, digest)
+        return resource
+
+    def _copy_into(self, folder, digest):
+        target = os.path.join(folder, PORTABLE_ICON_NAME)
+        # Like desktop.ini, a hidden copy left behind cannot be overwritten until the bit is cleared
+        set_attributes(target, remove=FILE_ATTRIBUTE_HIDDEN | FILE_ATTRIBUTE_READONLY)
+        shutil.copyfile(self.content.path_for(digest), target)
+        set_attributes(target, add=FILE_ATTRIBUTE_HIDDEN)
+        with self._lock:
+            self.copies[self._key(folder)] = digest
+
+    def _reference(self, folder, digest):
+        with self._lock:
+            entry = self.icons.setdefault(digest, {"size": self.content.size(digest), "refs": 0})
+            entry["refs"] += 1
+            self.folders[self._key(folder)] = digest
+
+    def adopt(self, folder, resource, copied=None):
+        """Take the reference a restored IconResource value implies; returns the digest or None
+
+        The counterpart of assign() for a desktop.ini that undo or redo wrote
+        back: a stored icon gets its reference again, and the portable name
+        gets its copy recreated from copied (the digest the copy held).
+        Release the folder's previous icon first.
+        """
+        if not resource or not self.owns(folder, resource):
+            return None
+        if resource.rsplit(",", 1)[0].strip().strip('"') == PORTABLE_ICON_NAME:
+            if copied is None or copied not in self.content:
+                return None
+            self._copy_into(folder, copied)
+            return copied
+        digest = self.digest_of(folder, resource)
+        if digest is None or digest not in self.content:
+            return None
+        self._reference(folder, digest)
+        return digest
+
+    def release(self, folder, keep_copy=False):
+        """Drop the folder's reference (or its portable copy); returns the digest or None
+
+        With keep_copy a portable copy stays on disk (only the store forgets it).
+        """
+        key = self._key(folder)
+        with self._lock:
+            digest = self.folders.pop(key, None)
+            if digest is not None and digest in self.icons:
+                self.icons[digest]["refs"] = max(0, self.icons[digest]["refs"] - 1)
+            copied = self.copies.pop(key, None)
+        if copied is not None and not keep_copy:
+            try:
+                os.remove(os.path.join(folder, PORTABLE_ICON_NAME))
+            except OSError:
+                pass
+        return digest or copied
+
+    def collect_garbage(self, keep=()):
+        """Delete icons no folder references (except digests in keep); returns bytes freed"""
+        with self._lock:
+            unused = [digest for digest, entry in self.icons.items() if entry["refs"] <= 0 and digest not in keep]
+            freed = 0
+            for digest in unused:
+                freed += self.icons.pop(digest)["size"]
+        for digest in unused:
+            self.content.remove(digest)
+        return freed
+
+    def stats(self):
+        """Icons stored, references and the bytes saved versus per-folder copies"""
+        with self._lock:
+            stored = sum(entry["size"] for entry in self.icons.values())
+            references = sum(entry["refs"] for entry in self.icons.values())
+            saved = sum(entry["size"] * (entry["refs"] - 1) for entry in self.icons.values() if entry["refs"] > 1)
+            return {
+                "icons": len(self.icons),
+                "references": references,
+                "portable_copies": len(self.copies),
+                "stored_bytes": stored,
+                "bytes_saved": saved,
+            }
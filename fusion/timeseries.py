@@ -0,0 +1,311 @@
+"""
+Folder growth history - compact time series of folder stats snapshots
+
+Every scan can append a snapshot (time, size, allocated size, file and
+folder counts, bytes of the largest file types) for its folder. Snapshots
+are kept in sqlite as blocks of up to block_points points; inside a block
+each column is delta-encoded (times delta-of-delta) and the block is
+zlib-compressed, so a year of daily snapshots of a folder fits in a few
+kilobytes. Range queries decode only the overlapping blocks and can
+downsample to one point per step. compact() applies the retention tiers:
+recent snapshots are all kept, older ones are thinned to one per day,
+then one per week, and the oldest are dropped.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from itertools import accumulate
+
+DAY = 24 * 60 * 60
+
+FIELDS = ("size", "alloc", "files", "dirs")
+
+# (age, resolution): snapshots older than age keep one point per resolution
+DEFAULT_RETENTION = ((30 * DAY, DAY), (365 * DAY, 7 * DAY))
+DEFAULT_MAX_AGE = 5 * 365 * DAY
+
+OTHER_EXTENSIONS = "(other)"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    id INTEGER PRIMARY KEY,
+    folder TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    series INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    extensions TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (series, start)
+);
+"""
+
+
+def _key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _deltas(values, order):
+    """Difference values order times (the first value is kept as is)"""
+    for _ in range(order):
+        values = values[:1] + [b - a for a, b in zip(values, values[1:])]
+    return values
+
+
+def _undelta(values, order):
+    for _ in range(order):
+        values = list(accumulate(values))
+    return values
+
+
+def encode_block(points):
+    """Return (extension names, compressed data) for points sorted by time
+
+    Each column is stored as 64-bit deltas (times as delta-of-delta); slow
+    growth and regular scan intervals give runs of near-identical small
+    numbers that zlib squeezes to a few bytes per point.
+    """
+    extensions = sorted({extension for point in points for extension in point["extensions"]})
+    columns = array('q', _deltas([point["time"] for point in points], 2))
+    for field in FIELDS:
+        columns.extend(_deltas([point[field] for point in points], 1))
+    for extension in extensions:
+        columns.extend(_deltas([point["extensions"].get(extension, 0) for point in points], 1))
+    return extensions, zlib.compress(columns.tobytes())
+
+
+def decode_column(data, count, index):
+    """One column of a block: 0 is time, then FIELDS, then the block's extensions"""
+    values = array('q')
+    values.frombytes(zlib.decompress(data))
+    return _undelta(values[index * count:(index + 1) * count], 2 if index == 0 else 1)
+
+
+def decode_block(extensions, data, count):
+    """Points of one block, oldest first"""
+    values = array('q')
+    values.frombytes(zlib.decompress(data))
+    columns = [_undelta(values[i * count:(i + 1) * count], 1) for i in range(1, len(FIELDS) + 1)]
+    sizes = [_undelta(values[i * count:(i + 1) * count], 1)
+             for i in range(len(FIELDS) + 1, len(FIELDS) + 1 + len(extensions))]
+    points = []
+    for i, moment in enumerate(_undelta(values[:count], 2)):
+        point = dict(zip(FIELDS, (column[i] for column in columns)))
+        point["time"] = moment
+        point["extensions"] = {extension: column[i] for extension, column in zip(extensions, sizes) if column[i]}
+        points.append(point)
+    return points
+
+
+def downsample(points, step):
+    """Keep the last point of every step-second bucket"""
+    buckets = {}
+    for point in points:
+        buckets[point["time"] // step] = point
+    return [buckets[bucket] for bucket in sorted(buckets)]
+
+
+def snapshot_from_tree(tree, node=0, when=None, top=16):
+    """Snapshot of a SizeTree node: totals, plus bytes of the top file types for the root
+
+    File types are only totalled for the whole tree, so snapshots of inner
+    nodes carry none.
+    """
+    extensions = {}
+    if node == 0:
+        extensions = {extension or "(none)": size for extension, size, _ in tree.top_extensions(top)}
+        rest = tree.size[0] - sum(extensions.values())
+        if rest > 0:
+            extensions[OTHER_EXTENSIONS] = rest
+    return {
+        "time": int(time.time() if when is None else when),
+        "size": tree.size[node],
+        "alloc": tree.alloc[node],
+        "files": tree.files[node],
+        "dirs": tree.dirs[node],
+        "extensions": extensions,
+    }
+
+
+class TimeSeriesStore:
+    """Snapshots of many folders in one sqlite file"""
+
+    def __init__(self, path, block_points=128, retention=DEFAULT_RETENTION, max_age=DEFAULT_MAX_AGE):
+        self.path = path
+        self.block_points = block_points
+        self.retention = retention
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # Must precede table creation to take effect on a new file
+        self._db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._db.executescript(_SCHEMA)
+
+    def _series(self, folder, create=False):
+        key = _key(folder)
+        row = self._db.execute("SELECT id FROM series WHERE folder = ?", (key,)).fetchone()
+        if row is not None:
+            return row[0]
+        if not create:
+            return None
+        return self._db.execute("INSERT INTO series (folder) VALUES (?)", (key,)).lastrowid
+
+    def _write_block(self, series, points):
+        extensions, data = encode_block(points)
+        self._db.execute(
+            "INSERT OR REPLACE INTO blocks (series, start, end, count, extensions, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (series, points[0]["time"], points[-1]["time"], len(points), json.dumps(extensions), data)
+        )
+
+    def _append(self, folder, snapshots):
+        series = self._series(folder, create=True)
+        points = []
+        last = self._db.execute(
+            "SELECT start, count, extensions, data FROM blocks WHERE series = ? ORDER BY start DESC LIMIT 1",
+            (series,)
+        ).fetchone()
+        if last is not None and last[1] < self.block_points:
+            # The newest block is not full: re-encode it with the new points
+            points = decode_block(json.loads(last[2]), last[3], last[1])
+            self._db.execute("DELETE FROM blocks WHERE series = ? AND start = ?", (series, last[0]))
+        points.extend(snapshots)
+        points.sort(key=lambda point: point["time"])
+        for i in range(0, len(points), self.block_points):
+            self._write_block(series, points[i:i + self.block_points])
+
+    def append(self, folder, snapshot):
+        """Add one snapshot (see snapshot_from_tree) of folder"""
+        self.append_many([(folder, snapshot)])
+
+    def append_many(self, items):
+        """Add (folder, snapshot) pairs in one transaction"""
+        by_folder = {}
+        for folder, snapshot in items:
+            by_folder.setdefault(_key(folder), []).append(snapshot)
+        with self._lock, self._db:
+            for folder, snapshots in by_folder.items():
+                self._append(folder, snapshots)
+
+    def folders(self):
+        """Folders with stored snapshots"""
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT folder FROM series ORDER BY folder")]
+
+    def query(self, folder, start=None, end=None, step=None):
+        """Snapshots of folder between start and end (inclusive), oldest first
+
+        With step, only the last snapshot of each step-second bucket is
+        returned, which is what a chart of sizes over time needs.
+        """
+        start = -2 ** 62 if start is None else int(start)
+        end = 2 ** 62 if end is None else int(end)
+        with self._lock:
+            series = self._series(folder)
+            if series is None:
+                return []
+            blocks = self._db.execute(
+                "SELECT extensions, data, count FROM blocks WHERE series = ? AND end >= ? AND start <= ? "
+                "ORDER BY start", (series, start, end)
+            ).fetchall()
+        points = []
+        for extensions, data, count in blocks:
+            points.extend(point for point in decode_block(json.loads(extensions), data, count)
+                          if start <= point["time"] <= end)
+        # Blocks only overlap after out-of-order appends; sorting sorted input is cheap
+        points.sort(key=lambda point: point["time"])
+        return downsample(points, step) if step else points
+
+    def values(self, folder, field="size", start=None, end=None, step=None):
+        """(time, value) pairs of one field, oldest first; the fast path for charts
+
+        Only the time and field columns are decoded. With step, the last
+        value of each step-second bucket is kept.
+        """
+        start = -2 ** 62 if start is None else int(start)
+        end = 2 ** 62 if end is None else int(end)
+        index = FIELDS.index(field) + 1
+        with self._lock:
+            series = self._series(folder)
+            if series is None:
+                return []
+            blocks = self._db.execute(
+                "SELECT data, count FROM blocks WHERE series = ? AND end >= ? AND start <= ? ORDER BY start",
+                (series, start, end)
+            ).fetchall()
+        pairs = []
+        for data, count in blocks:
+            pairs.extend(pair for pair in zip(decode_column(data, count, 0), decode_column(data, count, index))
+                         if start <= pair[0] <= end)
+        pairs.sort()
+        if step:
+            buckets = {}
+            for pair in pairs:
+                buckets[pair[0] // step] = pair
+            pairs = [buckets[bucket] for bucket in sorted(buckets)]
+        return pairs
+
+    def latest(self, folder):
+        """The newest snapshot of folder, or None"""
+        with self._lock:
+            series = self._series(folder)
+            if series is None:
+                return None
+            row = self._db.execute(
+                "SELECT extensions, data, count FROM blocks WHERE series = ? ORDER BY end DESC LIMIT 1", (series,)
+            ).fetchone()
+        if row is None:
+            return None
+        return decode_block(json.loads(row[0]), row[1], row[2])[-1]
+
+    def _thin(self, points, now):
+        """Apply max_age and the retention tiers to points sorted by time"""
+        tiers = sorted(self.retention, reverse=True)
+        buckets = {}
+        for point in points:
+            age = now - point["time"]
+            if self.max_age is not None and age > self.max_age:
+                continue
+            resolution = next((resolution for limit, resolution in tiers if age > limit), None)
+            # Later points of the same bucket replace earlier ones
+            bucket = (resolution, point["time"] // resolution) if resolution else (0, point["time"])
+            buckets[bucket] = point
+        return sorted(buckets.values(), key=lambda point: point["time"])
+
+    def compact(self, now=None):
+        """Thin and drop old snapshots per the retention policy; returns points removed"""
+        now = int(time.time() if now is None else now)
+        removed = 0
+        with self._lock:
+            for (series,) in self._db.execute("SELECT id FROM series").fetchall():
+                rows = self._db.execute(
+                    "SELECT extensions, data, count FROM blocks WHERE series = ? ORDER BY start", (series,)
+                ).fetchall()
+                points = []
+                for extensions, data, count in rows:
+                    points.extend(decode_block(json.loads(extensions), data, count))
+                kept = self._thin(points, now)
+                if len(kept) == len(points) and len(rows) <= -(-len(points) // self.block_points):
+                    continue
+                removed += len(points) - len(kept)
+                with self._db:
+                    self._db.execute("DELETE FROM blocks WHERE series = ?", (series,))
+                    for i in range(0, len(kept), self.block_points):
+                        self._write_block(series, kept[i:i + self.block_points])
+                    if not kept:
+                        self._db.execute("DELETE FROM series WHERE id = ?", (series,))
+            if removed:
+                # execute() would only step the pragma once (one page); a script runs it to the end
+                self._db.executescript("PRAGMA incremental_vacuum;")
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,194 @@
+"""
+Volume helpers - identify the drive, share or mount a path lives on
+"""
+
+import ctypes
+import os
+import sys
+import threading
+
+DRIVE_REMOVABLE = 2
+DRIVE_FIXED = 3
+DRIVE_REMOTE = 4
+DRIVE_CDROM = 5
+
+# Storage kinds used to pick I/O concurrency
+SSD = "ssd"
+HDD = "hdd"
+NETWORK = "network"
+REMOVABLE = "removable"
+UNKNOWN = "unknown"
+
+NETWORK_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "afpfs", "9p", "ceph", "glusterfs",
+                       "fuse.sshfs", "fuse.rclone", "davfs", "webdav"}
+
+# Mount roots used for removable media on Linux and macOS
+PORTABLE_MOUNT_PREFIXES = ("/media/", "/run/media/", "/Volumes/")
+
+
+def volume_root(path):
+    """Return the root of the volume holding path (drive, UNC share or mount point)"""
+    path = os.path.abspath(path)
+    drive, _ = os.path.splitdrive(path)
+    if drive:
+        # "C:" or "\\server\share" on Windows
+        return drive if drive.startswith("\\\\") else drive + os.sep
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def volume_key(path):
+    """Stable, case-normalized key used to store per-volume settings"""
+    return os.path.normcase(volume_root(path))
+
+
+def is_portable_media(path):
+    """True if path lives on removable media (USB sticks, SD cards, optical discs)"""
+    root = volume_root(path)
+    if sys.platform == "win32":
+        if root.startswith("\\\\"):
+            return False
+        return ctypes.windll.kernel32.GetDriveTypeW(root) in (DRIVE_REMOVABLE, DRIVE_CDROM)
+    return (root + os.sep).startswith(PORTABLE_MOUNT_PREFIXES)
+
+
+def volume_id(path):
+    """Identify the volume holding path (st_dev, falling back to the mount root)"""
+    try:
+        return os.stat(path).st_dev
+    except OSError:
+        return volume_key(path)
+
+
+def _seek_penalty(drive):
+    """True/False if the disk behind drive ("C:") incurs a seek penalty, None if unknown"""
+    from ctypes import wintypes
+
+    class STORAGE_PROPERTY_QUERY(ctypes.Structure):
+        _fields_ = [("PropertyId", ctypes.c_int), ("QueryType", ctypes.c_int),
+                    ("AdditionalParameters", ctypes.c_ubyte * 1)]
+
+    class DEVICE_SEEK_PENALTY_DESCRIPTOR(ctypes.Structure):
+        _fields_ = [("Version", wintypes.DWORD), ("Size", wintypes.DWORD),
+                    ("IncursSeekPenalty", ctypes.c_ubyte)]
+
+    kernel32 = ctypes.windll.kernel32
+    kernel32.CreateFileW.restype = wintypes.HANDLE
+    # No access rights needed to query the property; sharing flags keep it non-intrusive
+    handle = kernel32.CreateFileW(f"\\\\.\\{drive}", 0, 0x1 | 0x2, None, 3, 0, None)
+    if handle in (None, wintypes.HANDLE(-1).value):
+        return None
+    try:
+        query = STORAGE_PROPERTY_QUERY(7, 0)   # StorageDeviceSeekPenaltyProperty, standard query
+        result = DEVICE_SEEK_PENALTY_DESCRIPTOR()
+        returned = wintypes.DWORD()
+        ok = kernel32.DeviceIoControl(handle, 0x2D1400, ctypes.byref(query), ctypes.sizeof(query),
+                                      ctypes.byref(result), ctypes.sizeof(result), ctypes.byref(returned), None)
+        return bool(result.IncursSeekPenalty) if ok else None
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def _mount_type(mount_point):
+    """Filesystem type of a Linux mount point from /proc/mounts, or None"""
+    found = None
+    try:
+        with open("/proc/mounts", 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) > 2 and fields[1].replace("\\040", " ") == mount_point:
+                    found = fields[2]   # later mounts shadow earlier ones
+    except OSError:
+        pass
+    return found
+
+
+def _sysfs_flag(device, name):
+    """Read a 0/1 block-device attribute for st_dev (partition or whole disk)"""
+    base = f"/sys/dev/block/{os.major(device)}:{os.minor(device)}"
+    for path in (os.path.join(base, name), os.path.join(base, "..", name)):
+        try:
+            with open(path, 'r') as f:
+                return f.read().strip() == "1"
+        except OSError:
+            continue
+    return None
+
+
+def _detect_kind(path):
+    root = volume_root(path)
+    if sys.platform == "win32":
+        if root.startswith("\\\\"):
+            return NETWORK
+        drive_type = ctypes.windll.kernel32.GetDriveTypeW(root)
+        if drive_type == DRIVE_REMOTE:
+            return NETWORK
+        if drive_type in (DRIVE_REMOVABLE, DRIVE_CDROM):
+            return REMOVABLE
+        if drive_type == DRIVE_FIXED:
+            penalty = _seek_penalty(root[:2])
+            if penalty is not None:
+                return HDD if penalty else SSD
+        return UNKNOWN
+    if is_portable_media(path):
+        return REMOVABLE
+    if sys.platform.startswith("linux"):
+        fstype = _mount_type(root)
+        if fstype in NETWORK_FILESYSTEMS or (fstype or "").startswith("nfs"):
+            return NETWORK
+        try:
+            device = os.stat(path).st_dev
+        except OSError:
+            return UNKNOWN
+        if _sysfs_flag(device, "removable"):
+            return REMOVABLE
+        rotational = _sysfs_flag(device, "queue/rotational")
+        if rotational is not None:
+            return HDD if rotational else SSD
+    return UNKNOWN
+
+
+_kinds = {}
+_kinds_lock = threading.Lock()
+
+
+def volume_kind(path):
+    """Storage kind of the volume holding path: ssd, hdd, network, removable or unknown (cached)"""
+    key = volume_key(path)
+    with _kinds_lock:
+        if key in _kinds:
+            return _kinds[key]
+    kind = _detect_kind(path)
+    with _kinds_lock:
+        _kinds[key] = kind
+    return kind
+
+
+_clusters = {}
+
+
+def cluster_size(path):
+    """Allocation unit of the volume holding path in bytes (cached; 4096 if unknown)"""
+    key = volume_key(path)
+    size = _clusters.get(key)
+    if size is None:
+        size = 4096
+        if sys.platform == "win32":
+            from ctypes import wintypes
+
+            sectors, sector_bytes, free, total = (wintypes.DWORD() for _ in range(4))
+            if ctypes.windll.kernel32.GetDiskFreeSpaceW(volume_root(path), ctypes.byref(sectors),
+                                                        ctypes.byref(sector_bytes), ctypes.byref(free),
+                                                        ctypes.byref(total)):
+                size = sectors.value * sector_bytes.value or size
+        else:
+            try:
+                size = os.statvfs(path).f_frsize or size
+            except OSError:
+                pass
+        _clusters[key] = size
+    return size